@@ -0,0 +1,48 @@
+# Adversarial-input benchmark for the pgversion validation path.
+
+# Times the public functions against oversized / malformed inputs of growing size.
+# Rejection should take about the same time however large the input is.
+
+# Usage:
+#   python bench_adversarial.py [--repeat 2000]
+
+import argparse
+import timeit
+
+import pgversion
+
+_sizes = [10, 1000, 100000, 1000000, 10000000]
+
+_shapes = {
+  'digits + .1'   : lambda n: '1' * n + '.1',
+  'digits.digits' : lambda n: '1' * (n // 2) + '.' + '1' * (n // 2),
+  'dots'          : lambda n: '.' * n,
+  '1.1.1...'      : lambda n: '1.' * (n // 2) + '1',
+  'letters'       : lambda n: 'a' * n,
+  'int'           : lambda n: 10 ** min(n, 100000),
+}
+
+_functions = {
+  'isValidPGVersion'      : pgversion.isValidPGVersion,
+  'isReleasedPGVersion'   : pgversion.isReleasedPGVersion,
+  'getMajorPGVersion'     : pgversion.getMajorPGVersion,
+  'getPGVerNumFromString' : pgversion.getPGVerNumFromString,
+  'getVerReleaseDate'     : pgversion.getVerReleaseDate,
+}
+
+
+def main(args):
+  print('%-22s %-14s ' % ('function', 'input') + ''.join('%12s' % ('n=' + str(n)) for n in _sizes))
+  for fname, f in _functions.items():
+    for shape, make in _shapes.items():
+      row = []
+      for n in _sizes:
+        s = make(n)
+        t = min(timeit.repeat(lambda: f(s), number=args.repeat, repeat=3)) / args.repeat
+        row.append('%9.2f us' % (t * 1e6))
+      print('%-22s %-14s ' % (fname, shape) + ''.join('%12s' % r for r in row))
+
+if (__name__ == '__main__'):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--repeat', type=int, default=2000)
+  main(parser.parse_args())
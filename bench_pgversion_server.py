@@ -0,0 +1,92 @@
+# Latency / throughput benchmark for pgversion_server.py under concurrent clients.
+
+# Starts the server in-process on an ephemeral localhost port (and a Unix domain
+# socket), then runs N concurrent keep-alive clients against single and batch endpoints.
+
+# Usage:
+#   python bench_pgversion_server.py [--clients 64] [--requests 200] [--batch 5000]
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import pgversion
+import pgversion_server
+
+_versions = list(pgversion._verReleaseDates) + ['junk', '17.99', '9.7.1', '11']
+
+
+async def _request(reader, writer, method, path, body=b''):
+  writer.write(
+    method.encode() + b' ' + path.encode() + b' HTTP/1.1\r\nHost: bench\r\n'
+    b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+  await writer.drain()
+  head = await reader.readuntil(b'\r\n\r\n')
+  length = 0
+  for line in head.split(b'\r\n'):
+    if (line.lower().startswith(b'content-length:')):
+      length = int(line.split(b':')[1])
+  return await reader.readexactly(length)
+
+
+async def _client(connect, makeRequest, n, latencies):
+  reader, writer = await connect()
+  for i in range(n):
+    method, path, body = makeRequest(i)
+    t = time.perf_counter()
+    await _request(reader, writer, method, path, body)
+    latencies.append(time.perf_counter() - t)
+  writer.close()
+
+
+async def _run(name, connect, makeRequest, clients, requests, itemsPerRequest):
+  latencies = []
+  t = time.perf_counter()
+  await asyncio.gather(*(_client(connect, makeRequest, requests, latencies) for _ in range(clients)))
+  elapsed = time.perf_counter() - t
+
+  latencies.sort()
+  total = clients * requests
+  print('%-28s %8d req  %10.0f req/s  %12.0f versions/s  p50 %7.3f ms  p99 %7.3f ms' % (
+    name, total, total / elapsed, total * itemsPerRequest / elapsed,
+    statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000))
+
+
+async def main(args):
+  tmpdir = tempfile.TemporaryDirectory()
+  unixPath = os.path.join(tmpdir.name, 'pgversion.sock')
+  servers = await pgversion_server.startServers('127.0.0.1', 0, unixPath)
+  port = servers[0].sockets[0].getsockname()[1]
+
+  tcp = lambda: asyncio.open_connection('127.0.0.1', port)
+  unix = lambda: asyncio.open_unix_connection(unixPath)
+
+  rnd = random.Random(0)
+  single = lambda i: ('GET', '/validate?v=' + rnd.choice(_versions), b'')
+  parse = lambda i: ('GET', '/parse?v=' + rnd.choice(_versions), b'')
+  batchBody = json.dumps({'versions': [rnd.choice(_versions) for _ in range(args.batch)]}).encode()
+  batch = lambda i: ('POST', '/batch/parse', batchBody)
+
+  print('clients=%d requests/client=%d batch=%d' % (args.clients, args.requests, args.batch))
+  await _run('tcp  /validate', tcp, single, args.clients, args.requests, 1)
+  await _run('tcp  /parse', tcp, parse, args.clients, args.requests, 1)
+  await _run('unix /validate', unix, single, args.clients, args.requests, 1)
+  await _run('tcp  /batch/parse', tcp, batch, args.clients, max(args.requests // 20, 1), args.batch)
+  await _run('unix /batch/parse', unix, batch, args.clients, max(args.requests // 20, 1), args.batch)
+
+  for server in servers:
+    server.close()
+    await server.wait_closed()
+  tmpdir.cleanup()
+
+if (__name__ == '__main__'):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--clients', type=int, default=64)
+  parser.add_argument('--requests', type=int, default=200)
+  parser.add_argument('--batch', type=int, default=5000)
+  asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,175 @@
+# End-to-end scaling benchmark over synthetic fleets (see pgversion_fleetgen.py).
+
+# For each fleet size, runs validation, parsing, release lookups and comparisons over every
+# row and records throughput and peak RSS. Each size runs in a fresh subprocess, so its peak RSS
+# isn't inflated by earlier sizes. A separate pass over one chunk, under tracemalloc, records
+# the peak memory allocated and the blocks retained by each stage. Results are written as JSON.
+
+# Usage:
+#   python bench_scaling.py [--sizes 1000000 10000000 100000000] [--output scaling.json]
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pgversion
+import pgversion_fleetgen
+
+_defaultSizes = [10 ** 6, 10 ** 7, 10 ** 8]
+_chunkSize = 100000
+
+# Comparisons are against the previous row, like a snapshot diff would
+_reference = '15.1'
+
+
+def _validate(rows):
+  f = pgversion.isValidPGVersion
+  for v in rows:
+    f(v)
+
+
+def _parse(rows):
+  f = pgversion.parsePGVersion
+  g = pgversion.getPGVerNumFromString
+  for v in rows:
+    f(v)
+    g(v)
+
+
+def _releaseLookup(rows):
+  f = pgversion.getVerReleaseDate
+  g = pgversion.getLatestMinorPGVersion
+  for v in rows:
+    f(v)
+    g(v)
+
+
+def _compare(rows):
+  f = pgversion.IsVerReleasedAfter
+  prev = _reference
+  for v in rows:
+    f(v, prev)
+    prev = v
+
+
+_stages = {
+  'validate': _validate,
+  'parse': _parse,
+  'release_lookup': _releaseLookup,
+  'compare': _compare,
+}
+
+
+# Return: Peak resident set size of this process so far, in KiB
+def _peakRssKiB():
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports KiB, macOS bytes
+  return rss // 1024 if (sys.platform == 'darwin') else rss
+
+
+# Return: Dict of results for one fleet size
+# Detail: peakRssKiB is for the whole process, see runSizeSubprocess() to measure one size on its own
+def runSize(n, seed, junkFraction):
+  seconds = dict.fromkeys(_stages, 0.0)
+  generate = 0.0
+  t = time.perf_counter()
+  for rows in pgversion_fleetgen.generateFleetChunks(n, _chunkSize, seed=seed, junkFraction=junkFraction):
+    generate += time.perf_counter() - t
+    for name, f in _stages.items():
+      t = time.perf_counter()
+      f(rows)
+      seconds[name] += time.perf_counter() - t
+    t = time.perf_counter()
+
+  return {
+    'rows': n,
+    'generateSeconds': round(generate, 3),
+    'stages': {name: {'seconds': round(s, 3), 'rowsPerSecond': round(n / s) if (s) else None}
+               for name, s in seconds.items()},
+    'peakRssKiB': _peakRssKiB(),
+  }
+
+
+# Return: Dict of results for one fleet size, run in a fresh Python process
+def runSizeSubprocess(n, seed, junkFraction):
+  out = subprocess.run([sys.executable, __file__, '--run-size', str(n), '--seed', str(seed), '--junk', str(junkFraction)],
+                       stdout=subprocess.PIPE, check=True).stdout
+  return json.loads(out)
+
+
+# Return: Dict of tracemalloc results per stage, over one chunk of rows
+# Detail: allocatedBytes is the peak traced memory during the stage. retainedBlocks is the
+# net number of blocks still allocated after it, and retainedBlocksByLine the sum of the
+# positive per-line count differences between snapshots taken before and after the stage.
+# Blocks allocated and freed within the stage don't show up in a snapshot, so neither is an
+# allocation count. Each stage first runs over a separate warm-up chunk, so that lazy imports
+# (for e.g. _strptime) aren't counted.
+def runTracemalloc(seed, junkFraction):
+  rows = next(pgversion_fleetgen.generateFleetChunks(_chunkSize, _chunkSize, seed=seed, junkFraction=junkFraction))
+  warmup = next(pgversion_fleetgen.generateFleetChunks(1000, 1000, seed=seed + 1, junkFraction=junkFraction))
+  results = {}
+  tracemalloc.start()
+  try:
+    for name, f in _stages.items():
+      f(warmup)
+      before = tracemalloc.take_snapshot()
+      tracemalloc.reset_peak()
+      base = tracemalloc.get_traced_memory()[0]
+      f(rows)
+      peak = tracemalloc.get_traced_memory()[1]
+      after = tracemalloc.take_snapshot()
+      diff = after.compare_to(before, 'lineno')
+      byLine = sum(s.count_diff for s in diff if (s.count_diff > 0))
+      retained = sum(s.count_diff for s in diff)
+      results[name] = {'rows': len(rows), 'allocatedBytes': peak - base, 'retainedBlocks': max(retained, 0),
+                       'retainedBlocksByLine': byLine}
+  finally:
+    tracemalloc.stop()
+  return results
+
+
+def main(args):
+  if (args.run_size):
+    print(json.dumps(runSize(args.run_size, args.seed, args.junk)))
+    return
+
+  report = {
+    'benchmark': 'bench_scaling',
+    'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'implementation': platform.python_implementation(),
+    'platform': platform.platform(),
+    'seed': args.seed,
+    'junkFraction': args.junk,
+    'chunkSize': _chunkSize,
+    'tracemalloc': runTracemalloc(args.seed, args.junk),
+    'results': [],
+  }
+
+  for n in args.sizes:
+    result = runSizeSubprocess(n, args.seed, args.junk)
+    report['results'].append(result)
+    sys.stderr.write('%d rows: ' % n + ', '.join('%s %d/s' % (k, v['rowsPerSecond'] or 0) for k, v in result['stages'].items()) + '\n')
+
+  out = json.dumps(report, indent=2)
+  if (args.output):
+    with open(args.output, 'w') as f:
+      f.write(out + '\n')
+  else:
+    print(out)
+
+if (__name__ == '__main__'):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', type=int, nargs='+', default=_defaultSizes)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--junk', type=float, default=0.02)
+  parser.add_argument('--output', default=None)
+  # Internal: run one size in this process and print its results (see runSizeSubprocess())
+  parser.add_argument('--run-size', type=int, default=None, help=argparse.SUPPRESS)
+  main(parser.parse_args())
@@ -0,0 +1,111 @@
+# Multi-thread scaling benchmark over a synthetic fleet (see pgversion_fleetgen.py).
+
+# Splits one CPU-bound validation workload (isValidPGVersion, getMajorPGVersion and
+# getPGVerNumFromString on every row) across 1..N threads and records throughput and
+# speedup against the single thread run. On a free-threaded build (python3.13t and
+# later, with the GIL disabled) throughput should grow near-linearly with the number
+# of threads, up to the number of cores; with the GIL it stays flat. Results are
+# written as JSON.
+
+# Usage:
+#   python bench_threads.py [--rows 1000000] [--threads 1 2 4 8] [--output threads.json]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import pgversion
+import pgversion_fleetgen
+
+
+def _validate(rows):
+  f = pgversion.isValidPGVersion
+  g = pgversion.getMajorPGVersion
+  h = pgversion.getPGVerNumFromString
+  for v in rows:
+    if (f(v)):
+      g(v)
+      h(v)
+
+
+# Return: Seconds taken by n threads to validate all rows, each thread taking an equal slice
+# Detail: Threads are started up-front and released together with a Barrier, so thread
+# start-up isn't counted
+def runThreads(rows, n):
+  size = -(-len(rows) // n)
+  slices = [rows[i:i + size] for i in range(0, len(rows), size)]
+  barrier = threading.Barrier(len(slices) + 1)
+
+  def work(part):
+    barrier.wait()
+    _validate(part)
+
+  threads = [threading.Thread(target=work, args=(part,)) for part in slices]
+  for t in threads:
+    t.start()
+  barrier.wait()
+  start = time.perf_counter()
+  for t in threads:
+    t.join()
+  return time.perf_counter() - start
+
+
+# Return: True / False if the GIL is enabled, or None if this Python can't tell (pre 3.13)
+def _gilEnabled():
+  f = getattr(sys, '_is_gil_enabled', None)
+  return None if (f is None) else f()
+
+
+def main(args):
+  rows = [str(v) for v in next(pgversion_fleetgen.generateFleetChunks(args.rows, args.rows, seed=args.seed, junkFraction=args.junk))]
+  # Warm up, so that one-off set-up costs are not counted against the single thread run
+  _validate(rows[:1000])
+
+  report = {
+    'benchmark': 'bench_threads',
+    'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'implementation': platform.python_implementation(),
+    'platform': platform.platform(),
+    'gilEnabled': _gilEnabled(),
+    'cpus': os.cpu_count(),
+    'rows': len(rows),
+    'seed': args.seed,
+    'junkFraction': args.junk,
+    'results': [],
+  }
+
+  base = None
+  for n in args.threads:
+    seconds = min(runThreads(rows, n) for _ in range(args.repeat))
+    base = seconds if (base is None) else base
+    result = {
+      'threads': n,
+      'seconds': round(seconds, 3),
+      'rowsPerSecond': round(len(rows) / seconds),
+      'speedup': round(base / seconds, 2),
+    }
+    report['results'].append(result)
+    sys.stderr.write('%d threads: %d rows/s, speedup %.2f\n' % (n, result['rowsPerSecond'], result['speedup']))
+
+  out = json.dumps(report, indent=2)
+  if (args.output):
+    with open(args.output, 'w') as f:
+      f.write(out + '\n')
+  else:
+    print(out)
+
+if (__name__ == '__main__'):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--rows', type=int, default=10 ** 6)
+  parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--junk', type=float, default=0.02)
+  parser.add_argument('--output', default=None)
+  main(parser.parse_args())
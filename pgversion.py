@@ -15,11 +15,18 @@
 
 import sys
 import re
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
 
+# Process-wide debug level, used unless a context (thread / asyncio task) sets its own,
+# see setDebugLevel() and withDebugLevel()
 debug_level = 0
+# Level of the debug messages printed by the functions here, unless a call passes its own
 default_debug_level = 1
 
+_contextDebugLevel = contextvars.ContextVar('pgversion_debug_level', default=None)
+
 _verReleaseDates = {
   '18.3'    : '2026-02-26',
   '18.2'    : '2026-02-12',
@@ -573,59 +580,197 @@ _verReleaseDates = {
   '0.01'    : '1995-05-01'
 }
 
-def dprint(s, debug = default_debug_level):
-  if (debug_level >= debug):
-    print (s)
+# Beta, RC (release candidate) releases, before each major version's .0 release
+_verPrereleaseDates = {
+  '18rc1'   : '2025-09-04',
+  '18beta3' : '2025-08-14',
+  '18beta2' : '2025-07-17',
+  '18beta1' : '2025-05-08',
+  '17rc1'   : '2024-09-05',
+  '17beta3' : '2024-08-08',
+  '17beta2' : '2024-06-27',
+  '17beta1' : '2024-05-23',
+  '16rc1'   : '2023-08-31',
+  '16beta3' : '2023-08-10',
+  '16beta2' : '2023-06-29',
+  '16beta1' : '2023-05-25',
+  '15rc2'   : '2022-09-29',
+  '15rc1'   : '2022-09-22',
+  '15beta4' : '2022-09-08',
+  '15beta3' : '2022-08-11',
+  '15beta2' : '2022-06-30',
+  '15beta1' : '2022-05-19',
+}
+
+# Order of prerelease stages, all of which sort before the .0 release
+_prereleaseStages = {'devel': 0, 'beta': 1, 'rc': 2}
+_releaseStage = 3
+
+# No valid version string (for e.g. '9.6.24' or '17.9999') comes close to this length.
+# Anything longer is rejected up-front, so that validation costs the same however
+# large the input is (and int() never sees a huge string of digits).
+_maxVerStrLen = 16
+_maxVerInt = 10 ** _maxVerStrLen
+_tooLongMessage = 'Invalid Version String - Longer than ' + str(_maxVerStrLen) + ' characters - '
+
+_reDotAtEnds = re.compile(r"^\.|.*\.$")
+_reAdjacentDots = re.compile(r".*[\.]{2,}")
+_reDigitsAndDots = re.compile(r'^[0-9\.]*$')
+# Prerelease, for e.g. '17beta3', '18rc1', '19devel' (or pre v10, '9.6beta1')
+_rePrerelease = re.compile(r'^([0-9]+(?:\.[0-9]+)?)(beta|rc|devel)([0-9]*)$')
+
+# Return: Debug level in effect for the current context (thread / asyncio task)
+def getDebugLevel():
+  level = _contextDebugLevel.get()
+  return debug_level if (level is None) else level
+
+
+# Set the debug level for the current context (thread / asyncio task) only, leaving
+# other threads as they are. Pass None to go back to the process-wide debug_level.
+# Return: Token that resets it, see contextvars.ContextVar.reset()
+def setDebugLevel(level):
+  return _contextDebugLevel.set(level)
+
+
+# Context manager that sets the debug level for the current context, for e.g.
+#   with withDebugLevel(1):
+#     isValidPGVersion('9.7.1')
+@contextmanager
+def withDebugLevel(level):
+  token = _contextDebugLevel.set(level)
+  try:
+    yield
+  finally:
+    _contextDebugLevel.reset(token)
+
+
+# Print s if the debug level is at least debug (default_debug_level if None)
+# Detail: With args, s is a %-format string, and is only formatted if printed
+def dprint(s, debug = None, *args):
+  if (debug is None):
+    debug = default_debug_level
+  if (getDebugLevel() >= debug):
+    print (s % args if (args) else s)
+
+
+# Return: String form of the input, or '' if it can't be converted
+# Detail: str() can raise for some inputs, for e.g. ints with more digits than
+# sys.get_int_max_str_digits(), or objects with a broken __str__()
+def _asVerString(_s):
+  if (isinstance(_s, str)):
+    return _s
+
+  if (isinstance(_s, int)) and (not (-_maxVerInt < _s < _maxVerInt)):
+    return ''
+
+  try:
+    return str(_s)
+  except Exception:
+    return ''
+
+
+# Return: Input string, truncated if it is too long to be a version string (for debug messages)
+def _shortVerString(s):
+  if (len(s) > _maxVerStrLen):
+    return s[:_maxVerStrLen] + '...'
+  return s
 
 
 # Returns: True if the postgres version has already been released
 # Input: Version number in "Major.Minor" format.
 # Detail: It accepts both "a.b.c" and "a.b" version formats.
 # Error: Return False if invalid input is provided, or hasn't been released yet (even if valid)
-def isReleasedPGVersion(_s, debug = default_debug_level):
-  
-  s= str(_s)
+def isReleasedPGVersion(_s, debug = None):
+
+  s= _asVerString(_s)
 
-  if (isValidPGVersion(s)):
-    if (s in _verReleaseDates):
+  if (isValidPGVersion(s, debug)):
+    if (s in _verReleaseDates) or (s in _verPrereleaseDates):
       return True
     else:
-      dprint("Version hasn't been released yet - " + s, debug)
+      dprint("Version hasn't been released yet - %s", debug, s)
   else:
-    dprint("Invalid PG Version - " + s, debug)
+    dprint("Invalid PG Version - %s", debug, _shortVerString(s))
 
   return False
 
 # Returns: True if the postgres version is already released or technically valid
 # Input: Version number in "Major.Minor" format.
-# Detail: It accepts both "a.b.c" and "a.b" version formats.
+# Detail: It accepts both "a.b.c" and "a.b" version formats, as well as prereleases
+# such as "17beta3", "18rc1" or "19devel".
 # Error: Return False if invalid input is provided
 # Valid Version: Both 10<=MajorVersion<100 and 0<=MinorVersion<10000.
-def isValidPGVersion(_s, debug = default_debug_level):
+def isValidPGVersion(_s, debug = None):
+
+  s= _asVerString(_s)
+
+  invalid = _checkPGVersion(s)
+  if (invalid is not None):
+    dprint('%s%s', debug, invalid[1], _shortVerString(s))
+    return False
+
+  return True
 
-  s= str(_s)
+
+# Return: 'valid', or a short reason code for why the postgres version is invalid
+# Detail: For e.g. '9.7.1' returns 'unknown_pre10' and '1232' returns 'no_minor'.
+# All possible codes are listed in _verInvalidReasons.
+def getPGVersionValidity(_s):
+  invalid = _checkPGVersion(_asVerString(_s))
+  if (invalid is None):
+    return 'valid'
+  return invalid[0]
+
+
+_verInvalidReasons = (
+  'too_short',
+  'too_long',
+  'dot_at_ends',
+  'adjacent_dots',
+  'bad_characters',
+  'no_minor',
+  'too_many_dots',
+  'unknown_pre10',
+  'unknown_eol',
+  'major_too_large',
+  'minor_too_large',
+  'bad_prerelease',
+  'unknown_prerelease',
+)
+
+
+# Return: None if the version string is valid, else a tuple of (reason code, message)
+# Detail: This holds the rules behind isValidPGVersion() and getPGVersionValidity().
+# Messages are constants, to be followed by the (shortened) version string when printed,
+# so that rejecting a version doesn't build a string nobody reads.
+def _checkPGVersion(s):
 
   # Old (v9.3.1) or New (v11.0) require at least 4 characters for
   # being a valid version string
   if (len(s)<4):
-    dprint('Invalid Version String - Requires at least 4 characters - ' + s, debug)
-    return False
+    return ('too_short', 'Invalid Version String - Requires at least 4 characters - ')
 
-  if (re.match(r"^\.|.*\.$", s)):
-    dprint("Invalid Version String. Shouldn't begin or end with period / dot (.) - " + s, debug)
-    return False
+  # Reject oversized input before doing any work that grows with its size
+  if (len(s)>_maxVerStrLen):
+    return ('too_long', _tooLongMessage)
+
+  if (_reDotAtEnds.match(s)):
+    return ('dot_at_ends', "Invalid Version String. Shouldn't begin or end with period / dot (.) - ")
 
   # Fail if there are 2 or more adjacent dots (.)
-  if (re.match(r".*[\.]{2,}", s)):
-    dprint("Invalid Version String. There are 2+ adjacent periods / dots (.) - " + s, debug)
-    return False
+  if (_reAdjacentDots.match(s)):
+    return ('adjacent_dots', "Invalid Version String. There are 2+ adjacent periods / dots (.) - ")
 
   dots = s.count('.')
 
+  # Prereleases (for e.g. 17beta3) have no minor version, and follow their own rules
+  m = _rePrerelease.match(s)
+  if (m):
+    return _checkPGPrerelease(s, m)
+
   # Fail if it has anything except numbers and dot (.)
-  if (not re.match(r'^[0-9\.]*$', s)):
-    dprint("Invalid Version String. Shouldn't have anything except numbers and period / dot (.) - " + s, debug)
-    return False
+  if (not _reDigitsAndDots.match(s)):
+    return ('bad_characters', "Invalid Version String. Shouldn't have anything except numbers and period / dot (.) - ")
 
   # Fail if it has no dots. A Version requires both Major AND Minor
   # version to be present.
@@ -634,13 +779,11 @@ def isValidPGVersion(_s, debug = default_debug_level):
   # some Major Version strings to a valid Postgres Versions by appending
   # a ".0" minor version, but that is beyond scope of this function
   if (dots == 0):
-    dprint("Invalid Version String. Should have both Major and Minor version - " + s, debug)
-    return False
+    return ('no_minor', "Invalid Version String. Should have both Major and Minor version - ")
 
   # Fail if it has more than 2 dots
   if (dots > 2):
-    dprint("Invalid Version String. Has more than 2 periods / dots (.) - " + s, debug)
-    return False
+    return ('too_many_dots', "Invalid Version String. Has more than 2 periods / dots (.) - ")
 
   x = list(map(int, s.split('.', dots)))
 
@@ -650,8 +793,7 @@ def isValidPGVersion(_s, debug = default_debug_level):
     # A good reason here is versions like v9.7.1 would pass all major checks and still
     # would be Invalid, since it was never released.
     if (not s in _verReleaseDates):
-      dprint("Invalid pre v10 version. Not in the version list - " + s, debug)
-      return False
+      return ('unknown_pre10', "Invalid pre v10 version. Not in the version list - ")
 
   if (dots == 1):
     if (x[0]<=10):
@@ -660,18 +802,75 @@ def isValidPGVersion(_s, debug = default_debug_level):
       # versions like v9.7.1 would pass all major checks and would still be Invalid,
       # since it was never released.
       if (not s in _verReleaseDates):
-        dprint("Invalid EOL version. Not in the version list - " + s, debug)
-        return False
+        return ('unknown_eol', "Invalid EOL version. Not in the version list - ")
 
     if (x[0] >= 100):
-      dprint("Invalid Version String. Major Version should be less than 100 - " + s, debug)
-      return False
+      return ('major_too_large', "Invalid Version String. Major Version should be less than 100 - ")
 
     if (x[1] >= 10000):
-      dprint("Invalid Version String. Minor Version should be less than 10000 - " + s, debug)
-      return False
+      return ('minor_too_large', "Invalid Version String. Minor Version should be less than 10000 - ")
 
-  return True
+  return None
+
+
+# Return: None if the prerelease version string is valid, else a tuple of (reason code, message),
+# see _checkPGVersion()
+# Input: s and its _rePrerelease match m
+def _checkPGPrerelease(s, m):
+  major, stage, n = m.groups()
+
+  # 'devel' has no number, while beta / rc always start at 1
+  if (stage == 'devel'):
+    if (n != ''):
+      return ('bad_prerelease', "Invalid Prerelease Version String. 'devel' shouldn't be followed by a number - ")
+  elif (n == '') or (int(n) == 0):
+    return ('bad_prerelease', "Invalid Prerelease Version String. Beta / RC number should be 1 or more - ")
+
+  # Pre v10 and EOL majors: we have an accurate list, so just check that list
+  if ('.' in major) or (int(major) <= 10):
+    if (not s in _verPrereleaseDates):
+      return ('unknown_prerelease', "Invalid EOL prerelease version. Not in the version list - ")
+
+  elif (int(major) >= 100):
+    return ('major_too_large', "Invalid Version String. Major Version should be less than 100 - ")
+
+  return None
+
+
+# Return: Tuple of (stage, number) for prerelease versions, for e.g. '17beta3' returns
+# ('beta', 3) and '19devel' returns ('devel', 0)
+# Error: Return False if invalid input is provided, or if it isn't a prerelease (for e.g. '17.0')
+def getPGPrerelease(_s):
+  s= _asVerString(_s)
+
+  if (not isValidPGVersion(s)):
+    return False
+
+  m = _rePrerelease.match(s)
+  if (not m):
+    return False
+
+  return (m.group(2), int(m.group(3) or 0))
+
+
+# Return: A key that sorts postgres versions in release order, where prereleases
+# come before the .0 release (devel < beta < rc < .0 < .1)
+# Detail: For e.g. sorted(versions, key=getPGVersionSortKey)
+# Error: Return False if invalid input is provided
+def getPGVersionSortKey(_s):
+  s= _asVerString(_s)
+
+  n = getPGVerNumFromString(s)
+  if (n is False):
+    return False
+
+  m = _rePrerelease.match(s)
+  if (m):
+    return (n, _prereleaseStages[m.group(2)], int(m.group(3) or 0))
+
+  # Split off the minor version, so that the major comes first, for e.g. 90601 -> (90600, 3, 1)
+  minor = (n % 10000) if (n >= 100000) else (n % 100)
+  return (n - minor, _releaseStage, minor)
 
 
 # Return: Major version part of the postgres version provided
@@ -681,6 +880,11 @@ def getMajorPGVersion(v):
   if (not isValidPGVersion(s)):
     return False
 
+  # This is a prerelease, for e.g. 17beta3 (or pre-v10, 9.6beta1)
+  m = _rePrerelease.match(s)
+  if (m):
+    return float(m.group(1)) if ('.' in m.group(1)) else int(m.group(1))
+
   dots = s.count('.')
   x = list(map(int, s.split('.', dots)))
 
@@ -696,13 +900,17 @@ def getMajorPGVersion(v):
 
 
 # Return: Minor version of the postgres version provided
+# Detail: Prereleases (for e.g. 17beta3) return 0, same as their server_version_num
 # Error: Return False if invalid input is provided
 def getMinorPGVersion(_s):
-  s= str(_s)
+  s= _asVerString(_s)
 
   if (not isValidPGVersion(s)):
     return False
 
+  if (_rePrerelease.match(s)):
+    return 0
+
   dots = s.count('.')
   x = list(map(int, s.split('.', dots)))
 
@@ -720,7 +928,7 @@ def getMinorPGVersion(_s):
 # Return: A dict of [Major, Minor] extracted from postgres version provided
 # Error: Return False if invalid input is provided
 def parsePGVersion(_s):
-  s= str(_s)
+  s= _asVerString(_s)
 
   if (not isValidPGVersion(s)):
     return False
@@ -739,9 +947,9 @@ def parsePGVersion(_s):
 # Error: Return input string if input can't be converted into a valid PG version
 def appendMinorVersionIfRequired(_s):
 
-  s= str(_s)
+  s= _asVerString(_s)
 
-  if (not isValidPGVersion(s)):
+  if (not isValidPGVersion(s)) and (len(s) < _maxVerStrLen):
     attempt1 = s + ".0"
     if (isValidPGVersion(attempt1)):
 
@@ -760,11 +968,16 @@ def appendMinorVersionIfRequired(_s):
 # Documentation: https://www.postgresql.org/docs/devel/runtime-config-preset.html#GUC-SERVER-VERSION-NUM
 def getPGVerNumFromString(_s):
 
-  s= str(_s)
+  s= _asVerString(_s)
 
   if (not isValidPGVersion(s)):
     return False
 
+  # Prereleases have the version number of the .0 release, for e.g. 17beta3 -> 170000
+  m = _rePrerelease.match(s)
+  if (m):
+    s = m.group(1)
+
   dots = s.count('.')
 
   x = list(map(int, s.split('.', dots)))
@@ -782,27 +995,45 @@ def getPGVerNumFromString(_s):
 
 # Return: Release Date when the postgres version was released
 # Detail: For e.g. v12.2 would return 13th Feb 2020 in the date-format yyyy-mm-dd.
-def getVerReleaseDate(ver):
+def getVerReleaseDate(_ver):
+
+  ver = _asVerString(_ver)
 
   if not isValidPGVersion(ver):
     return '0'
 
-  if (ver in _verReleaseDates):
-    return _verReleaseDates[ver]
+  dt = _getReleaseDate(ver)
+  if (dt is not None):
+    return dt
   else:
-    dprint('Release date unavailable for release: ' + ver)
+    dprint('Release date unavailable for release: %s', None, ver)
   return '0'
 
 
+# Return: Release date of a (valid) version string, from the release or prerelease list, or None
+def _getReleaseDate(s):
+  dt = _verReleaseDates.get(s)
+  if (dt is None):
+    dt = _verPrereleaseDates.get(s)
+  return dt
+
+
 # Return: Return date in YYYYMMDD format
 # Input: Date in YYYY-MM-DD
+# Error: Return 0 if the input isn't a date in that format
 def convToYYYYMMDD(dt):
-  return int(datetime.strptime(dt, '%Y-%m-%d').strftime('%Y%m%d'))
+  try:
+    return int(datetime.strptime(dt, '%Y-%m-%d').strftime('%Y%m%d'))
+  except (TypeError, ValueError):
+    return 0
 
 
 # Return: True if v1 was released *after* v2
 # Detail: For e.g. IsVerReleasedAfter('10.12', '11.5') returns True
-def IsVerReleasedAfter(v1, v2):
+def IsVerReleasedAfter(_v1, _v2):
+
+  v1 = _asVerString(_v1)
+  v2 = _asVerString(_v2)
 
   if not isValidPGVersion(v1):
     return False
@@ -810,18 +1041,117 @@ def IsVerReleasedAfter(v1, v2):
   if not isValidPGVersion(v2):
     return False
 
-  if (v1 in _verReleaseDates) and (v2 in _verReleaseDates):
-    if (v1 in _verReleaseDates) and (v2 in _verReleaseDates):
-      if (convToYYYYMMDD(_verReleaseDates[v1])>convToYYYYMMDD(_verReleaseDates[v2])):
+  d1 = _getReleaseDate(v1)
+  d2 = _getReleaseDate(v2)
+
+  if (d1 is not None):
+    if (d2 is not None):
+      if (convToYYYYMMDD(d1)>convToYYYYMMDD(d2)):
         return True
     else:
-      dprint('Release date unavailable for release: ' + v2)
+      dprint('Release date unavailable for release: %s', None, v2)
   else:
-    dprint('Release date unavailable for release: ' + v1)
+    dprint('Release date unavailable for release: %s', None, v1)
 
   return False
 
+
+# Return: Latest released version for the major version of the postgres version provided
+# Detail: For e.g. both '15.4' and '15' would return '15.17'
+# Error: Return False if invalid input is provided, or if nothing was released for that major version
+def getLatestMinorPGVersion(_s):
+  Maj = getMajorPGVersion(_s)
+  if (Maj is False):
+    return False
+
+  return _verLatestMinor.get(Maj, False)
+
+
+# Return: Release ordinal of the postgres version provided, i.e. the position of its
+# release date among all release dates (versions released together share an ordinal)
+# Detail: Comparing ordinals is the same as comparing release dates, for e.g.
+# getVerReleaseOrdinal('12.14') > getVerReleaseOrdinal('15.1') (see IsVerReleasedAfter())
+# Error: Return False if invalid input is provided, or the version hasn't been released
+def getVerReleaseOrdinal(_s):
+  s= _asVerString(_s)
+
+  if (not isValidPGVersion(s)):
+    return False
+
+  return _verReleaseOrdinals.get(s, False)
+
+
+# Return: List of versions released on the same date as the postgres version provided
+# (its release train), itself included, newest major version first
+# Detail: For e.g. getReleaseTrain('14.22') returns ['18.3', '17.9', '16.13', '15.17', '14.22']
+# Error: Return False if invalid input is provided, or the version hasn't been released
+def getReleaseTrain(_s):
+  s= _asVerString(_s)
+
+  if (not isValidPGVersion(s)):
+    return False
+
+  dt = _verReleaseDates.get(s)
+  if (dt is None):
+    return False
+
+  return list(_releaseTrains[dt])
+
+
+# Return: Version of the major version provided at the same patch level as the postgres
+# version provided, i.e. the latest release of that major on or before its release date
+# Detail: For e.g. getEquivalentPGVersion('13.22', 16) returns '16.10' (both released on 2025-08-14)
+# Input: major is a major version (for e.g. 16 or '9.6'), or any version of it (for e.g. '16.2')
+# Error: Return False if invalid input is provided, the version hasn't been released, or
+# nothing had been released for that major version by then
+def getEquivalentPGVersion(_s, major):
+  ordinal = getVerReleaseOrdinal(_s)
+  if (ordinal is False):
+    return False
+
+  Maj = getMajorPGVersion(major)
+  if (Maj is False):
+    return False
+
+  return _verEquivalents.get((ordinal, Maj), False)
+
+
+# Release ordinal for each released version, see getVerReleaseOrdinal()
+_verReleaseOrdinals = {}
+_releaseDateOrdinals = {d: i for i, d in enumerate(sorted(set(_verReleaseDates.values())))}
+for _ver, _dt in _verReleaseDates.items():
+  _verReleaseOrdinals[_ver] = _releaseDateOrdinals[_dt]
+
+# Latest released minor version for each major version, keyed by getMajorPGVersion()
+_verLatestMinor = {}
+for _ver in _verReleaseDates:
+  if (isValidPGVersion(_ver)):
+    _maj = getMajorPGVersion(_ver)
+    if ((_maj not in _verLatestMinor) or (getMinorPGVersion(_ver) > getMinorPGVersion(_verLatestMinor[_maj]))):
+      _verLatestMinor[_maj] = _ver
+
+# Versions released on each release date, newest major version first, see getReleaseTrain()
+_releaseTrains = {}
+for _ver in sorted(filter(isValidPGVersion, _verReleaseDates), key=getPGVersionSortKey, reverse=True):
+  _releaseTrains.setdefault(_verReleaseDates[_ver], []).append(_ver)
+
+# Latest version of each major version as of each release date, keyed by (release ordinal,
+# major version), see getEquivalentPGVersion()
+_verEquivalents = {}
+_latestAsOf = {}
+for _dt in sorted(_releaseTrains):
+  for _ver in reversed(_releaseTrains[_dt]):
+    _latestAsOf[getMajorPGVersion(_ver)] = _ver
+  for _maj, _ver in _latestAsOf.items():
+    _verEquivalents[(_releaseDateOrdinals[_dt], _maj)] = _ver
+
+
 def main(argv):
+  if (len(argv) >= 2) and (argv[1] == '--serve'):
+    import pgversion_server
+    pgversion_server.main(argv[2:])
+    return
+
   if len(sys.argv) == 2:
     s = sys.argv[1]
   else:
@@ -0,0 +1,175 @@
+# Mergeable streaming aggregates over a fleet of Postgres Version Strings.
+
+# Features
+# - Counts by major version, by minor versions behind the latest, by release age and by validity reason
+# - Constant memory, however many versions stream through
+# - Two aggregates merge associatively (a + b + c in any grouping gives the same result),
+#   so partial results from many processes / hosts can be combined without re-reading raw data
+# - Compact serialization (toBytes() / fromBytes())
+
+# Usage:
+#   agg = PGFleetAggregate(asOf='2026-03-01')
+#   agg.addMany(['17.9', '15.4', '9.6.24', 'junk'])
+#   blob = agg.toBytes()                       # ship to a central collector
+#   total = PGFleetAggregate.fromBytes(blob) + otherAgg
+#   total.byMajor, total.byMinorsBehind, total.byAgeBucket, total.byValidity
+
+import json
+import zlib
+from collections import Counter
+from datetime import date
+from functools import lru_cache
+
+import pgversion
+
+_serialFormat = 1
+
+# Release age buckets, as (upper bound in days, bucket name)
+_ageBuckets = (
+  (90, '<90d'),
+  (365, '90d-1y'),
+  (2 * 365, '1y-2y'),
+  (5 * 365, '2y-5y'),
+)
+_ageBucketOldest = '5y+'
+_ageBucketUnreleased = 'unreleased'
+_unknown = 'unknown'
+
+# Default reference date for release ages: the most recent release we know of.
+# (Using today's date would make aggregates built on different days unmergeable.)
+_defaultAsOf = max(pgversion._verReleaseDates.values())
+
+
+# Return: Tuple of (major, minors behind latest, age bucket, validity reason) for a version
+# Detail: Fleet data has few distinct versions, so this is cached
+@lru_cache(maxsize=4096)
+def _classifyPGVersion(s, asOf):
+  validity = pgversion.getPGVersionValidity(s)
+  if (validity != 'valid'):
+    return (_unknown, _unknown, _unknown, validity)
+
+  major = str(pgversion.getMajorPGVersion(s))
+
+  released = pgversion.getVerReleaseDate(s)
+
+  # An unreleased minor (for e.g. 17.99) isn't up to date, its distance to the latest is unknown
+  latest = pgversion.getLatestMinorPGVersion(s)
+  if (latest is False) or (released == '0'):
+    behind = _unknown
+  else:
+    behind = str(max(pgversion.getMinorPGVersion(latest) - pgversion.getMinorPGVersion(s), 0))
+
+  if (released == '0'):
+    bucket = _ageBucketUnreleased
+  else:
+    days = (date.fromisoformat(asOf) - date.fromisoformat(released)).days
+    bucket = _ageBucketOldest
+    for limit, name in _ageBuckets:
+      if (days < limit):
+        bucket = name
+        break
+
+  return (major, behind, bucket, validity)
+
+
+class PGFleetAggregate:
+
+  # Input: asOf is the reference date (YYYY-MM-DD) for release age buckets.
+  # Only aggregates with the same asOf can be merged.
+  def __init__(self, asOf=None):
+    self.asOf = asOf or _defaultAsOf
+    # Fail early on a malformed date, rather than on the first add()
+    date.fromisoformat(self.asOf)
+    self.count = 0
+    self.byMajor = Counter()
+    self.byMinorsBehind = Counter()
+    self.byAgeBucket = Counter()
+    self.byValidity = Counter()
+
+  # Add a single version (string, int or float, as accepted by isValidPGVersion())
+  def add(self, v):
+    major, behind, bucket, validity = _classifyPGVersion(pgversion._asVerString(v), self.asOf)
+    self.count += 1
+    self.byValidity[validity] += 1
+    if (validity == 'valid'):
+      self.byMajor[major] += 1
+      self.byMinorsBehind[behind] += 1
+      self.byAgeBucket[bucket] += 1
+
+  def addMany(self, versions):
+    for v in versions:
+      self.add(v)
+    return self
+
+  # Merge other into this aggregate (in place)
+  # Error: Raises ValueError if the two aggregates have a different asOf date
+  def update(self, other):
+    if (other.asOf != self.asOf):
+      raise ValueError('Cannot merge aggregates with different asOf dates - ' + self.asOf + ' and ' + other.asOf)
+    self.count += other.count
+    self.byMajor.update(other.byMajor)
+    self.byMinorsBehind.update(other.byMinorsBehind)
+    self.byAgeBucket.update(other.byAgeBucket)
+    self.byValidity.update(other.byValidity)
+    return self
+
+  # Return: New aggregate combining this one and other
+  def merge(self, other):
+    return PGFleetAggregate(self.asOf).update(self).update(other)
+
+  __add__ = merge
+
+  def __eq__(self, other):
+    if (not isinstance(other, PGFleetAggregate)):
+      return NotImplemented
+    return self.toDict() == other.toDict()
+
+  def __repr__(self):
+    return 'PGFleetAggregate(asOf=' + repr(self.asOf) + ', count=' + str(self.count) + ')'
+
+  def toDict(self):
+    return {
+      'format': _serialFormat,
+      'asOf': self.asOf,
+      'count': self.count,
+      'byMajor': dict(self.byMajor),
+      'byMinorsBehind': dict(self.byMinorsBehind),
+      'byAgeBucket': dict(self.byAgeBucket),
+      'byValidity': dict(self.byValidity),
+    }
+
+  # Error: Raises ValueError if d wasn't produced by toDict()
+  @classmethod
+  def fromDict(cls, d):
+    if (not isinstance(d, dict)) or (d.get('format') != _serialFormat):
+      raise ValueError('Unsupported aggregate format')
+    try:
+      agg = cls(d['asOf'])
+      agg.count = int(d['count'])
+      agg.byMajor.update(d['byMajor'])
+      agg.byMinorsBehind.update(d['byMinorsBehind'])
+      agg.byAgeBucket.update(d['byAgeBucket'])
+      agg.byValidity.update(d['byValidity'])
+    except (KeyError, TypeError) as e:
+      raise ValueError('Invalid aggregate - ' + repr(e))
+    return agg
+
+  # Return: Compact (zlib compressed JSON) serialization of the aggregate
+  def toBytes(self):
+    return zlib.compress(json.dumps(self.toDict(), separators=(',', ':'), sort_keys=True).encode())
+
+  @classmethod
+  def fromBytes(cls, b):
+    try:
+      d = json.loads(zlib.decompress(b))
+    except (zlib.error, ValueError):
+      raise ValueError('Invalid serialized aggregate')
+    return cls.fromDict(d)
+
+
+# Return: Single aggregate combining all the aggregates provided
+def mergePGFleetAggregates(aggregates, asOf=None):
+  total = None
+  for agg in aggregates:
+    total = PGFleetAggregate(agg.asOf).update(agg) if total is None else total.update(agg)
+  return total if total is not None else PGFleetAggregate(asOf)
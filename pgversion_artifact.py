@@ -0,0 +1,302 @@
+# Identify the Postgres major version that produced a WAL segment or a dump file,
+# from its header alone (without pg_waldump / pg_restore).
+
+# Features
+# - Only the first page of each file is mapped (mmap + memoryview), however large the file is
+# - WAL segments: the page header magic (XLOG_PAGE_MAGIC) changes with every major version
+#   that changes the WAL format, and is mapped to the major version with a per-major table
+# - Custom / directory format dumps: the archive header carries the server and pg_dump versions
+# - Plain SQL dumps: the "Dumped from database version" header comment
+# - Batch mode that reads many files in parallel on a bounded thread pool
+
+# Usage:
+#   python pgversion_artifact.py /backups/wal /backups/dumps/db.dump --workers 32
+
+#   sniffPGArtifact('000000010000000000000001')  -> PGArtifactInfo(..., kind='wal', major=17, ...)
+#   for a in sniffPGArtifacts(paths):
+#     print(a.path, a.kind, a.major, a.version)
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pgversion
+
+# kind is 'wal', 'dump' (custom / directory format) or 'sql' (plain format), None if not recognised
+# major is the major version that produced the file, False if unknown
+# version is the server version the dump was taken from (for e.g. '17.2'), None for WAL segments
+# detail is a dict of other header fields (for e.g. timeline and segment size, or the pg_dump version)
+# error is None, or one of 'unreadable', 'truncated', 'unknown_format' or 'unknown_magic'
+PGArtifactInfo = namedtuple('PGArtifactInfo', ['path', 'kind', 'major', 'version', 'detail', 'error'])
+
+# Enough for any WAL page header and any dump header (short of a very long database name)
+_pageSize = 8192
+
+_defaultWorkers = 16
+
+# XLOG_PAGE_MAGIC (src/include/access/xlog_internal.h) of each major version
+_walMagicMajors = {
+  0xD064: 9.0,
+  0xD066: 9.1,
+  0xD071: 9.2,
+  0xD075: 9.3,
+  0xD07E: 9.4,
+  0xD087: 9.5,
+  0xD093: 9.6,
+  0xD097: 10,
+  0xD098: 11,
+  0xD101: 12,
+  0xD106: 13,
+  0xD10D: 14,
+  0xD110: 15,
+  0xD113: 16,
+  0xD116: 17,
+  0xD118: 18,
+}
+
+# XLP_LONG_HEADER, set on the first page of every segment
+_walLongHeader = 0x0002
+
+_dumpMagic = b'PGDMP'
+_dumpFormats = {1: 'custom', 2: 'files', 3: 'tar', 4: 'null', 5: 'directory'}
+_dumpCompression = {0: 'none', 1: 'gzip', 2: 'lz4', 3: 'zstd'}
+
+_sqlMagic = b'--'
+_reSqlDumpVersion = re.compile(rb'^-- Dumped from database version (\S+)', re.M)
+_reSqlToolVersion = re.compile(rb'^-- Dumped by pg_dump version (\S+)', re.M)
+
+
+class _Truncated(Exception):
+  pass
+
+
+# Return: Major version for a WAL page magic, for e.g. 0xD116 -> 17
+# Error: Return False if the magic is unknown
+def getWALMagicMajor(magic):
+  return _walMagicMajors.get(magic, False)
+
+
+# Return: (major, version) for a server version string, for e.g. '17.2 (Debian 17.2-1)' -> (17, '17.2')
+# Error: Return (False, None) if it isn't a valid Postgres version
+def _parseServerVersion(s):
+  s = s.split(' ', 1)[0]
+  major = pgversion.getMajorPGVersion(s)
+  if (major is False):
+    return (False, None)
+  return (major, s)
+
+
+# Return: (major, detail) from a WAL page header
+# Error: Return None if the magic is unknown (in either byte order)
+def _parseWALHeader(buf):
+  if (len(buf) < 2):
+    raise _Truncated()
+
+  for order in ('<', '>'):
+    major = getWALMagicMajor(struct.unpack_from(order + 'H', buf, 0)[0])
+    if (major is not False):
+      break
+  else:
+    return None
+
+  # xlp_rem_len (added in 9.3) moves the long header fields along
+  short = struct.Struct(order + 'HHIQI' if (major >= 9.3) else order + 'HHIQ')
+  headerLen = (short.size + 7) // 8 * 8
+  if (len(buf) < headerLen):
+    raise _Truncated()
+  fields = short.unpack_from(buf, 0)
+  detail = {'timeline': fields[2], 'pageAddress': fields[3]}
+
+  if (fields[1] & _walLongHeader):
+    if (len(buf) < headerLen + 16):
+      raise _Truncated()
+    sysid, segSize, blockSize = struct.unpack_from(order + 'QII', buf, headerLen)
+    detail.update(systemIdentifier=sysid, segmentSize=segSize, blockSize=blockSize)
+
+  return (major, detail)
+
+
+class _DumpReader:
+
+  # Reads pg_dump's ReadByte() / ReadInt() / ReadStr() encodings from a buffer
+  def __init__(self, buf):
+    self.buf = buf
+    self.pos = 0
+    self.intSize = 4
+
+  def readByte(self):
+    if (self.pos >= len(self.buf)):
+      raise _Truncated()
+    self.pos += 1
+    return self.buf[self.pos - 1]
+
+  # A sign byte followed by intSize bytes of magnitude, least significant first
+  def readInt(self):
+    sign = self.readByte()
+    end = self.pos + self.intSize
+    if (end > len(self.buf)):
+      raise _Truncated()
+    value = int.from_bytes(self.buf[self.pos:end], 'little')
+    self.pos = end
+    return -value if (sign) else value
+
+  # An int length (-1 for NULL) followed by that many bytes
+  def readStr(self):
+    n = self.readInt()
+    if (n < 0):
+      return None
+    end = self.pos + n
+    if (end > len(self.buf)):
+      raise _Truncated()
+    s = bytes(self.buf[self.pos:end]).decode('utf-8', 'replace')
+    self.pos = end
+    return s
+
+
+# Return: (major, version, detail) from a custom / directory format archive header
+# Detail: Follows ReadHead() in src/bin/pg_dump/pg_backup_archiver.c
+def _parseDumpHeader(buf):
+  r = _DumpReader(buf)
+  r.pos = len(_dumpMagic)
+  vmaj = r.readByte()
+  vmin = r.readByte()
+  vrev = r.readByte() if ((vmaj > 1) or (vmin > 0)) else 0
+  archive = (vmaj, vmin, vrev)
+
+  r.intSize = r.readByte()
+  if (not 0 < r.intSize <= 32):
+    return None
+  offSize = r.readByte() if (archive >= (1, 7, 0)) else r.intSize
+  fmt = r.readByte()
+  detail = {'archiveVersion': str(vmaj) + '.' + str(vmin) + '.' + str(vrev),
+            'format': _dumpFormats.get(fmt, fmt), 'intSize': r.intSize, 'offSize': offSize}
+
+  if (archive >= (1, 15, 0)):
+    c = r.readByte()
+    detail['compression'] = _dumpCompression.get(c, c)
+  elif (archive >= (1, 4, 0)):
+    detail['compression'] = r.readInt()
+  elif (archive >= (1, 2, 0)):
+    detail['compression'] = r.readByte()
+
+  if (archive >= (1, 4, 0)):
+    sec, mins, hour, mday, mon, year, isdst = (r.readInt() for _ in range(7))
+    detail['created'] = '%04d-%02d-%02d %02d:%02d:%02d' % (year + 1900, mon + 1, mday, hour, mins, sec)
+    detail['dbname'] = r.readStr()
+
+  major, version = (False, None)
+  if (archive >= (1, 10, 0)):
+    remote = r.readStr()
+    detail['dumpVersion'] = r.readStr()
+    if (remote is not None):
+      major, version = _parseServerVersion(remote)
+
+  return (major, version, detail)
+
+
+# Return: (major, version, detail) from the header comment of a plain SQL dump
+def _parseSqlHeader(buf):
+  head = bytes(buf)
+  m = _reSqlDumpVersion.search(head)
+  if (m is None):
+    return None
+  major, version = _parseServerVersion(m.group(1).decode('ascii', 'replace'))
+  t = _reSqlToolVersion.search(head)
+  detail = {} if (t is None) else {'dumpVersion': t.group(1).decode('ascii', 'replace')}
+  return (major, version, detail)
+
+
+def _sniffBuffer(path, buf):
+  try:
+    if (buf[:len(_dumpMagic)] == _dumpMagic):
+      parsed = _parseDumpHeader(buf)
+      if (parsed is None):
+        return PGArtifactInfo(path, 'dump', False, None, {}, 'unknown_format')
+      return PGArtifactInfo(path, 'dump', parsed[0], parsed[1], parsed[2], None)
+
+    if (buf[:len(_sqlMagic)] == _sqlMagic):
+      parsed = _parseSqlHeader(buf)
+      if (parsed is not None):
+        return PGArtifactInfo(path, 'sql', parsed[0], parsed[1], parsed[2], None)
+
+    parsed = _parseWALHeader(buf)
+    if (parsed is None):
+      return PGArtifactInfo(path, None, False, None, {}, 'unknown_magic')
+    return PGArtifactInfo(path, 'wal', parsed[0], None, parsed[1], None)
+  except _Truncated:
+    return PGArtifactInfo(path, None, False, None, {}, 'truncated')
+
+
+# Return: PGArtifactInfo for a WAL segment or dump file (or a directory format dump directory)
+# Detail: Only the first page of the file is mapped into memory
+def sniffPGArtifact(path):
+  target = os.path.join(path, 'toc.dat') if (os.path.isdir(path)) else path
+  try:
+    with open(target, 'rb') as f:
+      size = os.fstat(f.fileno()).st_size
+      if (size == 0):
+        return PGArtifactInfo(path, None, False, None, {}, 'truncated')
+      try:
+        m = mmap.mmap(f.fileno(), min(size, _pageSize), access=mmap.ACCESS_READ)
+      except (OSError, ValueError):
+        # Not mappable (for e.g. a pipe, or some network filesystems)
+        return _sniffBuffer(path, f.read(_pageSize))
+      try:
+        buf = memoryview(m)
+        try:
+          return _sniffBuffer(path, buf)
+        finally:
+          buf.release()
+      finally:
+        m.close()
+  except OSError:
+    return PGArtifactInfo(path, None, False, None, {}, 'unreadable')
+
+
+# Return: Generator of PGArtifactInfo for each path provided, in the same order
+# Detail: Files are read on a thread pool of workers threads, with a bounded number of
+# files in flight, so paths can be a (lazy) iterable of millions of files
+def sniffPGArtifacts(paths, workers=_defaultWorkers):
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    inFlight = deque()
+    for path in paths:
+      inFlight.append(pool.submit(sniffPGArtifact, path))
+      if (len(inFlight) >= workers * 4):
+        yield inFlight.popleft().result()
+    while (inFlight):
+      yield inFlight.popleft().result()
+
+
+# Return: Generator of file paths under each path (directory format dumps are returned as a whole)
+def _expandPaths(paths):
+  for p in paths:
+    if (not os.path.isdir(p)) or (os.path.exists(os.path.join(p, 'toc.dat'))):
+      yield p
+      continue
+    for dirpath, dirnames, filenames in os.walk(p):
+      for d in list(dirnames):
+        if (os.path.exists(os.path.join(dirpath, d, 'toc.dat'))):
+          dirnames.remove(d)
+          yield os.path.join(dirpath, d)
+      for name in filenames:
+        yield os.path.join(dirpath, name)
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Identify the Postgres major version of WAL segments and dump files')
+  parser.add_argument('paths', nargs='+')
+  parser.add_argument('--workers', type=int, default=_defaultWorkers)
+  args = parser.parse_args(argv)
+
+  out = sys.stdout
+  for a in sniffPGArtifacts(_expandPaths(args.paths), args.workers):
+    major = '' if (a.major is False) else str(a.major)
+    out.write(a.path + ',' + (a.kind or '') + ',' + major + ',' + (a.version or '') + ',' + (a.error or '') + '\n')
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
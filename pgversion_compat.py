@@ -0,0 +1,204 @@
+# pg_upgrade / pg_dump / replication compatibility between Postgres major versions.
+
+# Features
+# - Rules for every (source, target) major version pair, precomputed into a dense matrix
+#   so that each pair query is a single lookup
+# - Upgrade planner: given a fleet and a target major version, returns the feasible
+#   methods and the pg_upgrade path (including any intermediate hops) per source major
+
+# Rules (from the pg_upgrade / pg_dump documentation of each release)
+# - pg_upgrade: target newer than source. 9.0 - 9.2 upgrade from 8.3+, 9.3 - 14 from 8.4+, 15+ from 9.2+
+# - pg_dump (run from the target): target same or newer than source. Up to 9.6 dumps from 7.0+,
+#   10 - 14 from 8.0+, 15+ from 9.2+
+# - Physical (streaming) replication: same major version, 9.0+
+# - Logical replication (built-in publications / subscriptions): both sides 10+
+
+# Usage:
+#   canPGUpgrade('9.6.24', '17')               -> True
+#   canPGUpgrade('8.3.23', '17')               -> False
+#   planPGUpgrades(['8.3.23', '9.6.24', '16.2'], 17)
+
+from collections import namedtuple, deque
+
+import pgversion
+
+PG_UPGRADE = 1
+PG_DUMP = 2
+PHYSICAL_REPLICATION = 4
+LOGICAL_REPLICATION = 8
+
+_methodNames = (
+  (PG_UPGRADE, 'pg_upgrade'),
+  (PG_DUMP, 'pg_dump'),
+  (LOGICAL_REPLICATION, 'logical_replication'),
+)
+
+# Oldest supported source major, as (first target major, oldest source major)
+_pgUpgradeMinSource = ((15, 9.2), (9.3, 8.4), (9.0, 8.3))
+_pgDumpMinSource = ((15, 9.2), (10, 8.0), (7.0, 7.0))
+
+_noHop = 255
+
+
+def _minSource(rules, target):
+  for firstTarget, oldest in rules:
+    if (target >= firstTarget):
+      return oldest
+  return None
+
+
+def _pairFlags(src, dst):
+  flags = 0
+
+  oldest = _minSource(_pgUpgradeMinSource, dst)
+  if (oldest is not None) and (oldest <= src < dst):
+    flags |= PG_UPGRADE
+
+  oldest = _minSource(_pgDumpMinSource, dst)
+  if (oldest is not None) and (oldest <= src <= dst):
+    flags |= PG_DUMP
+
+  if (src == dst) and (src >= 9.0):
+    flags |= PHYSICAL_REPLICATION
+
+  if (src >= 10) and (dst >= 10):
+    flags |= LOGICAL_REPLICATION
+
+  return flags
+
+
+# Every released major version from 7.0 onwards, oldest first
+_majors = sorted(m for m in pgversion._verLatestMinor if m >= 7.0)
+_majorIndex = {m: i for i, m in enumerate(_majors)}
+_n = len(_majors)
+
+# Dense n x n matrix of compatibility flags, row = source, column = target
+_matrix = bytearray(_n * _n)
+for _i, _src in enumerate(_majors):
+  for _j, _dst in enumerate(_majors):
+    _matrix[_i * _n + _j] = _pairFlags(_src, _dst)
+
+
+# Fewest-hops pg_upgrade path between every pair, stored as the next hop (index) in a
+# dense n x n matrix. Among equally short paths, the newest intermediate major wins.
+def _buildNextHops():
+  nextHop = bytearray([_noHop]) * (_n * _n)
+  for i in range(_n):
+    first = {}
+    queue = deque()
+    for j in range(_n - 1, -1, -1):
+      if (_matrix[i * _n + j] & PG_UPGRADE):
+        first[j] = j
+        queue.append(j)
+    while (queue):
+      k = queue.popleft()
+      for j in range(_n - 1, -1, -1):
+        if (j not in first) and (j != i) and (_matrix[k * _n + j] & PG_UPGRADE):
+          first[j] = first[k]
+          queue.append(j)
+    for j, hop in first.items():
+      nextHop[i * _n + j] = hop
+  return nextHop
+
+_nextHop = _buildNextHops()
+
+
+# Return: Index of the major version of the postgres version provided (for e.g. '16.2', '16' or 9.6)
+# Error: Return None if invalid input is provided, or the major version is unknown
+def _majorIdx(v):
+  m = pgversion.getMajorPGVersion(v)
+  if (m is False):
+    return None
+  return _majorIndex.get(m)
+
+
+# Return: Compatibility flags (PG_UPGRADE | PG_DUMP | PHYSICAL_REPLICATION | LOGICAL_REPLICATION)
+# for moving from the src to the dst postgres version
+# Error: Return 0 if either version is invalid or unknown
+def getPGCompatibility(src, dst):
+  i = _majorIdx(src)
+  j = _majorIdx(dst)
+  if (i is None) or (j is None):
+    return 0
+  return _matrix[i * _n + j]
+
+
+# Return: True if pg_upgrade can upgrade a src cluster to the dst major version
+def canPGUpgrade(src, dst):
+  return bool(getPGCompatibility(src, dst) & PG_UPGRADE)
+
+
+# Return: True if pg_dump from the dst major version can dump a src server
+def canPGDump(src, dst):
+  return bool(getPGCompatibility(src, dst) & PG_DUMP)
+
+
+# Return: True if a dst standby can stream (physical replication) from a src primary
+def canPhysicalReplicate(src, dst):
+  return bool(getPGCompatibility(src, dst) & PHYSICAL_REPLICATION)
+
+
+# Return: True if a dst subscriber can subscribe to a src publisher (built-in logical replication)
+def canLogicalReplicate(src, dst):
+  return bool(getPGCompatibility(src, dst) & LOGICAL_REPLICATION)
+
+
+# Return: List of major versions for a pg_upgrade from src to dst, including src, any
+# intermediate hops and dst. For e.g. 8.3 -> 17 returns [8.3, 9.2, 17], and 17 -> 17 returns [17]
+# Error: Return None if there is no pg_upgrade path (or either version is invalid)
+def getPGUpgradePath(src, dst):
+  i = _majorIdx(src)
+  j = _majorIdx(dst)
+  if (i is None) or (j is None):
+    return None
+  return _upgradePath(i, j)
+
+
+def _upgradePath(i, j):
+  if (i == j):
+    return [_majors[i]]
+  if (_nextHop[i * _n + j] == _noHop):
+    return None
+  path = [_majors[i]]
+  while (i != j):
+    i = _nextHop[i * _n + j]
+    path.append(_majors[i])
+  return path
+
+
+# sourceMajor is None for invalid versions
+# methods are the direct methods that work from sourceMajor to the target ('pg_upgrade', 'pg_dump', 'logical_replication')
+# path is the pg_upgrade path (see getPGUpgradePath()), None if there is none
+PGUpgradePlan = namedtuple('PGUpgradePlan', ['sourceMajor', 'methods', 'path', 'instances'])
+
+
+# Return: List of PGUpgradePlan, one per source major version found in the fleet (oldest first)
+# Input: fleet is an iterable of versions, or of (instance, version) tuples
+# Detail: The fleet is read once; instances keeps the fleet entries for each source major
+# Error: Return an empty list if the target is invalid or unknown
+def planPGUpgrades(fleet, target):
+  j = _majorIdx(target)
+  if (j is None):
+    return []
+
+  groups = {}
+  majorOf = {}
+  for entry in fleet:
+    v = entry[1] if isinstance(entry, tuple) else entry
+    try:
+      i = majorOf[v]
+    except KeyError:
+      i = majorOf[v] = _majorIdx(v)
+    except TypeError:
+      i = _majorIdx(v)
+    groups.setdefault(i, []).append(entry)
+
+  plans = []
+  for i in sorted(groups, key=lambda i: -1 if (i is None) else i):
+    if (i is None):
+      plans.append(PGUpgradePlan(None, (), None, groups[i]))
+      continue
+    flags = _matrix[i * _n + j]
+    methods = tuple(name for flag, name in _methodNames if (flags & flag))
+    plans.append(PGUpgradePlan(_majors[i], methods, _upgradePath(i, j), groups[i]))
+  return plans
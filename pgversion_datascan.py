@@ -0,0 +1,214 @@
+# Scanner for Postgres data directories and tablespaces on a host.
+
+# Features
+# - Walks directory trees with os.scandir(), one directory per task on a bounded thread
+#   pool, so that slow (for e.g. network) storage doesn't serialize on I/O latency
+# - Reads the PG_VERSION file (major version only, for e.g. '17' or '9.6') of every data directory
+# - Reports data directories whose major version doesn't match the expected (running binary) version
+# - Reports orphaned tablespace directories (PG_<major>_<catversion>) that no data directory's
+#   pg_tblspc links to, for e.g. those left behind after a pg_upgrade
+# - Reports stale data directories (no postmaster.pid, and pg_control untouched for a while)
+# - Reports unreadable or invalid PG_VERSION files
+
+# Usage:
+#   python pgversion_datascan.py /srv/pgdata /mnt/tblspc --expect 17 --workers 32
+
+#   for d in scanDataDirectories(['/srv/pgdata'], expectedMajor='17.2'):
+#     print(d.path, d.kind, d.major, d.issues)
+
+import argparse
+import os
+import re
+import sys
+import time
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pgversion
+
+# kind is 'cluster' (a data directory) or 'tablespace' (a PG_<major>_<catversion> directory)
+# version is the PG_VERSION contents (or the major from a tablespace directory name), None if unreadable
+# major is the major version (see getMajorPGVersion()), False if version isn't a valid major version
+# issues is a tuple of 'mismatch', 'orphaned', 'stale', 'unreadable' or 'invalid' (empty if all is well)
+PGDataDir = namedtuple('PGDataDir', ['path', 'kind', 'version', 'major', 'issues'])
+
+# Tablespace directory, for e.g. PG_17_202406281 or PG_9.6_201608131
+_reTablespaceDir = re.compile(r'^PG_([0-9]+(?:\.[0-9]+)?)_([0-9]+)$')
+
+# PG_VERSION holds a few bytes (for e.g. '17\n'). Anything larger isn't a PG_VERSION file.
+_maxVersionFileLen = 64
+
+_defaultWorkers = 16
+_defaultStaleDays = 30
+
+
+# Return: Contents of a PG_VERSION file, stripped
+# Error: Raises OSError if the file can't be read
+def _readVersionFile(path):
+  with open(path, 'rb') as f:
+    data = f.read(_maxVersionFileLen + 1)
+  if (len(data) > _maxVersionFileLen):
+    return ''
+  return data.decode('ascii', 'replace').strip()
+
+
+# Scan a single directory. Runs on a worker thread.
+# Return: (subdirectories to scan next, found entry or None)
+# Detail: Data directories are not descended into (their base/ trees can be huge), and
+# symlinks are not followed (pg_tblspc links are resolved separately)
+def _scanDir(path, depth):
+  try:
+    with os.scandir(path) as it:
+      entries = list(it)
+  except OSError:
+    return ((), None)
+
+  names = {e.name: e for e in entries}
+  if ('PG_VERSION' in names) and ('global' in names):
+    return ((), _readCluster(path, names))
+
+  m = _reTablespaceDir.match(os.path.basename(path))
+  if (m):
+    return ((), ('tablespace', path, m.group(1)))
+
+  subdirs = []
+  for e in entries:
+    try:
+      if (e.is_dir(follow_symlinks=False)):
+        subdirs.append((e.path, depth + 1))
+    except OSError:
+      pass
+  return (subdirs, None)
+
+
+def _readCluster(path, names):
+  try:
+    version = _readVersionFile(os.path.join(path, 'PG_VERSION'))
+  except OSError:
+    version = None
+
+  # pg_control is rewritten at every checkpoint, so its mtime tells when the cluster last ran
+  try:
+    lastActive = os.stat(os.path.join(path, 'global', 'pg_control')).st_mtime
+  except OSError:
+    lastActive = names['global'].stat(follow_symlinks=False).st_mtime
+
+  tablespaces = []
+  if ('pg_tblspc' in names):
+    try:
+      with os.scandir(os.path.join(path, 'pg_tblspc')) as it:
+        for e in it:
+          tablespaces.append(os.path.realpath(e.path))
+    except OSError:
+      pass
+
+  return ('cluster', path, version, ('postmaster.pid' in names), lastActive, tablespaces)
+
+
+# Return: Generator of (kind, path, ...) tuples for every data directory and tablespace
+# directory found under the roots
+# Detail: Breadth-first walk, with at most workers directories being read at a time
+def _walk(roots, workers, maxDepth):
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    pending = set()
+    queue = deque((r, 0) for r in roots)
+    while (queue) or (pending):
+      while (queue) and (len(pending) < workers * 2):
+        path, depth = queue.popleft()
+        pending.add(pool.submit(_scanDir, path, depth))
+
+      done, pending = wait(pending, return_when=FIRST_COMPLETED)
+      for f in done:
+        subdirs, found = f.result()
+        if (found is not None):
+          yield found
+        for path, depth in subdirs:
+          if (maxDepth is None) or (depth <= maxDepth):
+            queue.append((path, depth))
+
+
+# Return: List of PGDataDir for every data directory and tablespace directory found
+# under the roots, sorted by path
+# Input:
+#   expectedMajor - Version of the running binary (for e.g. '17.2', 17 or '9.6'), or None to skip the check
+#   workers       - Number of directories read in parallel
+#   staleDays     - A stopped data directory whose pg_control is older than this is stale
+#   maxDepth      - Don't descend more than this many levels below a root (None for no limit)
+#   now           - Current time (seconds since the epoch), defaults to time.time()
+# Error: Raises ValueError if expectedMajor isn't a valid postgres version
+def scanDataDirectories(roots, expectedMajor=None, workers=_defaultWorkers, staleDays=_defaultStaleDays, maxDepth=None, now=None):
+  if (isinstance(roots, str)):
+    roots = [roots]
+
+  expected = None
+  if (expectedMajor is not None):
+    expected = pgversion.getMajorPGVersion(expectedMajor)
+    if (expected is False):
+      raise ValueError('Invalid expected Postgres version - ' + pgversion._shortVerString(pgversion._asVerString(expectedMajor)))
+
+  staleBefore = (time.time() if (now is None) else now) - staleDays * 86400
+
+  # Few distinct PG_VERSION contents per host, so each is parsed once
+  majors = {}
+
+  def majorOf(version):
+    try:
+      return majors[version]
+    except KeyError:
+      m = majors[version] = pgversion.getMajorPGVersion(version)
+      return m
+
+  results = []
+  tablespaces = []
+  referenced = set()
+  for found in _walk(list(roots), workers, maxDepth):
+    if (found[0] == 'tablespace'):
+      tablespaces.append(found)
+      continue
+
+    _, path, version, running, lastActive, links = found
+    issues = []
+    if (version is None):
+      major = False
+      issues.append('unreadable')
+    else:
+      major = majorOf(version)
+      if (major is False):
+        issues.append('invalid')
+      elif (expected is not None) and (major != expected):
+        issues.append('mismatch')
+    if (not running) and (lastActive < staleBefore):
+      issues.append('stale')
+
+    # A data directory only uses the tablespace directory of its own major version
+    for location in links:
+      referenced.add((location, major))
+    results.append(PGDataDir(path, 'cluster', version, major, tuple(issues)))
+
+  for _, path, version in tablespaces:
+    major = majorOf(version)
+    location = os.path.realpath(os.path.dirname(path))
+    issues = () if ((location, major) in referenced) else ('orphaned',)
+    results.append(PGDataDir(path, 'tablespace', version, major, issues))
+
+  results.sort()
+  return results
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Scan Postgres data directories and tablespaces')
+  parser.add_argument('roots', nargs='+')
+  parser.add_argument('--expect', help='Major version of the running binary (for e.g. 17)')
+  parser.add_argument('--workers', type=int, default=_defaultWorkers)
+  parser.add_argument('--stale-days', type=float, default=_defaultStaleDays)
+  parser.add_argument('--max-depth', type=int, default=None)
+  parser.add_argument('--all', action='store_true', help='Also print directories without issues')
+  args = parser.parse_args(argv)
+
+  out = sys.stdout
+  for d in scanDataDirectories(args.roots, args.expect, args.workers, args.stale_days, args.max_depth):
+    if (d.issues) or (args.all):
+      out.write(d.path + ',' + d.kind + ',' + (d.version or '') + ',' + ' '.join(d.issues) + '\n')
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
@@ -0,0 +1,132 @@
+# Synthetic fleet inventory generator, for benchmarks and load tests.
+
+# Features
+# - Skewed version distribution, like a real fleet: most instances run recent majors, and
+#   within a major most run one of the last few minors, with a long tail of old versions
+# - A configurable fraction of junk (empty, truncated, never-released and oversized strings)
+# - Mixed input types: strings, plus ints (major only, for e.g. 17) and floats (for e.g.
+#   15.4, or a lossy 17.1 for '17.10') as they turn up when versions pass through spreadsheets / JSON
+# - Deterministic for a given seed, and generated in chunks so any number of rows streams in constant memory
+
+# Usage:
+#   python pgversion_fleetgen.py 1000000 --junk 0.02 --seed 1 > fleet.csv
+
+#   for instance, ver in generateFleet(10 ** 6, seed=1):
+#     ...
+#   for versions in generateFleetChunks(10 ** 8, chunkSize=100000):
+#     ...
+
+import argparse
+import itertools
+import math
+import random
+import sys
+
+import pgversion
+
+_defaultJunkFraction = 0.02
+_defaultFormats = {'str': 0.9, 'float': 0.05, 'int': 0.05}
+_defaultChunkSize = 100000
+
+# Skew of the major version, by how many majors older than the newest it is (fleets lag a
+# couple of majors behind the newest, with a long tail), and of the minor version, by how many
+# minors behind the latest of its major it is
+_majorLag = 3.0
+_minorHalfLife = 3.0
+
+_junk = (
+  '', ' ', 'junk', '17.', '.17', '17..1', '9.7.1', '10.24', '17.x', 'v17.2', '17.2-1', '1' * 40,
+  '17.2 (Debian 17.2-1.pgdg120+1)', 'PostgreSQL 16.3', '1.2.3.4', '99999', '-1', 'None',
+)
+
+
+class FleetSampler:
+
+  # Input:
+  #   seed         - Random seed (same seed, same fleet)
+  #   junkFraction - Fraction of rows with junk instead of a version
+  #   formats      - Weights of 'str', 'float' and 'int' rows
+  #   oldestMajor  - Oldest major version to sample from
+  def __init__(self, seed=0, junkFraction=_defaultJunkFraction, formats=None, oldestMajor=9.0):
+    self.rng = random.Random(seed)
+    self.junkFraction = junkFraction
+    formats = _defaultFormats if (formats is None) else formats
+    self.formats = list(formats)
+    self.formatWeights = list(itertools.accumulate(formats[f] for f in self.formats))
+
+    byMajor = {}
+    for ver in pgversion._verReleaseDates:
+      m = pgversion.getMajorPGVersion(ver)
+      if (m is not False) and (m >= oldestMajor):
+        byMajor.setdefault(m, []).append(ver)
+
+    self.versions = []
+    weights = []
+    for rank, m in enumerate(sorted(byMajor, reverse=True)):
+      majorWeight = (rank + 1) * math.exp(-rank / _majorLag)
+      minors = sorted(byMajor[m], key=pgversion.getPGVersionSortKey, reverse=True)
+      minorWeights = [0.5 ** (behind / _minorHalfLife) for behind in range(len(minors))]
+      total = sum(minorWeights)
+      for ver, w in zip(minors, minorWeights):
+        self.versions.append(ver)
+        weights.append(majorWeight * w / total)
+    self.cumWeights = list(itertools.accumulate(weights))
+
+  # Return: List of k versions (or junk)
+  def sample(self, k):
+    rng = self.rng
+    rows = rng.choices(self.versions, cum_weights=self.cumWeights, k=k)
+    if (self.formats != ['str']):
+      kinds = rng.choices(self.formats, cum_weights=self.formatWeights, k=k)
+      for i, kind in enumerate(kinds):
+        if (kind != 'str'):
+          rows[i] = _convert(rows[i], kind)
+    if (self.junkFraction > 0):
+      n = min(k, int(k * self.junkFraction + rng.random()))
+      for i in rng.sample(range(k), n):
+        rows[i] = rng.choice(_junk)
+    return rows
+
+
+# Return: The version as a float or int, the way it would come out of a spreadsheet / JSON
+def _convert(ver, kind):
+  if (ver.count('.') != 1):
+    return ver
+  if (kind == 'int'):
+    return int(ver.split('.')[0])
+  return float(ver)
+
+
+# Return: Generator of lists of versions (chunkSize at a time), n versions in all
+def generateFleetChunks(n, chunkSize=_defaultChunkSize, **kwargs):
+  sampler = FleetSampler(**kwargs)
+  while (n > 0):
+    k = min(n, chunkSize)
+    yield sampler.sample(k)
+    n -= k
+
+
+# Return: Generator of n (instance, version) rows, see FleetSampler for the keyword arguments
+def generateFleet(n, chunkSize=_defaultChunkSize, **kwargs):
+  i = 0
+  for chunk in generateFleetChunks(n, chunkSize, **kwargs):
+    for ver in chunk:
+      yield ('db%09d' % i, ver)
+      i += 1
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Generate a synthetic fleet inventory (instance,version rows)')
+  parser.add_argument('rows', type=int)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--junk', type=float, default=_defaultJunkFraction, help='Fraction of junk rows')
+  parser.add_argument('--strings-only', action='store_true', help="Don't convert any versions to int / float")
+  args = parser.parse_args(argv)
+
+  formats = {'str': 1.0} if (args.strings_only) else None
+  out = sys.stdout
+  for instance, ver in generateFleet(args.rows, seed=args.seed, junkFraction=args.junk, formats=formats):
+    out.write(instance + ',' + str(ver).replace(',', ' ').replace('\n', ' ') + '\n')
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
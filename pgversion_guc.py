@@ -0,0 +1,407 @@
+# Catalog of configuration parameters (GUCs) by major version, and a postgresql.conf validator.
+
+# Features
+# - Catalog of parameter names and the major versions that have them (name -> (first, last)),
+#   including parameters that were removed or renamed (for e.g. checkpoint_segments before 9.5,
+#   wal_keep_segments before 13)
+# - Per-major index of valid names, so each check is a set lookup
+# - Streaming postgresql.conf parser (one line at a time), including include directives
+# - Validates config files against each instance's version (see getMajorPGVersion()), and only
+#   parses each distinct file once (identified by content hash)
+
+# Parameters with a dot in their name (for e.g. pg_stat_statements.max) belong to extensions
+# and are not checked. Values are not checked either.
+
+# Usage:
+#   python pgversion_guc.py postgresql.conf 12.4
+
+#   isValidGUC('wal_keep_segments', '13.2')    -> False
+#   getGUCReplacement('wal_keep_segments')     -> 'wal_keep_size'
+#   v = PGConfValidator()
+#   for path, ver in inventory:
+#     report = v.validateFile(path, ver)
+
+import argparse
+import hashlib
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+import pgversion
+
+# First major of 0 means the parameter predates the oldest major tracked here (9.0),
+# and a last major of None that it still exists. Names are as in pg_settings for each major
+# (postgresql.conf.sample lists only a subset), including developer options, options that
+# only exist in some builds (for e.g. trace_locks with LOCK_DEBUG) and read-only parameters.
+# Parameters added to older branches in a minor release are listed from the oldest major that
+# has them (for e.g. data_sync_retry, new in 12 and back-patched to 9.4.21).
+_gucCatalog = (
+  (0, None, '''
+    allow_system_table_mods archive_command archive_mode archive_timeout array_nulls
+    authentication_timeout autovacuum autovacuum_analyze_scale_factor autovacuum_analyze_threshold
+    autovacuum_freeze_max_age autovacuum_max_workers autovacuum_naptime autovacuum_vacuum_cost_delay
+    autovacuum_vacuum_cost_limit autovacuum_vacuum_scale_factor autovacuum_vacuum_threshold
+    backslash_quote bgwriter_delay bgwriter_lru_maxpages bgwriter_lru_multiplier block_size bonjour
+    bonjour_name check_function_bodies checkpoint_completion_target checkpoint_timeout
+    checkpoint_warning client_encoding client_min_messages commit_delay commit_siblings config_file
+    constraint_exclusion cpu_index_tuple_cost cpu_operator_cost cpu_tuple_cost cursor_tuple_fraction
+    data_directory datestyle deadlock_timeout debug_assertions debug_deadlocks debug_pretty_print
+    debug_print_parse debug_print_plan debug_print_rewritten default_statistics_target
+    default_tablespace default_text_search_config default_transaction_isolation
+    default_transaction_read_only dynamic_library_path effective_cache_size effective_io_concurrency
+    enable_bitmapscan enable_hashagg enable_hashjoin enable_indexscan enable_mergejoin
+    enable_nestloop enable_seqscan enable_sort enable_tidscan escape_string_warning external_pid_file
+    extra_float_digits from_collapse_limit fsync full_page_writes geqo geqo_effort geqo_generations
+    geqo_pool_size geqo_seed geqo_selection_bias geqo_threshold gin_fuzzy_search_limit hba_file
+    ident_file ignore_system_indexes integer_datetimes intervalstyle join_collapse_limit
+    krb_caseins_users krb_server_keyfile lc_messages lc_monetary lc_numeric lc_time
+    listen_addresses local_preload_libraries log_autovacuum_min_duration log_btree_build_stats
+    log_checkpoints log_connections log_destination log_directory log_disconnections log_duration
+    log_error_verbosity log_executor_stats log_filename log_hostname log_line_prefix log_lock_waits
+    log_min_duration_statement log_min_error_statement log_min_messages log_parser_stats
+    log_planner_stats log_rotation_age log_rotation_size log_statement log_statement_stats
+    log_temp_files log_timezone log_truncate_on_rotation logging_collector maintenance_work_mem
+    max_connections max_files_per_process max_function_args max_identifier_length max_index_keys
+    max_locks_per_transaction max_prepared_transactions max_stack_depth optimize_bounded_sort
+    password_encryption port post_auth_delay pre_auth_delay random_page_cost search_path
+    segment_size seq_page_cost server_encoding server_version server_version_num
+    session_replication_role shared_buffers shared_preload_libraries ssl ssl_ciphers
+    standard_conforming_strings statement_timeout superuser_reserved_connections
+    synchronize_seqscans synchronous_commit syslog_facility syslog_ident tcp_keepalives_count
+    tcp_keepalives_idle tcp_keepalives_interval temp_buffers temp_tablespaces timezone
+    timezone_abbreviations trace_lock_oidmin trace_lock_table trace_locks trace_lwlocks trace_notify
+    trace_sort trace_syncscan trace_userlocks track_activities track_activity_query_size
+    track_counts track_functions transaction_isolation transaction_read_only transform_null_equals
+    unix_socket_group unix_socket_permissions update_process_title vacuum_cost_delay
+    vacuum_cost_limit vacuum_cost_page_dirty vacuum_cost_page_hit vacuum_cost_page_miss
+    vacuum_freeze_min_age vacuum_freeze_table_age wal_block_size wal_buffers wal_debug
+    wal_segment_size wal_sync_method wal_writer_delay work_mem xmlbinary xmloption zero_damaged_pages
+  '''),
+  (9.0, None, '''
+    application_name bytea_output enable_material hot_standby lo_compat_privileges
+    max_standby_archive_delay max_standby_streaming_delay max_wal_senders wal_level
+  '''),
+  (9.1, None, '''
+    default_transaction_deferrable exit_on_error hot_standby_feedback log_file_mode
+    max_pred_locks_per_transaction quote_all_identifiers restart_after_crash
+    synchronous_standby_names transaction_deferrable wal_receiver_status_interval
+  '''),
+  (9.2, None, '''
+    enable_indexonlyscan event_source ssl_ca_file ssl_cert_file ssl_crl_file ssl_key_file
+    temp_file_limit track_io_timing
+  '''),
+  (9.3, None, '''
+    autovacuum_multixact_freeze_max_age data_checksums ignore_checksum_failure lock_timeout
+    unix_socket_directories vacuum_multixact_freeze_min_age vacuum_multixact_freeze_table_age
+    wal_receiver_timeout wal_sender_timeout
+  '''),
+  (9.4, None, '''
+    autovacuum_work_mem data_sync_retry dynamic_shared_memory_type huge_pages max_replication_slots
+    max_worker_processes session_preload_libraries ssl_ecdh_curve ssl_prefer_server_ciphers
+    wal_log_hints
+  '''),
+  (9.5, None, '''
+    cluster_name gin_pending_list_limit log_replication_commands max_wal_size min_wal_size
+    row_security track_commit_timestamp wal_compression wal_retrieve_retry_interval
+  '''),
+  (9.6, None, '''
+    backend_flush_after bgwriter_flush_after checkpoint_flush_after idle_in_transaction_session_timeout
+    max_parallel_workers_per_gather parallel_setup_cost parallel_tuple_cost syslog_sequence_numbers
+    syslog_split_messages wal_writer_flush_after
+  '''),
+  (10, None, '''
+    allow_in_place_tablespaces enable_gathermerge max_logical_replication_workers
+    max_parallel_workers max_pred_locks_per_page max_pred_locks_per_relation
+    max_sync_workers_per_subscription min_parallel_index_scan_size min_parallel_table_scan_size
+    ssl_dh_params_file wal_consistency_checking
+  '''),
+  (11, None, '''
+    data_directory_mode enable_parallel_append enable_parallel_hash enable_partition_pruning
+    enable_partitionwise_aggregate enable_partitionwise_join jit jit_above_cost
+    jit_debugging_support jit_dump_bitcode jit_expressions jit_inline_above_cost
+    jit_optimize_above_cost jit_profiling_support jit_provider jit_tuple_deforming
+    max_parallel_maintenance_workers parallel_leader_participation ssl_passphrase_command
+    ssl_passphrase_command_supports_reload
+  '''),
+  (12, None, '''
+    archive_cleanup_command default_table_access_method log_transaction_sample_rate plan_cache_mode
+    primary_conninfo primary_slot_name recovery_end_command recovery_min_apply_delay recovery_target
+    recovery_target_action recovery_target_inclusive recovery_target_lsn recovery_target_name
+    recovery_target_time recovery_target_timeline recovery_target_xid restore_command
+    restrict_nonsystem_relation_kind shared_memory_type ssl_library ssl_max_protocol_version
+    ssl_min_protocol_version tcp_user_timeout wal_init_zero wal_recycle
+  '''),
+  (13, None, '''
+    autovacuum_vacuum_insert_scale_factor autovacuum_vacuum_insert_threshold backtrace_functions
+    enable_incremental_sort hash_mem_multiplier ignore_invalid_pages log_min_duration_sample
+    log_parameter_max_length log_parameter_max_length_on_error log_statement_sample_rate
+    logical_decoding_work_mem maintenance_io_concurrency max_slot_wal_keep_size
+    wal_keep_size wal_receiver_create_temp_slot wal_skip_threshold
+  '''),
+  (14, None, '''
+    client_connection_check_interval compute_query_id debug_discard_caches default_toast_compression
+    enable_async_append enable_memoize huge_page_size idle_session_timeout in_hot_standby
+    log_recovery_conflict_waits min_dynamic_shared_memory recovery_init_sync_method
+    remove_temp_files_after_crash ssl_crl_dir track_wal_io_timing vacuum_failsafe_age
+    vacuum_multixact_failsafe_age
+  '''),
+  (15, None, '''
+    archive_library log_startup_progress_interval recovery_prefetch recursive_worktable_factor
+    shared_memory_size shared_memory_size_in_huge_pages stats_fetch_consistency
+    wal_decode_buffer_size
+  '''),
+  (16, None, '''
+    createrole_self_grant debug_io_direct debug_logical_replication_streaming debug_parallel_query
+    enable_presorted_aggregate gss_accept_delegation icu_validation_level
+    max_parallel_apply_workers_per_subscription reserved_connections scram_iterations
+    send_abort_for_crash send_abort_for_kill vacuum_buffer_usage_limit
+  '''),
+  (17, None, '''
+    allow_alter_system commit_timestamp_buffers enable_group_by_reordering event_triggers
+    huge_pages_status io_combine_limit max_notify_queue_pages multixact_member_buffers
+    multixact_offset_buffers notify_buffers serializable_buffers subtransaction_buffers
+    summarize_wal sync_replication_slots synchronized_standby_slots trace_connection_negotiation
+    transaction_buffers transaction_timeout wal_summary_keep_time
+  '''),
+  (18, None, '''
+    autovacuum_vacuum_max_threshold autovacuum_worker_slots debug_copy_parse_plan_trees
+    debug_raw_expression_coverage_test debug_write_read_parse_plan_trees enable_distinct_reordering
+    enable_self_join_elimination extension_control_path file_copy_method
+    idle_replication_slot_timeout io_max_combine_limit io_max_concurrency io_method io_workers
+    log_lock_failures max_active_replication_origins md5_password_warnings num_os_semaphores
+    oauth_validator_libraries ssl_groups ssl_tls13_ciphers track_cost_delay_timing
+    vacuum_max_eager_freeze_failure_rate vacuum_truncate
+  '''),
+
+  # Removed (or renamed) parameters
+  (0, 8.4, 'add_missing_from regex_flavor'),
+  (0, 9.1, 'custom_variable_classes silent_mode'),
+  (9.0, 9.1, 'wal_sender_delay'),
+  (0, 9.2, 'unix_socket_directory'),
+  (9.1, 9.2, 'replication_timeout'),
+  (0, 9.3, 'krb_srvname'),
+  (0, 9.4, 'checkpoint_segments ssl_renegotiation_limit'),
+  (0, 9.6, 'sql_inheritance'),
+  (9.6, 9.6, 'min_parallel_relation_size'),
+  (9.6, 10, 'replacement_sort_tuples'),
+  (0, 11, 'default_with_oids'),
+  (9.0, 12, 'wal_keep_segments'),
+  (9.5, 13, 'operator_precedence_warning'),
+  (11, 13, 'vacuum_cleanup_index_scale_factor'),
+  (0, 14, 'stats_temp_directory'),
+  (12, 15, 'promote_trigger_file'),
+  (9.0, 15, 'vacuum_defer_cleanup_age'),
+  (9.6, 15, 'force_parallel_mode'),
+  (0, 15, 'lc_collate lc_ctype'),
+  (9.6, 16, 'old_snapshot_threshold'),
+  (0, 16, 'db_user_namespace'),
+  (9.0, 16, 'trace_recovery_messages'),
+)
+
+# Parameters that were renamed, or replaced by another parameter
+_gucReplacements = {
+  'checkpoint_segments': 'max_wal_size',
+  'unix_socket_directory': 'unix_socket_directories',
+  'replication_timeout': 'wal_sender_timeout',
+  'min_parallel_relation_size': 'min_parallel_table_scan_size',
+  'wal_keep_segments': 'wal_keep_size',
+  'force_parallel_mode': 'debug_parallel_query',
+  'promote_trigger_file': 'pg_promote()',
+}
+
+
+def _buildIndex():
+  index = {}
+  for first, last, names in _gucCatalog:
+    for name in names.split():
+      if (name in index):
+        raise ValueError('Configuration parameter listed twice - ' + name)
+      index[name] = (first, last)
+  return index
+
+# Major version range (first, last) for each parameter name
+_gucIndex = _buildIndex()
+
+
+# Return: Frozenset of the parameter names valid in the major version provided (for e.g. 17 or 9.6)
+@lru_cache(maxsize=None)
+def _gucsForMajor(major):
+  return frozenset(name for name, (first, last) in _gucIndex.items()
+                   if (first <= major) and ((last is None) or (major <= last)))
+
+
+# Return: Tuple of (first, last) major versions that have the parameter, where last is None
+# if it still exists (and a first of 0 means older than v9.0)
+# Error: Return False if the parameter isn't in the catalog
+def getGUCMajorRange(name):
+  return _gucIndex.get(name.lower(), False)
+
+
+# Return: Name of the parameter that replaced a removed parameter, for e.g. 'wal_keep_segments' -> 'wal_keep_size'
+# Error: Return False if there is none
+def getGUCReplacement(name):
+  return _gucReplacements.get(name.lower(), False)
+
+
+# Return: True if the parameter exists in the major version of the postgres version provided
+# Detail: Extension parameters (for e.g. 'auto_explain.log_min_duration') are always valid
+# Error: Return False if the parameter is unknown, or the version is invalid
+def isValidGUC(name, version):
+  major = pgversion.getMajorPGVersion(version)
+  if (major is False):
+    return False
+  return _checkGUC(name.lower(), major) is None
+
+
+# Return: None if valid, else the issue kind ('unknown', 'removed' or 'not_yet_added')
+def _checkGUC(name, major):
+  if (name in _gucsForMajor(major)) or ('.' in name):
+    return None
+  r = _gucIndex.get(name)
+  if (r is None):
+    return 'unknown'
+  return 'removed' if ((r[1] is not None) and (major > r[1])) else 'not_yet_added'
+
+
+# A name and an optional '=', then the value: a quoted string (with '' or \' escapes) or a bare word
+_reConfLine = re.compile(r"""^\s*([A-Za-z_][A-Za-z0-9_$.]*)\s*=?\s*('(?:[^'\\]|''|\\.)*'|[^\s#']*)\s*(?:#.*)?$""")
+_reBlankLine = re.compile(r'^\s*(?:#.*)?$')
+_includeDirectives = ('include', 'include_if_exists', 'include_dir')
+
+
+# Return: Generator of (line number, name, value) for each setting in a postgresql.conf,
+# and (line number, None, line) for lines that can't be parsed
+# Input: Iterable of lines (for e.g. an open file), str or bytes
+# Detail: Names are lowercased and quotes removed from values. Include directives are returned
+# as settings named 'include', 'include_if_exists' or 'include_dir' (the files aren't read).
+def parsePGConf(lines):
+  for lineno, line in enumerate(lines, 1):
+    if (isinstance(line, bytes)):
+      line = line.decode('utf-8', 'replace')
+    if (_reBlankLine.match(line)):
+      continue
+    m = _reConfLine.match(line)
+    if (m is None):
+      yield (lineno, None, line.rstrip('\r\n'))
+      continue
+    value = m.group(2)
+    if (value[:1] == "'"):
+      value = re.sub(r"''|\\(.)", lambda e: e.group(1) or "'", value[1:-1])
+    yield (lineno, m.group(1).lower(), value)
+
+
+# line is the line number, name the parameter (None for a syntax error), and
+# kind one of 'unknown', 'removed', 'not_yet_added', 'duplicate', 'syntax' or 'unreadable'
+PGConfIssue = namedtuple('PGConfIssue', ['line', 'name', 'kind', 'detail'])
+
+# major is the major version checked against (False if the version is invalid),
+# digest the content hash (sha256), settings the number of settings, includes the
+# include directives (as (directive, path)) and issues a tuple of PGConfIssue
+PGConfReport = namedtuple('PGConfReport', ['path', 'version', 'major', 'digest', 'settings', 'includes', 'issues'])
+
+
+class PGConfValidator:
+
+  # Caches the parsed settings per file content hash, and the issues per (hash, major version),
+  # so identical files across a fleet are parsed and checked only once
+  def __init__(self):
+    self._parsed = {}
+    self._checked = {}
+
+  # Return: PGConfReport for a postgresql.conf file
+  # Error: Raises OSError if the file can't be read
+  def validateFile(self, path, version):
+    h = hashlib.sha256()
+    chunks = []
+    with open(path, 'rb') as f:
+      for chunk in iter(lambda: f.read(65536), b''):
+        h.update(chunk)
+        chunks.append(chunk)
+    return self._validate(path, version, h.hexdigest(), chunks)
+
+  # Return: PGConfReport for the contents of a postgresql.conf (str or bytes)
+  def validateText(self, text, version, path=None):
+    data = text.encode('utf-8') if (isinstance(text, str)) else text
+    return self._validate(path, version, hashlib.sha256(data).hexdigest(), [data])
+
+  def _validate(self, path, version, digest, chunks):
+    parsed = self._parsed.get(digest)
+    if (parsed is None):
+      parsed = self._parsed[digest] = self._parse(chunks)
+    settings, includes, syntaxErrors = parsed
+
+    major = pgversion.getMajorPGVersion(version)
+    issues = ()
+    if (major is not False):
+      key = (digest, major)
+      issues = self._checked.get(key)
+      if (issues is None):
+        issues = self._checked[key] = self._check(settings, syntaxErrors, major)
+
+    return PGConfReport(path, version, major, digest, len(settings), includes, issues)
+
+  def _parse(self, chunks):
+    settings = []
+    includes = []
+    syntaxErrors = []
+    lines = b''.join(chunks).splitlines() if (len(chunks) > 1) else chunks[0].splitlines()
+    for lineno, name, value in parsePGConf(lines):
+      if (name is None):
+        syntaxErrors.append(PGConfIssue(lineno, None, 'syntax', value))
+      elif (name in _includeDirectives):
+        includes.append((name, value))
+      else:
+        settings.append((lineno, name))
+    return (tuple(settings), tuple(includes), tuple(syntaxErrors))
+
+  def _check(self, settings, syntaxErrors, major):
+    issues = list(syntaxErrors)
+    seen = {}
+    for lineno, name in settings:
+      kind = _checkGUC(name, major)
+      if (kind is not None):
+        detail = ''
+        if (kind != 'unknown'):
+          first, last = _gucIndex[name]
+          detail = 'Exists in ' + ('v' + str(first) if (first) else 'older versions') + (' onwards' if (last is None) else ' to v' + str(last))
+          replacement = _gucReplacements.get(name)
+          if (replacement) and (kind == 'removed'):
+            detail += ', replaced by ' + replacement
+        issues.append(PGConfIssue(lineno, name, kind, detail))
+      if (name in seen):
+        issues.append(PGConfIssue(lineno, name, 'duplicate', 'Overrides line ' + str(seen[name])))
+      seen[name] = lineno
+    issues.sort()
+    return tuple(issues)
+
+
+# Return: Generator of PGConfReport for each (path, version) provided
+# Detail: Files with the same contents are parsed once. Unreadable files get a report
+# with no digest and a single 'unreadable' issue.
+def validatePGConfFiles(items, validator=None):
+  if (validator is None):
+    validator = PGConfValidator()
+  for path, version in items:
+    try:
+      yield validator.validateFile(path, version)
+    except OSError as e:
+      issue = PGConfIssue(0, None, 'unreadable', str(e))
+      yield PGConfReport(path, version, pgversion.getMajorPGVersion(version), None, 0, (), (issue,))
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Check a postgresql.conf against the parameters of a Postgres version')
+  parser.add_argument('conf')
+  parser.add_argument('version')
+  args = parser.parse_args(argv)
+
+  report = PGConfValidator().validateFile(args.conf, args.version)
+  if (report.major is False):
+    print('Invalid Postgres version - ' + args.version)
+    return
+  for issue in report.issues:
+    print(args.conf + ':' + str(issue.line) + ': ' + issue.kind + ' ' + (issue.name or '') + (' - ' + issue.detail if (issue.detail) else ''))
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
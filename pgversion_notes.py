@@ -0,0 +1,310 @@
+# Full-text search over Postgres release notes kept in local files, for e.g. to list the
+# fixes an instance on 15.4 is missing compared to the latest minor version.
+
+# Features
+# - Reads release notes from plain text files (one file per version, with the version in the
+#   file name, for e.g. 15.4.txt or release-15-4.txt) and from the SGML sources in the Postgres
+#   tree (doc/src/sgml/release-*.sgml, with a <sect1 id="release-15-4"> per version)
+# - Each bullet / paragraph / <listitem> is one note, keyed by one of the released versions
+#   (see isReleasedPGVersion())
+# - Compact inverted index: notes are numbered in version order, so each term's postings are a
+#   sorted array of note numbers, and a version range is a slice of it (found with bisect)
+# - Queries with several terms match notes that have all of them. A trailing * matches
+#   any term with that prefix, for e.g. corrupt*
+# - The index can be saved and loaded (zlib compressed JSON), so it is only built once
+
+# Usage:
+#   python pgversion_notes.py doc/src/sgml --save notes.idx
+#   python pgversion_notes.py --index notes.idx --from 15.4 -q corruption
+
+#   idx = PGReleaseNotesIndex()
+#   idx.addPath('doc/src/sgml')
+#   idx.search('replication', '15.4')             -> Notes from 15.5 to the latest 15.x
+#   idx.search('corrupt* index', '15.4', '15.10') -> Notes from 15.5 to 15.10
+
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+import pgversion
+
+_serialFormat = 1
+
+# version is the release the note belongs to, text the note (whitespace normalised, without markup)
+PGReleaseNote = namedtuple('PGReleaseNote', ['version', 'text'])
+
+_reTerm = re.compile(r'[a-z0-9_]+')
+_reQueryTerm = re.compile(r'[a-z0-9_]+\*?')
+_reSpace = re.compile(r'\s+')
+_reTag = re.compile(r'<[^>]*>')
+_reBullet = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+_reSection = re.compile(r'<sect1\s+id="release-([0-9a-z-]+)"', re.IGNORECASE)
+_reListItem = re.compile(r'<listitem>(.*?)</listitem>', re.IGNORECASE | re.DOTALL)
+# For e.g. 'release-9-6-24.txt', '15.4.txt', 'notes_17beta1.md'
+_reFileVersion = re.compile(r'(\d+(?:[._-]\d+)*(?:(?:alpha|beta|rc)\d*)?)', re.IGNORECASE)
+
+
+# Return: Released version for a version as written in a file name or SGML id
+# (for e.g. '9-6-24' -> '9.6.24', '15' -> '15.0'), or False
+def _toReleasedVersion(s):
+  v = pgversion.appendMinorVersionIfRequired(re.sub(r'[_-]', '.', s).lower())
+  if (v is False) or (not pgversion.isReleasedPGVersion(v)):
+    return False
+  return v
+
+
+# Return: Generator of the notes (str) in plain text release notes
+# Detail: A bullet (-, *, 1.) starts a new note, and a blank line ends one. Lines that
+# follow a bullet without a blank line are part of that note.
+def splitPlainNotes(text):
+  note = []
+  for line in text.splitlines():
+    if (not line.strip()) or (_reBullet.match(line)):
+      if (note):
+        yield ' '.join(note)
+      note = []
+    if (line.strip()):
+      note.append(_reBullet.sub('', line).strip())
+  if (note):
+    yield ' '.join(note)
+
+
+# Return: Generator of (version, [notes]) in SGML release notes, one per <sect1 id="release-...">
+# Detail: Each <listitem> is a note, or if a section has none, each <para>
+def splitSGMLNotes(text):
+  sections = _reSection.split(text)
+  # sections is [before, id, body, id, body, ...]
+  for i in range(1, len(sections) - 1, 2):
+    version = _toReleasedVersion(sections[i])
+    if (version is False):
+      continue
+    body = sections[i + 1]
+    items = _reListItem.findall(body) or re.findall(r'<para>(.*?)</para>', body, re.IGNORECASE | re.DOTALL)
+    notes = [_cleanMarkup(item) for item in items]
+    yield (version, [n for n in notes if (n)])
+
+
+def _cleanMarkup(s):
+  return _reSpace.sub(' ', html.unescape(_reTag.sub(' ', s))).strip()
+
+
+class PGReleaseNotesIndex:
+
+  def __init__(self):
+    # Notes added since the last build, as (version, text)
+    self._pending = []
+    # Built index: per note (in version order) its sort key, version and text, and
+    # per term an array of note numbers
+    self._keys = []
+    self._versions = []
+    self._texts = []
+    self._postings = {}
+    self._terms = []
+
+  def __len__(self):
+    return len(self._texts) + len(self._pending)
+
+  # Add notes for one released version
+  # Return: Number of notes added, or False if the version hasn't been released
+  def addNotes(self, version, notes):
+    v = _toReleasedVersion(pgversion._asVerString(version))
+    if (v is False):
+      return False
+    notes = [n for n in (_reSpace.sub(' ', n).strip() for n in notes) if (n)]
+    self._pending.extend((v, n) for n in notes)
+    return len(notes)
+
+  # Add the notes in a release notes file (SGML, or plain text with the version in the file name)
+  # Return: Number of notes added, or False if no released version could be found for them
+  # Error: Raises OSError if the file can't be read
+  def addFile(self, path, version=None):
+    with open(path, encoding='utf-8', errors='replace') as f:
+      text = f.read()
+
+    if (version is None) and (_reSection.search(text)):
+      added = [self.addNotes(v, notes) for v, notes in splitSGMLNotes(text)]
+      return sum(added) if (added) else False
+
+    if (version is None):
+      for m in _reFileVersion.finditer(os.path.basename(path)):
+        version = _toReleasedVersion(m.group(1))
+        if (version):
+          break
+    if (not version):
+      return False
+    return self.addNotes(version, splitPlainNotes(text))
+
+  # Add the notes in each file provided, and in every file below each directory provided
+  # Return: Number of notes added
+  # Detail: Files without a released version (for e.g. release.sgml) are skipped
+  def addPath(self, *paths):
+    count = 0
+    for p in paths:
+      files = [p] if (not os.path.isdir(p)) else sorted(os.path.join(d, f) for d, _, names in os.walk(p) for f in names)
+      for path in files:
+        count += self.addFile(path) or 0
+    return count
+
+  # Return: Sorted list of the versions that have notes
+  def getVersions(self):
+    self._build()
+    return sorted(set(self._versions), key=pgversion.getPGVersionSortKey)
+
+  # Return: List of PGReleaseNote (in version order) that have every term in the query, for the
+  # versions released after fromVersion, up to and including toVersion
+  # Input:
+  #   query       - Search terms (case-insensitive), a trailing * matches any term with that prefix
+  #   fromVersion - Version the instance is on (excluded), or None to search from the oldest version
+  #   toVersion   - Last version to search, by default the latest minor version of fromVersion's major
+  #                 (or the newest version indexed, if fromVersion is None)
+  # Error: Return False if either version is invalid
+  def search(self, query, fromVersion=None, toVersion=None):
+    self._build()
+    lo, hi = self._range(fromVersion, toVersion)
+    if (lo is False):
+      return False
+
+    matches = None
+    for term in _reQueryTerm.findall(query.lower()):
+      ids = self._match(term, lo, hi)
+      matches = ids if (matches is None) else matches & ids
+      if (not matches):
+        return []
+    if (matches is None):
+      return []
+    return [PGReleaseNote(self._versions[i], self._texts[i]) for i in sorted(matches)]
+
+  # Return: (first, last + 1) note numbers for the version range, or (False, False)
+  def _range(self, fromVersion, toVersion):
+    lo = 0
+    hi = len(self._keys)
+    if (fromVersion is not None):
+      fromVersion = pgversion.appendMinorVersionIfRequired(fromVersion)
+      key = pgversion.getPGVersionSortKey(fromVersion) if (fromVersion) else False
+      if (key is False):
+        return (False, False)
+      lo = bisect_right(self._keys, key)
+      if (toVersion is None):
+        toVersion = pgversion.getLatestMinorPGVersion(fromVersion) or fromVersion
+    if (toVersion is not None):
+      key = pgversion.getPGVersionSortKey(pgversion.appendMinorVersionIfRequired(toVersion) or False)
+      if (key is False):
+        return (False, False)
+      hi = bisect_right(self._keys, key)
+    return (lo, max(lo, hi))
+
+  # Return: Set of note numbers in [lo, hi) that have the term (or, for term*, any term with that prefix)
+  def _match(self, term, lo, hi):
+    if (term.endswith('*')):
+      prefix = term[:-1]
+      first = bisect_left(self._terms, prefix)
+      last = bisect_left(self._terms, prefix + '\U0010ffff')
+      terms = self._terms[first:last]
+    else:
+      terms = [term]
+
+    ids = set()
+    for t in terms:
+      p = self._postings.get(t)
+      if (p is not None):
+        ids.update(p[bisect_left(p, lo):bisect_left(p, hi)])
+    return ids
+
+  # Rebuild the index if notes were added since the last build
+  def _build(self):
+    if (not self._pending):
+      return
+    notes = list(zip(self._versions, self._texts)) + self._pending
+    self._pending = []
+    self._setNotes(notes)
+
+  # Number the notes in version order (keeping the order they were added in, within a version),
+  # and build the postings
+  def _setNotes(self, notes):
+    sortKeys = {v: pgversion.getPGVersionSortKey(v) for v in set(v for v, _ in notes)}
+    notes.sort(key=lambda n: sortKeys[n[0]])
+    self._versions = [v for v, _ in notes]
+    self._texts = [t for _, t in notes]
+    self._keys = [sortKeys[v] for v in self._versions]
+
+    postings = {}
+    for i, text in enumerate(self._texts):
+      for term in set(_reTerm.findall(text.lower())):
+        p = postings.get(term)
+        if (p is None):
+          p = postings[term] = array('I')
+        p.append(i)
+    self._postings = postings
+    self._terms = sorted(postings)
+
+  # Return: Compact (zlib compressed JSON) serialization of the index
+  # Detail: Postings aren't stored, they are rebuilt on load from the notes
+  def toBytes(self):
+    self._build()
+    releases = []
+    for v, t in zip(self._versions, self._texts):
+      if (not releases) or (releases[-1][0] != v):
+        releases.append((v, []))
+      releases[-1][1].append(t)
+    d = {'format': _serialFormat, 'releases': releases}
+    return zlib.compress(json.dumps(d, separators=(',', ':')).encode())
+
+  # Error: Raises ValueError if b wasn't produced by toBytes()
+  @classmethod
+  def fromBytes(cls, b):
+    try:
+      d = json.loads(zlib.decompress(b))
+    except (zlib.error, ValueError):
+      raise ValueError('Invalid serialized release notes index')
+    if (not isinstance(d, dict)) or (d.get('format') != _serialFormat):
+      raise ValueError('Unsupported release notes index format')
+    idx = cls()
+    idx._setNotes([(v, t) for v, texts in d['releases'] for t in texts])
+    return idx
+
+  def save(self, path):
+    with open(path, 'wb') as f:
+      f.write(self.toBytes())
+
+  # Error: Raises OSError if the file can't be read, and ValueError if it isn't a saved index
+  @classmethod
+  def load(cls, path):
+    with open(path, 'rb') as f:
+      return cls.fromBytes(f.read())
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Search Postgres release notes between two versions')
+  parser.add_argument('paths', nargs='*', help='Release notes files / directories to index')
+  parser.add_argument('--index', help='Saved index to load')
+  parser.add_argument('--save', help='Save the index to this file')
+  parser.add_argument('--from', dest='fromVersion', help='Version the instance is on')
+  parser.add_argument('--to', dest='toVersion', help='Version to compare with (default: latest minor version)')
+  parser.add_argument('--query', '-q', default=None, help='Search terms')
+  args = parser.parse_args(argv)
+
+  idx = PGReleaseNotesIndex.load(args.index) if (args.index) else PGReleaseNotesIndex()
+  idx.addPath(*args.paths)
+  if (args.save):
+    idx.save(args.save)
+
+  if (args.query is None):
+    print(str(len(idx)) + ' notes in ' + str(len(idx.getVersions())) + ' versions')
+    return
+
+  notes = idx.search(args.query, args.fromVersion, args.toVersion)
+  if (notes is False):
+    print('Invalid Postgres version')
+    return
+  for n in notes:
+    print(n.version + ': ' + n.text)
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
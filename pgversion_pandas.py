@@ -0,0 +1,360 @@
+# pandas / Arrow extension type for Postgres Version Strings.
+
+# Features
+# - 'pgversion' pandas dtype, storing versions as packed integers (for e.g. v10.14 -> 100014)
+#   alongside a release ordinal (position of the release date in the release calendar)
+# - Vectorized sorting, comparison and grouping (no per-row Python calls)
+# - Series accessor (s.pgver) exposing major, minor, vernum, release date and released flag
+# - Round-trips through Arrow / Parquet as integers (requires pyarrow)
+
+# Usage:
+#   import pgversion_pandas
+#   s = pd.Series(['9.6.1', '17.9', 'junk'], dtype='pgversion')
+#   s.pgver.major, s.pgver.released, s.sort_values()
+
+# Prereleases (for e.g. 17beta3) are not supported and are stored as missing values. They share
+# their version number with the release (server_version_num 170000, same as 17.0), so they
+# couldn't be told apart from it, or sorted before it.
+
+# Requires: numpy and pandas. pyarrow is optional and only needed for Arrow / Parquet.
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import ExtensionArray, ExtensionDtype
+from pandas.api.extensions import register_extension_dtype, register_series_accessor
+
+import pgversion
+
+try:
+  import pyarrow as pa
+except ImportError:
+  pa = None
+
+# A version number of 0 is never valid, so it doubles as the missing value marker
+_naVerNum = 0
+_naOrdinal = -1
+
+# Release calendar: every distinct release date gets an ordinal, so that comparing
+# ordinals is the same as comparing release dates (see IsVerReleasedAfter())
+_ordinalDates = np.array(sorted(set(pgversion._verReleaseDates.values())), dtype='datetime64[D]')
+_dateOrdinals = {str(d): i for i, d in enumerate(_ordinalDates)}
+_verNumOrdinals = {
+  pgversion.getPGVerNumFromString(s): _dateOrdinals[d]
+  for s, d in pgversion._verReleaseDates.items()
+  if pgversion.isValidPGVersion(s)
+}
+# Version string of each released version number, since some can't be rebuilt
+# from the number alone (for e.g. 1.09 -> 10900 -> '1.9.0')
+_verNumStrings = {
+  pgversion.getPGVerNumFromString(s): s
+  for s in pgversion._verReleaseDates
+  if pgversion.isValidPGVersion(s)
+}
+
+
+# Return: Tuple of (version number, release ordinal) for the postgres version provided
+# Detail: Invalid input and prereleases return (0, -1), and unreleased versions return an ordinal of -1
+def _packPGVersion(_s):
+  if (_s is None) or (_s is pd.NA) or (isinstance(_s, float) and np.isnan(_s)):
+    return (_naVerNum, _naOrdinal)
+
+  n = pgversion.getPGVerNumFromString(_s)
+  if (n is False) or (pgversion.getPGPrerelease(_s) is not False):
+    return (_naVerNum, _naOrdinal)
+
+  return (n, _verNumOrdinals.get(n, _naOrdinal))
+
+
+# Return: Version string for a version number, for e.g. 100014 -> '10.14' and 90601 -> '9.6.1'
+def _verNumToString(n):
+  s = _verNumStrings.get(n)
+  if (s is not None):
+    return s
+  if (n >= 100000):
+    return str(n // 10000) + '.' + str(n % 10000)
+  return str(n // 10000) + '.' + str(n // 100 % 100) + '.' + str(n % 100)
+
+
+# (major, minor) of the released versions whose version number doesn't split into them, which
+# are the table versions (for e.g. 1.09 -> 10900 is major 1 and minor 9, not 1.9 and 0)
+_verNumMajorMinor = {
+  n: (pgversion.getMajorPGVersion(s), pgversion.getMinorPGVersion(s))
+  for n, s in _verNumStrings.items()
+  if (n < 100000) and (s != str(n // 10000) + '.' + str(n // 100 % 100) + '.' + str(n % 100))
+}
+_tableVerNums = np.array(sorted(_verNumMajorMinor), dtype=np.int64)
+
+# Return: Array of release ordinals for an array of version numbers
+def _ordinalsFromVerNums(verNums):
+  return np.fromiter((_verNumOrdinals.get(int(n), _naOrdinal) for n in verNums), dtype=np.int32, count=len(verNums))
+
+
+@register_extension_dtype
+class PGVersionDtype(ExtensionDtype):
+  name = 'pgversion'
+  type = str
+  kind = 'O'
+  na_value = pd.NA
+  _metadata = ()
+
+  @classmethod
+  def construct_array_type(cls):
+    return PGVersionArray
+
+  def __from_arrow__(self, array):
+    chunks = array.chunks if isinstance(array, pa.ChunkedArray) else [array]
+    verNums = []
+    ordinals = []
+    for chunk in chunks:
+      storage = chunk.storage if isinstance(chunk, pa.ExtensionArray) else chunk
+      verNums.append(storage.field('vernum').fill_null(_naVerNum).to_numpy(zero_copy_only=False))
+      ordinals.append(storage.field('ordinal').fill_null(_naOrdinal).to_numpy(zero_copy_only=False))
+    if (not verNums):
+      return PGVersionArray(np.array([], dtype=np.int32), np.array([], dtype=np.int32))
+    return PGVersionArray(np.concatenate(verNums), np.concatenate(ordinals))
+
+
+class PGVersionArray(ExtensionArray):
+
+  # Input: Parallel arrays of version numbers and release ordinals.
+  # Use pd.array(values, dtype='pgversion') to build one from version strings.
+  def __init__(self, verNums, ordinals, copy=False):
+    # np.array(copy=False) raises on NumPy 2 if a copy is needed, so only copy when asked to
+    asArray = np.array if (copy) else np.asarray
+    self._verNums = asArray(verNums, dtype=np.int32)
+    self._ordinals = asArray(ordinals, dtype=np.int32)
+
+  # Detail: Each distinct input value is parsed only once, which is what keeps
+  # construction cheap for fleet data (few distinct versions, many rows)
+  @classmethod
+  def _from_sequence(cls, scalars, *, dtype=None, copy=False):
+    if isinstance(scalars, PGVersionArray):
+      return scalars.copy() if copy else scalars
+
+    values = list(scalars)
+    cache = {}
+    verNums = np.empty(len(values), dtype=np.int32)
+    ordinals = np.empty(len(values), dtype=np.int32)
+    for i, s in enumerate(values):
+      try:
+        packed = cache[s]
+      except KeyError:
+        packed = cache[s] = _packPGVersion(s)
+      except TypeError:
+        packed = _packPGVersion(s)
+      verNums[i], ordinals[i] = packed
+    return cls(verNums, ordinals)
+
+  @classmethod
+  def _from_sequence_of_strings(cls, strings, *, dtype=None, copy=False):
+    return cls._from_sequence(strings, dtype=dtype, copy=copy)
+
+  @classmethod
+  def _from_factorized(cls, values, original):
+    verNums = np.asarray(values, dtype=np.int32)
+    return cls(verNums, _ordinalsFromVerNums(verNums))
+
+  @classmethod
+  def _concat_same_type(cls, to_concat):
+    return cls(np.concatenate([a._verNums for a in to_concat]),
+               np.concatenate([a._ordinals for a in to_concat]))
+
+  @property
+  def dtype(self):
+    return PGVersionDtype()
+
+  @property
+  def nbytes(self):
+    return self._verNums.nbytes + self._ordinals.nbytes
+
+  def __len__(self):
+    return len(self._verNums)
+
+  def __getitem__(self, item):
+    if isinstance(item, (int, np.integer)):
+      n = int(self._verNums[item])
+      return pd.NA if (n == _naVerNum) else _verNumToString(n)
+
+    item = pd.api.indexers.check_array_indexer(self, item)
+    return PGVersionArray(self._verNums[item], self._ordinals[item])
+
+  def __setitem__(self, key, value):
+    key = pd.api.indexers.check_array_indexer(self, key)
+    if pd.api.types.is_scalar(value) or (value is pd.NA):
+      verNum, ordinal = _packPGVersion(value)
+    else:
+      value = PGVersionArray._from_sequence(value)
+      verNum, ordinal = value._verNums, value._ordinals
+    self._verNums[key] = verNum
+    self._ordinals[key] = ordinal
+
+  def __iter__(self):
+    for n in self._verNums:
+      yield pd.NA if (n == _naVerNum) else _verNumToString(int(n))
+
+  def __arrow_array__(self, type=None):
+    if pa is None:
+      raise ImportError('pyarrow is required to convert a PGVersionArray to Arrow')
+    mask = self.isna()
+    storage = pa.StructArray.from_arrays(
+      [pa.array(self._verNums, type=pa.int32()), pa.array(self._ordinals, type=pa.int32())],
+      names=['vernum', 'ordinal'], mask=pa.array(mask))
+    return pa.ExtensionArray.from_storage(PGVersionArrowType(), storage)
+
+  def isna(self):
+    return self._verNums == _naVerNum
+
+  def copy(self):
+    return PGVersionArray(self._verNums, self._ordinals, copy=True)
+
+  def take(self, indices, allow_fill=False, fill_value=None):
+    indices = np.asarray(indices, dtype=np.intp)
+    if allow_fill:
+      fillVerNum, fillOrdinal = _packPGVersion(fill_value)
+      missing = indices == -1
+      if (indices < -1).any():
+        raise ValueError('Invalid value in indices for take with allow_fill=True')
+      safe = np.where(missing, 0, indices)
+      if len(self) == 0 and len(indices) and not missing.all():
+        raise IndexError('cannot do a non-empty take from an empty array')
+      verNums = self._verNums[safe] if len(self) else np.zeros(len(indices), dtype=np.int32)
+      ordinals = self._ordinals[safe] if len(self) else np.zeros(len(indices), dtype=np.int32)
+      verNums = np.where(missing, fillVerNum, verNums)
+      ordinals = np.where(missing, fillOrdinal, ordinals)
+      return PGVersionArray(verNums, ordinals)
+    return PGVersionArray(self._verNums.take(indices), self._ordinals.take(indices))
+
+  def _values_for_argsort(self):
+    return self._verNums
+
+  def _values_for_factorize(self):
+    return self._verNums, _naVerNum
+
+  def _reduce(self, name, *, skipna=True, keepdims=False, **kwargs):
+    if name not in ('min', 'max'):
+      raise TypeError("'pgversion' does not support reduction '" + name + "'")
+    valid = self._verNums[~self.isna()]
+    if (len(valid) == 0) or ((not skipna) and self.isna().any()):
+      result = pd.NA
+    else:
+      result = _verNumToString(int(valid.min() if name == 'min' else valid.max()))
+    return PGVersionArray._from_sequence([result]) if keepdims else result
+
+  # Comparisons run on the version numbers. Missing values compare as False.
+  def _cmp(self, other, op):
+    if isinstance(other, (pd.Series, pd.Index)):
+      other = other.array
+    if isinstance(other, PGVersionArray):
+      otherVerNums = other._verNums
+      otherNA = other.isna()
+    elif pd.api.types.is_scalar(other) or (other is pd.NA):
+      otherVerNums = _packPGVersion(other)[0]
+      # np.bool_ (not bool), so that ~otherNA is a logical not
+      otherNA = np.bool_(otherVerNums == _naVerNum)
+    else:
+      other = PGVersionArray._from_sequence(other)
+      otherVerNums = other._verNums
+      otherNA = other.isna()
+    return op(self._verNums, otherVerNums) & ~self.isna() & ~otherNA
+
+  def __eq__(self, other):
+    return self._cmp(other, np.equal)
+
+  def __ne__(self, other):
+    return self._cmp(other, np.not_equal)
+
+  def __lt__(self, other):
+    return self._cmp(other, np.less)
+
+  def __le__(self, other):
+    return self._cmp(other, np.less_equal)
+
+  def __gt__(self, other):
+    return self._cmp(other, np.greater)
+
+  def __ge__(self, other):
+    return self._cmp(other, np.greater_equal)
+
+
+@register_series_accessor('pgver')
+class PGVersionAccessor:
+
+  def __init__(self, series):
+    if not isinstance(series.dtype, PGVersionDtype):
+      raise AttributeError("Can only use .pgver accessor with 'pgversion' dtype")
+    self._series = series
+    self._array = series.array
+
+  def _wrap(self, values, dtype=None):
+    return pd.Series(values, index=self._series.index, name=self._series.name, dtype=dtype)
+
+  # Overwrite the major (i=0) or minor (i=1) of the table versions, see _verNumMajorMinor
+  def _patchTableVersions(self, values, i):
+    n = self._array._verNums
+    for k in np.flatnonzero(np.isin(n, _tableVerNums)):
+      values[k] = _verNumMajorMinor[int(n[k])][i]
+
+  # Return: Version numbers (for e.g. v10.14 -> 100014), missing values as <NA>
+  @property
+  def vernum(self):
+    return self._wrap(pd.arrays.IntegerArray(self._array._verNums.astype(np.int64), self._array.isna()))
+
+  # Return: Major version, same as getMajorPGVersion() (for e.g. 9.6 or 17.0). NaN if missing.
+  @property
+  def major(self):
+    n = self._array._verNums
+    major = np.where(n >= 100000, n // 10000, n // 10000 + (n // 100 % 100) / 10).astype(np.float64)
+    self._patchTableVersions(major, 0)
+    major[self._array.isna()] = np.nan
+    return self._wrap(major)
+
+  # Return: Minor version, same as getMinorPGVersion(). <NA> if missing.
+  @property
+  def minor(self):
+    n = self._array._verNums
+    minor = np.where(n >= 100000, n % 10000, n % 100).astype(np.int64)
+    self._patchTableVersions(minor, 1)
+    return self._wrap(pd.arrays.IntegerArray(minor, self._array.isna()))
+
+  # Return: Release ordinal (position of the release date in the release calendar), -1 if unreleased
+  @property
+  def ordinal(self):
+    return self._wrap(self._array._ordinals.copy())
+
+  # Return: True if the version has been released, same as isReleasedPGVersion()
+  @property
+  def released(self):
+    return self._wrap(self._array._ordinals >= 0)
+
+  # Return: Release date as datetime64, NaT if unreleased or missing
+  @property
+  def release_date(self):
+    ordinals = self._array._ordinals
+    dates = np.full(len(ordinals), np.datetime64('NaT'), dtype='datetime64[ns]')
+    released = ordinals >= 0
+    dates[released] = _ordinalDates[ordinals[released]]
+    return self._wrap(dates)
+
+
+if pa is not None:
+
+  class PGVersionArrowType(pa.ExtensionType):
+
+    def __init__(self):
+      super().__init__(pa.struct([('vernum', pa.int32()), ('ordinal', pa.int32())]), 'pgversion.version')
+
+    def __arrow_ext_serialize__(self):
+      return b''
+
+    @classmethod
+    def __arrow_ext_deserialize__(cls, storage_type, serialized):
+      return cls()
+
+    def to_pandas_dtype(self):
+      return PGVersionDtype()
+
+  try:
+    pa.register_extension_type(PGVersionArrowType())
+  except pa.ArrowKeyError:
+    # Already registered (for e.g. module reloaded)
+    pass
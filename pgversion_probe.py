@@ -0,0 +1,430 @@
+# Concurrent prober that learns server_version from many Postgres servers.
+
+# Features
+# - asyncio, with a limit on the number of probes in flight
+# - Speaks just enough of the wire protocol (v3) to complete the startup handshake and read
+#   the server_version ParameterStatus, without a client library
+# - Authentication: trust, password (cleartext), md5 and SCRAM-SHA-256
+# - Optional TLS (SSLRequest), TCP or Unix domain sockets
+# - Per-probe timeout
+# - Connection reuse: with reuse=True, connections are kept open and later probes of the same
+#   server only run SHOW server_version (a connection the server has since closed is replaced once)
+# - Results go straight through the version parser and release lookups
+# - Throughput statistics
+
+# Usage:
+#   PGPASSWORD=... python pgversion_probe.py db1:5432 db2 /var/run/postgresql --user monitor
+
+#   results = probePGVersions(['db1:5432', 'db2'], user='monitor', password='...')
+
+#   prober = PGVersionProber(user='monitor', password='...', concurrency=200, reuse=True)
+#   results = await prober.probeMany(targets)
+#   await prober.close()
+#   prober.stats.rate()
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import sys
+import time
+from collections import namedtuple, Counter
+
+import pgversion
+
+_protocolVersion = 196608
+_sslRequestCode = 80877103
+_maxMessageLen = 1024 * 1024
+
+_defaultPort = 5432
+_defaultConcurrency = 100
+_defaultTimeout = 5.0
+
+# host is a hostname / address, or a directory holding a Unix domain socket (for e.g. '/var/run/postgresql')
+# serverVersion is the server_version as reported (for e.g. '17.2 (Debian 17.2-1.pgdg120+1)'), None on error
+# version is the Postgres version in it (for e.g. '17.2'), major its major version (False if unknown)
+# released / releaseDate / latestMinor are from isReleasedPGVersion(), getVerReleaseDate() and getLatestMinorPGVersion()
+# error is None, or one of 'timeout', 'connect', 'ssl_unavailable', 'auth_failed', 'unsupported_auth',
+# 'server_error', 'protocol_error' or 'no_version'
+PGProbeResult = namedtuple('PGProbeResult', ['host', 'port', 'serverVersion', 'version', 'major', 'released',
+                                             'releaseDate', 'latestMinor', 'reused', 'elapsed', 'error', 'message'])
+
+
+class _ProbeError(Exception):
+  def __init__(self, code, message='', sqlstate=''):
+    super().__init__(message)
+    self.code = code
+    self.sqlstate = sqlstate
+
+
+class PGProbeStats:
+
+  def __init__(self):
+    self.probes = 0
+    self.reused = 0
+    self.errors = Counter()
+    self.probeTime = 0.0
+    self.started = None
+    self.finished = None
+
+  def add(self, result):
+    if (self.started is None):
+      self.started = time.monotonic() - result.elapsed
+    self.finished = time.monotonic()
+    self.probes += 1
+    self.probeTime += result.elapsed
+    if (result.reused):
+      self.reused += 1
+    if (result.error is not None):
+      self.errors[result.error] += 1
+
+  # Return: Probes completed per second of wall-clock time
+  def rate(self):
+    if (self.started is None) or (self.finished <= self.started):
+      return 0.0
+    return self.probes / (self.finished - self.started)
+
+  # Return: Mean time per probe, in seconds
+  def meanLatency(self):
+    return (self.probeTime / self.probes) if (self.probes) else 0.0
+
+  def toDict(self):
+    return {
+      'probes': self.probes,
+      'ok': self.probes - sum(self.errors.values()),
+      'reused': self.reused,
+      'errors': dict(self.errors),
+      'rate': self.rate(),
+      'meanLatency': self.meanLatency(),
+    }
+
+
+# Return: (host, port) from 'host', 'host:port', '[::1]:port', a (host, port) tuple, or a socket
+# directory with an optional port (for e.g. '/run/postgresql:5433')
+def _parseTarget(target):
+  if (isinstance(target, tuple)):
+    return (target[0], int(target[1]))
+  if (target.startswith('/')):
+    path, sep, port = target.rpartition(':')
+    if (sep) and (port.isdigit()):
+      return (path, int(port))
+    return (target, _defaultPort)
+  if (target.startswith('[')):
+    host, _, rest = target[1:].partition(']')
+    return (host, int(rest[1:]) if (rest.startswith(':')) else _defaultPort)
+  host, sep, port = target.rpartition(':')
+  if (sep) and (port.isdigit()) and (':' not in host):
+    return (host, int(port))
+  return (target, _defaultPort)
+
+
+def _message(kind, payload):
+  return kind + struct.pack('!I', len(payload) + 4) + payload
+
+
+def _cstr(s):
+  return s.encode() + b'\0'
+
+
+class _Connection:
+
+  def __init__(self, reader, writer):
+    self.reader = reader
+    self.writer = writer
+    self.params = {}
+
+  async def read(self):
+    head = await self.reader.readexactly(5)
+    n = struct.unpack_from('!I', head, 1)[0]
+    if (n < 4) or (n > _maxMessageLen):
+      raise _ProbeError('protocol_error', 'Bad message length ' + str(n))
+    return (head[:1], await self.reader.readexactly(n - 4))
+
+  def send(self, data):
+    self.writer.write(data)
+
+  def close(self):
+    try:
+      self.send(_message(b'X', b''))
+    except Exception:
+      pass
+    self.writer.close()
+
+
+# Return: dict of ErrorResponse fields, for e.g. {'C': '28P01', 'M': 'password authentication failed ...'}
+def _errorFields(payload):
+  fields = {}
+  for part in payload.split(b'\0'):
+    if (part):
+      fields[part[:1].decode('latin-1')] = part[1:].decode('utf-8', 'replace')
+  return fields
+
+
+def _raiseServerError(payload, duringAuth):
+  fields = _errorFields(payload)
+  code = fields.get('C', '')
+  # SQLSTATE class 28 is invalid authorization, and 3D000 an unknown database
+  kind = 'auth_failed' if (duringAuth and (code[:2] == '28' or code == '3D000')) else 'server_error'
+  raise _ProbeError(kind, code + ' ' + fields.get('M', ''), code)
+
+
+class _Scram:
+
+  # SCRAM-SHA-256 client (RFC 5802 / RFC 7677), without channel binding
+  def __init__(self, password):
+    self.password = password.encode()
+    self.nonce = base64.b64encode(secrets.token_bytes(18)).decode()
+    self.clientFirstBare = 'n=,r=' + self.nonce
+
+  def first(self):
+    return ('n,,' + self.clientFirstBare).encode()
+
+  def final(self, serverFirst):
+    attrs = dict(a.split('=', 1) for a in serverFirst.decode().split(','))
+    if (not attrs['r'].startswith(self.nonce)):
+      raise _ProbeError('protocol_error', 'SCRAM nonce mismatch')
+    salted = hashlib.pbkdf2_hmac('sha256', self.password, base64.b64decode(attrs['s']), int(attrs['i']))
+    clientKey = hmac.digest(salted, b'Client Key', 'sha256')
+    finalBare = 'c=biws,r=' + attrs['r']
+    self.authMessage = (self.clientFirstBare + ',' + serverFirst.decode() + ',' + finalBare).encode()
+    signature = hmac.digest(hashlib.sha256(clientKey).digest(), self.authMessage, 'sha256')
+    proof = bytes(a ^ b for a, b in zip(clientKey, signature))
+    self.serverKey = hmac.digest(salted, b'Server Key', 'sha256')
+    return (finalBare + ',p=' + base64.b64encode(proof).decode()).encode()
+
+  def verify(self, serverFinal):
+    expected = base64.b64encode(hmac.digest(self.serverKey, self.authMessage, 'sha256')).decode()
+    if (serverFinal.decode() != 'v=' + expected):
+      raise _ProbeError('auth_failed', 'SCRAM server signature mismatch')
+
+
+class PGVersionProber:
+
+  # Input:
+  #   user, password, database - Credentials for the startup handshake (database defaults to user)
+  #   concurrency              - Most probes in flight at a time
+  #   timeout                  - Seconds per probe, connect and handshake included
+  #   reuse                    - Keep connections open, and re-probe with SHOW server_version
+  #   sslContext               - ssl.SSLContext to require TLS, or None for plaintext
+  def __init__(self, user, password=None, database=None, concurrency=_defaultConcurrency, timeout=_defaultTimeout,
+               reuse=False, sslContext=None, applicationName='pgversion_probe'):
+    self.user = user
+    self.password = password
+    self.database = database or user
+    self.timeout = timeout
+    self.reuse = reuse
+    self.sslContext = sslContext
+    self.applicationName = applicationName
+    self.stats = PGProbeStats()
+    self._semaphore = asyncio.Semaphore(concurrency)
+    self._idle = {}
+
+  # Return: PGProbeResult for one server
+  async def probe(self, target):
+    host, port = _parseTarget(target)
+    async with self._semaphore:
+      started = time.monotonic()
+      conn = self._idle.pop((host, port), None)
+      reused = conn is not None
+      serverVersion = None
+      try:
+        if (reused):
+          conn, serverVersion, reused = await asyncio.wait_for(self._reprobe(conn, host, port), self.timeout)
+        else:
+          conn = await asyncio.wait_for(self._connect(host, port), self.timeout)
+          serverVersion = conn.params.get('server_version')
+        if (self.reuse) and ((host, port) not in self._idle):
+          self._idle[(host, port)] = conn
+        else:
+          conn.close()
+        error, message = ((None, '') if (serverVersion) else ('no_version', 'No server_version reported'))
+      except asyncio.TimeoutError:
+        error, message = ('timeout', 'No answer within ' + str(self.timeout) + 's')
+      except _ProbeError as e:
+        error, message = (e.code, str(e))
+      except (OSError, asyncio.IncompleteReadError) as e:
+        error, message = ('connect', str(e) or type(e).__name__)
+      # A misbehaving server (for e.g. a truncated message, or a malformed SCRAM challenge)
+      # fails this probe only, not the whole batch
+      except (ValueError, KeyError, IndexError, struct.error) as e:
+        error, message = ('protocol_error', 'Malformed message - ' + (str(e) or type(e).__name__))
+      if (error is not None) and (conn is not None):
+        conn.writer.close()
+
+      result = _result(host, port, serverVersion, reused, time.monotonic() - started, error, message)
+      self.stats.add(result)
+      return result
+
+  # Return: List of PGProbeResult, in the same order as targets
+  async def probeMany(self, targets):
+    return await asyncio.gather(*(self.probe(t) for t in targets))
+
+  # Close all connections kept open for reuse
+  async def close(self):
+    idle, self._idle = self._idle, {}
+    for conn in idle.values():
+      conn.close()
+    for conn in idle.values():
+      try:
+        await conn.writer.wait_closed()
+      except (OSError, ConnectionError):
+        pass
+
+  async def _connect(self, host, port):
+    if (host.startswith('/')):
+      reader, writer = await asyncio.open_unix_connection(os.path.join(host, '.s.PGSQL.' + str(port)))
+    else:
+      reader, writer = await asyncio.open_connection(host, port)
+    conn = _Connection(reader, writer)
+    try:
+      if (self.sslContext is not None):
+        conn.send(struct.pack('!II', 8, _sslRequestCode))
+        if (await reader.readexactly(1) != b'S'):
+          raise _ProbeError('ssl_unavailable', 'Server does not accept TLS')
+        await writer.start_tls(self.sslContext, server_hostname=None if (host.startswith('/')) else host)
+
+      params = b''.join(_cstr(k) + _cstr(v) for k, v in (
+        ('user', self.user), ('database', self.database), ('application_name', self.applicationName)))
+      payload = struct.pack('!I', _protocolVersion) + params + b'\0'
+      conn.send(struct.pack('!I', len(payload) + 4) + payload)
+      await self._authenticate(conn)
+
+      # ParameterStatus messages follow AuthenticationOk, and end at ReadyForQuery.
+      # Without reuse, stop as soon as server_version is in.
+      while True:
+        kind, payload = await conn.read()
+        if (kind == b'S'):
+          fields = payload.split(b'\0')
+          if (len(fields) < 3):
+            raise _ProbeError('protocol_error', 'Malformed ParameterStatus')
+          name, value = fields[:2]
+          conn.params[name.decode()] = value.decode('utf-8', 'replace')
+          if (name == b'server_version') and (not self.reuse):
+            return conn
+        elif (kind == b'E'):
+          _raiseServerError(payload, False)
+        elif (kind == b'Z'):
+          return conn
+    except BaseException:
+      writer.close()
+      raise
+
+  async def _authenticate(self, conn):
+    scram = None
+    while True:
+      kind, payload = await conn.read()
+      if (kind == b'E'):
+        _raiseServerError(payload, True)
+      if (kind != b'R'):
+        raise _ProbeError('protocol_error', 'Expected an authentication request, got ' + repr(kind))
+      if (len(payload) < 4):
+        raise _ProbeError('protocol_error', 'Truncated authentication request')
+
+      code = struct.unpack_from('!I', payload)[0]
+      if (code == 0):
+        return
+      if (code in (3, 5, 10)) and (self.password is None):
+        raise _ProbeError('auth_failed', 'Server asks for a password, but none was given')
+
+      if (code == 3):
+        conn.send(_message(b'p', _cstr(self.password)))
+      elif (code == 5):
+        inner = hashlib.md5((self.password + self.user).encode()).hexdigest()
+        outer = hashlib.md5(inner.encode() + payload[4:8]).hexdigest()
+        conn.send(_message(b'p', _cstr('md5' + outer)))
+      elif (code == 10):
+        mechanisms = payload[4:].split(b'\0')
+        if (b'SCRAM-SHA-256' not in mechanisms):
+          raise _ProbeError('unsupported_auth', 'SASL mechanisms ' + repr(mechanisms))
+        scram = _Scram(self.password)
+        first = scram.first()
+        conn.send(_message(b'p', _cstr('SCRAM-SHA-256') + struct.pack('!I', len(first)) + first))
+      elif (code == 11) and (scram is not None):
+        conn.send(_message(b'p', scram.final(payload[4:])))
+      elif (code == 12) and (scram is not None):
+        scram.verify(payload[4:])
+      else:
+        raise _ProbeError('unsupported_auth', 'Authentication request ' + str(code))
+
+  # Return: (connection, server_version, reused) from SHOW server_version on a connection kept for reuse
+  # Detail: The server may have closed it since (for e.g. a restart, idle_session_timeout or a pooler),
+  # in which case it's discarded and the server probed once over a new connection
+  async def _reprobe(self, conn, host, port):
+    try:
+      return (conn, await self._show(conn), True)
+    except (OSError, asyncio.IncompleteReadError):
+      pass
+    except _ProbeError as e:
+      # SQLSTATE class 57 is operator intervention, for e.g. 57P01 admin_shutdown or 57P05 idle_session_timeout
+      if (e.sqlstate[:2] != '57'):
+        raise
+    conn.writer.close()
+    conn = await self._connect(host, port)
+    return (conn, conn.params.get('server_version'), False)
+
+  # Return: server_version from SHOW server_version on an open connection
+  async def _show(self, conn):
+    conn.send(_message(b'Q', _cstr('SHOW server_version')))
+    version = None
+    while True:
+      kind, payload = await conn.read()
+      if (kind == b'D'):
+        n = struct.unpack_from('!i', payload, 2)[0]
+        if (n >= 0):
+          version = payload[6:6 + n].decode('utf-8', 'replace')
+      elif (kind == b'E'):
+        _raiseServerError(payload, False)
+      elif (kind == b'Z'):
+        return version
+
+
+def _result(host, port, serverVersion, reused, elapsed, error, message):
+  version, major = (None, False)
+  released, releaseDate, latestMinor = (False, None, None)
+  if (serverVersion):
+    version = serverVersion.split(' ', 1)[0]
+    major = pgversion.getMajorPGVersion(version)
+    if (major is not False):
+      released = pgversion.isReleasedPGVersion(version)
+      d = pgversion.getVerReleaseDate(version)
+      releaseDate = None if (d == '0') else d
+      latestMinor = pgversion.getLatestMinorPGVersion(version) or None
+  return PGProbeResult(host, port, serverVersion, version, major, released, releaseDate, latestMinor,
+                       reused, elapsed, error, message)
+
+
+# Return: (list of PGProbeResult in the same order as targets, PGProbeStats)
+# Detail: Runs its own event loop. See PGVersionProber for the keyword arguments.
+def probePGVersions(targets, user, password=None, **kwargs):
+  async def run():
+    prober = PGVersionProber(user, password, **kwargs)
+    try:
+      return (await prober.probeMany(targets), prober.stats)
+    finally:
+      await prober.close()
+  return asyncio.run(run())
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Probe Postgres servers for their server_version')
+  parser.add_argument('targets', nargs='+', help='host, host:port or a Unix socket directory (optionally with :port)')
+  parser.add_argument('--user', default=os.environ.get('PGUSER', 'postgres'))
+  parser.add_argument('--database', default=os.environ.get('PGDATABASE'))
+  parser.add_argument('--concurrency', type=int, default=_defaultConcurrency)
+  parser.add_argument('--timeout', type=float, default=_defaultTimeout)
+  args = parser.parse_args(argv)
+
+  results, stats = probePGVersions(args.targets, args.user, os.environ.get('PGPASSWORD'), database=args.database,
+                                   concurrency=args.concurrency, timeout=args.timeout)
+  out = sys.stdout
+  for r in results:
+    out.write(r.host + ':' + str(r.port) + ',' + (r.version or '') + ',' + (r.latestMinor or '') + ',' + (r.error or '') + '\n')
+  s = stats.toDict()
+  sys.stderr.write(str(s['probes']) + ' probes, ' + str(s['ok']) + ' ok, ' + '%.1f' % s['rate'] + ' probes/s\n')
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
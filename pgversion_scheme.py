@@ -0,0 +1,229 @@
+# Registry of version schemes, so that forks and managed-service builds can be
+# classified alongside community Postgres Version Strings.
+
+# Features
+# - Each scheme has its own compiled parser, release table and mapping to the upstream Postgres version
+# - A dispatcher routes each input to a scheme with a cheap prefix check (for e.g. 'PgBouncer 1.21.0')
+#   or, for bare version numbers, a shape check (for e.g. Aurora '14.6.4' vs community '14.6')
+# - Built-in schemes: postgresql, aurora, edb, citus, pgbouncer
+# - More schemes can be added with registerPGVersionScheme(), and removed with unregisterPGVersionScheme()
+
+# Usage:
+#   classifyPGVersion('14.6.4')                    -> PGVersionMatch('aurora', '14.6.4', '14.6')
+#   classifyPGVersion('PostgreSQL 16.2 on x86_64') -> PGVersionMatch('postgresql', '16.2', '16.2')
+#   classifyPGVersion('PgBouncer 1.21.0')          -> PGVersionMatch('pgbouncer', '1.21.0', False)
+#   list(classifyPGVersions(inventory))
+
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import pgversion
+
+# Longer than any version() output we expect. Longer input is rejected up-front.
+_maxInputLen = 512
+
+# scheme is the scheme name, version the version as parsed by that scheme and upstream
+# the matching community Postgres version (False if the scheme has no such mapping)
+PGVersionMatch = namedtuple('PGVersionMatch', ['scheme', 'version', 'upstream'])
+
+
+class PGVersionScheme:
+
+  # Input:
+  #   name         - Unique scheme name
+  #   prefixes     - First words (case-insensitive) that identify the scheme, for e.g. ('pgbouncer',)
+  #   pattern      - Regex that captures the version at the start of the text following a prefix
+  #   shape        - Regex for bare version numbers (no prefix) of this scheme, or None
+  #   toUpstream   - Function mapping a version to the community Postgres version (or False)
+  #   validate     - Function returning True if a parsed version is valid for this scheme
+  #   releaseDates - Dict of version -> release date (YYYY-MM-DD)
+  def __init__(self, name, prefixes=(), pattern=None, shape=None, toUpstream=None, validate=None, releaseDates=None):
+    self.name = name
+    self.prefixes = tuple(p.lower() for p in prefixes)
+    self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+    self.shape = re.compile(shape) if isinstance(shape, str) else shape
+    self._toUpstream = toUpstream
+    self._validate = validate
+    self.releaseDates = {} if releaseDates is None else releaseDates
+
+  def __repr__(self):
+    return 'PGVersionScheme(' + repr(self.name) + ')'
+
+  # Return: Version parsed from the text following a prefix, or False
+  def parse(self, rest):
+    if (self.pattern is None):
+      return False
+    m = self.pattern.match(rest)
+    if (m is None) or (not self.isValid(m.group(1))):
+      return False
+    return m.group(1)
+
+  # Return: True if the bare version string has this scheme's shape and is valid
+  def matchesShape(self, s):
+    return (self.shape is not None) and (self.shape.match(s) is not None) and self.isValid(s)
+
+  def isValid(self, version):
+    return True if (self._validate is None) else bool(self._validate(version))
+
+  # Return: Community Postgres version for the version provided, or False if there is none
+  def toUpstream(self, version):
+    if (self._toUpstream is None):
+      return False
+    return self._toUpstream(version)
+
+  # Return: Release date of the version provided, or '0' if unavailable (see getVerReleaseDate())
+  def getReleaseDate(self, version):
+    return self.releaseDates.get(version, '0')
+
+
+# The registry is never modified in place. Registration builds new tables under
+# _registryLock and then rebinds them, so lookups (from any thread) need no lock
+# and always see a complete registry.
+_registryLock = threading.Lock()
+_schemes = {}
+_prefixIndex = {}
+_shapeOrder = ()
+
+
+# Add a scheme to the registry. Schemes with a shape are tried for bare version
+# numbers in registration order, so register the more specific shapes first.
+# Error: Raises ValueError if the name or one of the prefixes is already registered
+def registerPGVersionScheme(scheme):
+  global _schemes, _prefixIndex, _shapeOrder
+
+  with _registryLock:
+    if (scheme.name in _schemes):
+      raise ValueError('Version scheme already registered - ' + scheme.name)
+    for p in scheme.prefixes:
+      if (p in _prefixIndex):
+        raise ValueError('Version scheme prefix already registered - ' + p)
+
+    prefixIndex = dict(_prefixIndex)
+    for p in scheme.prefixes:
+      prefixIndex[p] = scheme
+    _prefixIndex = prefixIndex
+    if (scheme.shape is not None):
+      _shapeOrder = _shapeOrder + (scheme,)
+    _schemes = {**_schemes, scheme.name: scheme}
+    _classify.cache_clear()
+  return scheme
+
+
+# Remove a scheme from the registry (for e.g. one registered for a test)
+# Return: The scheme removed, or None if no scheme of that name is registered
+def unregisterPGVersionScheme(name):
+  global _schemes, _prefixIndex, _shapeOrder
+
+  with _registryLock:
+    scheme = _schemes.get(name)
+    if (scheme is None):
+      return None
+
+    _prefixIndex = {p: sc for p, sc in _prefixIndex.items() if (sc is not scheme)}
+    _shapeOrder = tuple(sc for sc in _shapeOrder if (sc is not scheme))
+    _schemes = {n: sc for n, sc in _schemes.items() if (n != name)}
+    _classify.cache_clear()
+  return scheme
+
+
+# Return: Registered scheme of that name, or None
+def getPGVersionScheme(name):
+  return _schemes.get(name)
+
+
+# Return: PGVersionMatch for the version string provided, or None if no scheme matches
+def classifyPGVersion(_s):
+  s = pgversion._asVerString(_s).strip()
+  if (not s) or (len(s) > _maxInputLen):
+    return None
+  return _classify(s)
+
+
+# Return: Generator of PGVersionMatch (or None) for each version string provided
+def classifyPGVersions(versions):
+  for v in versions:
+    yield classifyPGVersion(v)
+
+
+@lru_cache(maxsize=4096)
+def _classify(s):
+  first, _, rest = s.partition(' ')
+  scheme = _prefixIndex.get(first.lower())
+  if (scheme is not None):
+    version = scheme.parse(rest.lstrip())
+    if (version is False):
+      return None
+    return PGVersionMatch(scheme.name, version, scheme.toUpstream(version))
+
+  for scheme in _shapeOrder:
+    if (scheme.matchesShape(s)):
+      return PGVersionMatch(scheme.name, s, scheme.toUpstream(s))
+
+  return None
+
+
+# Return: Community version for a 'major.minor[.x...]' fork version, for e.g. '14.6.4' -> '14.6'
+# and (pre v10) '9.6.2.7' -> '9.6.2'
+# Error: Return False if that isn't a valid Postgres version
+def _upstreamFromPrefix(version):
+  parts = version.split('.')
+  if (not parts[0].isdigit()):
+    return False
+  n = 2 if (int(parts[0]) >= 10) else 3
+  if (len(parts) < n):
+    return False
+  upstream = '.'.join(parts[:n])
+  return upstream if pgversion.isValidPGVersion(upstream) else False
+
+
+def _isForkOfValidVersion(version):
+  return _upstreamFromPrefix(version) is not False
+
+
+_versionAtStart = r'(\d+(?:\.\d+)*)(?![\d.]*\w)'
+
+registerPGVersionScheme(PGVersionScheme(
+  'postgresql',
+  prefixes=('postgresql', 'postgres'),
+  pattern=r'(\d+(?:\.\d+)*(?:(?:beta|rc)\d+|devel)?)(?![\d.]*\w)',
+  shape=r'^(?:\d\.\d+\.\d+|\d+\.\d+|\d+(?:\.\d+)?(?:(?:beta|rc)\d+|devel))$',
+  toUpstream=lambda v: v,
+  validate=pgversion.isValidPGVersion,
+  releaseDates={**pgversion._verReleaseDates, **pgversion._verPrereleaseDates},
+))
+
+# Amazon Aurora PostgreSQL, for e.g. '14.6.4' (the Postgres version plus an Aurora patch level)
+registerPGVersionScheme(PGVersionScheme(
+  'aurora',
+  prefixes=('aurora',),
+  pattern=r'(?i:postgresql\s+)?' + _versionAtStart,
+  shape=r'^\d{2}\.\d+\.\d+$',
+  toUpstream=_upstreamFromPrefix,
+  validate=_isForkOfValidVersion,
+))
+
+# EDB Postgres Advanced Server, for e.g. 'EnterpriseDB 9.6.2.7' or 'EDB 15.2.0'
+registerPGVersionScheme(PGVersionScheme(
+  'edb',
+  prefixes=('enterprisedb', 'edb'),
+  pattern=_versionAtStart,
+  toUpstream=_upstreamFromPrefix,
+  validate=_isForkOfValidVersion,
+))
+
+# Citus (extension), for e.g. 'Citus 12.1.1 on x86_64-pc-linux-gnu'. A Citus release
+# supports several Postgres major versions, so there is no upstream mapping.
+registerPGVersionScheme(PGVersionScheme(
+  'citus',
+  prefixes=('citus',),
+  pattern=_versionAtStart,
+))
+
+# PgBouncer (connection pooler), for e.g. 'PgBouncer 1.21.0'. Not a Postgres version.
+registerPGVersionScheme(PGVersionScheme(
+  'pgbouncer',
+  prefixes=('pgbouncer',),
+  pattern=_versionAtStart,
+))
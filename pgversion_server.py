@@ -0,0 +1,301 @@
+# Long-lived local version-lookup service for Postgres Version Strings.
+
+# Features
+# - Serves validate / parse / releasedate / compare / latestminor queries over HTTP
+# - Listens on TCP (localhost by default) and / or a Unix domain socket
+# - Batch endpoints that accept thousands of versions per request
+# - In-process response cache (bounded, and skipped for input longer than any valid version)
+# - Keep-alive connections (HTTP/1.1), so clients don't pay a connect per query
+
+# Usage:
+#   python pgversion_server.py --port 8432 --unix /tmp/pgversion.sock
+#   python pgversion.py --serve --port 8432
+
+#   curl 'http://127.0.0.1:8432/validate?v=17.9'
+#   curl 'http://127.0.0.1:8432/compare?v1=12.14&v2=15.1'
+#   curl -d '{"versions": ["9.6.1", "17.9", "junk"]}' http://127.0.0.1:8432/batch/parse
+#   curl -d '{"pairs": [["12.14", "15.1"]]}' http://127.0.0.1:8432/batch/compare
+#   curl --unix-socket /tmp/pgversion.sock 'http://localhost/latestminor?v=15.4'
+
+import argparse
+import asyncio
+import json
+import sys
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qs
+
+import pgversion
+
+_maxHeaderBytes = 16 * 1024
+_maxBodyBytes = 16 * 1024 * 1024
+_cacheSize = 65536
+
+_statusText = {
+  200: 'OK',
+  400: 'Bad Request',
+  404: 'Not Found',
+  405: 'Method Not Allowed',
+  413: 'Payload Too Large',
+}
+
+
+# Return: dict with the validity and release status of the postgres version provided
+def answerValidate(v):
+  return {
+    'version': v,
+    'valid': pgversion.isValidPGVersion(v),
+    'released': pgversion.isReleasedPGVersion(v),
+  }
+
+
+# Return: dict with Major, Minor and version number of the postgres version provided
+def answerParse(v):
+  if (not pgversion.isValidPGVersion(v)):
+    return {'version': v, 'valid': False}
+
+  return {
+    'version': v,
+    'valid': True,
+    'major': pgversion.getMajorPGVersion(v),
+    'minor': pgversion.getMinorPGVersion(v),
+    'vernum': pgversion.getPGVerNumFromString(v),
+  }
+
+
+# Return: dict with the release date of the postgres version provided (None if unavailable)
+def answerReleaseDate(v):
+  d = pgversion.getVerReleaseDate(v)
+  return {'version': v, 'date': None if (d == '0') else d}
+
+
+# Return: dict comparing the two postgres versions provided
+# Detail: 'released_after' is IsVerReleasedAfter(v1, v2) and 'vernum_cmp' is -1, 0 or 1
+# when comparing versions (None if either version is invalid). Versions are compared by
+# getPGVersionSortKey(), so a prerelease sorts before its release (17beta3 < 17.0).
+def answerCompare(v1, v2):
+  n1 = pgversion.getPGVersionSortKey(v1)
+  n2 = pgversion.getPGVersionSortKey(v2)
+  if (n1 is False) or (n2 is False):
+    cmp = None
+  else:
+    cmp = (n1 > n2) - (n1 < n2)
+
+  return {
+    'v1': v1,
+    'v2': v2,
+    'released_after': pgversion.IsVerReleasedAfter(v1, v2),
+    'vernum_cmp': cmp,
+  }
+
+
+# Return: dict with the latest minor release for the major version of the postgres version provided
+# Detail: 'behind' is the number of minor releases between the version provided and the latest one
+def answerLatestMinor(v):
+  latest = pgversion.getLatestMinorPGVersion(v)
+  if (latest is False):
+    return {'version': v, 'latest': None}
+
+  behind = None
+  if (pgversion.isValidPGVersion(v)):
+    behind = max(pgversion.getMinorPGVersion(latest) - pgversion.getMinorPGVersion(v), 0)
+
+  return {'version': v, 'latest': latest, 'behind': behind}
+
+
+_singleAnswers = {
+  'validate': answerValidate,
+  'parse': answerParse,
+  'releasedate': answerReleaseDate,
+  'latestminor': answerLatestMinor,
+}
+
+
+# Detail: Answers are cached per (op, version). Fleet data has very few distinct
+# versions, so batch requests are mostly served from here.
+@lru_cache(maxsize=_cacheSize)
+def _cachedAnswer(op, v):
+  return _singleAnswers[op](v)
+
+
+@lru_cache(maxsize=_cacheSize)
+def _cachedCompare(v1, v2):
+  return answerCompare(v1, v2)
+
+
+# Return: Version as echoed in an answer, cut short if longer than any valid version
+def _echo(v):
+  return v if (len(v) <= pgversion._maxVerStrLen) else v[:pgversion._maxVerStrLen] + '...'
+
+
+# Return: Answer for op, see _singleAnswers
+# Detail: The cache bounds the number of answers, not their size. Versions longer than
+# pgversion._maxVerStrLen are rejected in constant time anyway, so they skip the cache
+# and are echoed truncated, and distinct long junk in a batch can't pin memory.
+def _answer(op, v):
+  if (len(v) <= pgversion._maxVerStrLen):
+    return _cachedAnswer(op, v)
+  return dict(_singleAnswers[op](v), version=_echo(v))
+
+
+# Return: Answer comparing v1 and v2, see answerCompare() and _answer()
+def _compare(v1, v2):
+  if (len(v1) <= pgversion._maxVerStrLen) and (len(v2) <= pgversion._maxVerStrLen):
+    return _cachedCompare(v1, v2)
+  return dict(answerCompare(v1, v2), v1=_echo(v1), v2=_echo(v2))
+
+
+class _HTTPError(Exception):
+  def __init__(self, status, message):
+    super().__init__(message)
+    self.status = status
+
+
+# Return: Response dict for the request
+# Error: Raises _HTTPError for unknown paths, bad methods or malformed input
+def handleRequest(method, target, body):
+  url = urlsplit(target)
+  path = url.path.rstrip('/')
+  query = parse_qs(url.query)
+
+  if (path.startswith('/batch/')):
+    op = path[len('/batch/'):]
+    if (method != 'POST'):
+      raise _HTTPError(405, 'Batch endpoints require POST')
+    try:
+      req = json.loads(body or b'{}')
+    except ValueError:
+      raise _HTTPError(400, 'Request body is not valid JSON')
+    if (not isinstance(req, dict)):
+      raise _HTTPError(400, 'Request body should be a JSON object')
+
+    if (op == 'compare'):
+      pairs = req.get('pairs')
+      if (not isinstance(pairs, list)) or (not all(isinstance(p, list) and len(p) == 2 for p in pairs)):
+        raise _HTTPError(400, "Expected 'pairs': [[v1, v2], ...]")
+      return {'results': [_compare(str(p[0]), str(p[1])) for p in pairs]}
+
+    if (op in _singleAnswers):
+      versions = req.get('versions')
+      if (not isinstance(versions, list)):
+        raise _HTTPError(400, "Expected 'versions': [v, ...]")
+      return {'results': [_answer(op, str(v)) for v in versions]}
+
+    raise _HTTPError(404, 'Unknown endpoint - ' + path)
+
+  op = path.lstrip('/')
+  if (method != 'GET'):
+    raise _HTTPError(405, 'Query endpoints require GET')
+
+  if (op == 'compare'):
+    if ('v1' not in query) or ('v2' not in query):
+      raise _HTTPError(400, "Expected query parameters 'v1' and 'v2'")
+    return _compare(query['v1'][0], query['v2'][0])
+
+  if (op in _singleAnswers):
+    if ('v' not in query):
+      raise _HTTPError(400, "Expected query parameter 'v'")
+    return _answer(op, query['v'][0])
+
+  raise _HTTPError(404, 'Unknown endpoint - ' + path)
+
+
+def _encodeResponse(status, payload, keepAlive):
+  body = json.dumps(payload, separators=(',', ':')).encode()
+  head = (
+    'HTTP/1.1 ' + str(status) + ' ' + _statusText.get(status, '') + '\r\n'
+    'Content-Type: application/json\r\n'
+    'Content-Length: ' + str(len(body)) + '\r\n'
+    'Connection: ' + ('keep-alive' if keepAlive else 'close') + '\r\n'
+    '\r\n'
+  ).encode()
+  return head + body
+
+
+# Serves one client connection until it closes (or asks to close)
+async def _serveConnection(reader, writer):
+  try:
+    while True:
+      try:
+        head = await reader.readuntil(b'\r\n\r\n')
+      except (asyncio.IncompleteReadError, ConnectionError):
+        return
+      except asyncio.LimitOverrunError:
+        writer.write(_encodeResponse(413, {'error': 'Request header too large'}, False))
+        return
+
+      lines = head.decode('latin-1').split('\r\n')
+      try:
+        method, target, version = lines[0].split(' ', 2)
+      except ValueError:
+        writer.write(_encodeResponse(400, {'error': 'Malformed request line'}, False))
+        return
+
+      headers = {}
+      for line in lines[1:]:
+        if (':' in line):
+          k, val = line.split(':', 1)
+          headers[k.strip().lower()] = val.strip()
+
+      keepAlive = (version == 'HTTP/1.1') and (headers.get('connection', '').lower() != 'close')
+
+      body = b''
+      try:
+        length = int(headers.get('content-length', '0'))
+      except ValueError:
+        length = -1
+      if (length < 0) or (length > _maxBodyBytes):
+        writer.write(_encodeResponse(413, {'error': 'Invalid or oversized request body'}, False))
+        return
+      if (length):
+        try:
+          body = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+          return
+
+      try:
+        status, payload = 200, handleRequest(method, target, body)
+      except _HTTPError as e:
+        status, payload = e.status, {'error': str(e)}
+
+      writer.write(_encodeResponse(status, payload, keepAlive))
+      await writer.drain()
+      if (not keepAlive):
+        return
+  finally:
+    writer.close()
+
+
+# Return: List of started asyncio servers (TCP and / or Unix domain socket)
+# Detail: Pass port=0 to bind an ephemeral port (see servers[0].sockets[0].getsockname())
+async def startServers(host='127.0.0.1', port=None, unixPath=None):
+  servers = []
+  if (port is not None):
+    servers.append(await asyncio.start_server(_serveConnection, host, port, limit=_maxHeaderBytes))
+  if (unixPath is not None):
+    servers.append(await asyncio.start_unix_server(_serveConnection, unixPath, limit=_maxHeaderBytes))
+  return servers
+
+
+async def serve(host='127.0.0.1', port=None, unixPath=None):
+  servers = await startServers(host, port, unixPath)
+  await asyncio.gather(*(s.serve_forever() for s in servers))
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Postgres version lookup service')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=None, help='TCP port (default 8432 unless --unix is given)')
+  parser.add_argument('--unix', default=None, help='Unix domain socket path')
+  args = parser.parse_args(argv)
+
+  port = args.port
+  if (port is None) and (args.unix is None):
+    port = 8432
+
+  try:
+    asyncio.run(serve(args.host, port, args.unix))
+  except KeyboardInterrupt:
+    pass
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
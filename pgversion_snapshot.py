@@ -0,0 +1,213 @@
+# Diff of two fleet version snapshots (instance id -> Postgres Version String).
+
+# Features
+# - Classifies every instance as a minor / major upgrade, downgrade, added, removed or unknown version
+# - Each distinct version string is parsed only once per diff (fleets have few distinct versions),
+#   with a bounded cache so that mostly unique junk values do not grow memory
+# - Hash join for snapshots that fit in memory, streaming sort-merge join for pre-sorted inputs
+#   (for e.g. on-disk files larger than memory)
+# - External sort helper to prepare sorted snapshot files
+
+# Snapshot files have one "instance,version" row per line. Blank lines and lines starting with '#' are skipped.
+
+# Usage:
+#   python pgversion_snapshot.py yesterday.csv today.csv [--sorted] [--all]
+
+#   for c in diffSnapshotFiles('yesterday.csv', 'today.csv', presorted=True):
+#     print(c.instance, c.old, c.new, c.kind)
+
+import argparse
+import heapq
+import os
+import sys
+import tempfile
+from collections import namedtuple
+from functools import lru_cache
+
+import pgversion
+
+# Distinct version strings cached per diff. Bounded, so that a column of mostly unique
+# junk doesn't defeat the constant memory of a presorted diff.
+_cacheSize = 4096
+
+# kind is one of 'unchanged', 'minor_upgrade', 'major_upgrade', 'downgrade', 'added', 'removed' or 'unknown'
+# releaseDelta is the difference in release ordinals (see getVerReleaseOrdinal()), None if either side is unreleased
+PGVersionChange = namedtuple('PGVersionChange', ['instance', 'old', 'new', 'kind', 'releaseDelta'])
+
+
+class _VersionParser:
+
+  # Caches (sort key, major version number, release ordinal) per version string,
+  # for the last _cacheSize distinct version strings
+  # Detail: The sort key (see getPGVersionSortKey()) orders prereleases before the
+  # release, for e.g. 17beta3 < 17.0, which share a version number
+  def __init__(self):
+    self.parse = lru_cache(maxsize=_cacheSize)(self._parse)
+
+  def _parse(self, s):
+    key = pgversion.getPGVersionSortKey(s)
+    if (key is False):
+      return None
+
+    # The sort key starts with the major version number, for e.g. 90601 -> 90600 and 170009 -> 170000
+    ordinal = pgversion.getVerReleaseOrdinal(s)
+    return (key, key[0], None if (ordinal is False) else ordinal)
+
+
+def _classify(parser, instance, old, new, includeUnchanged):
+  if (old is None):
+    return PGVersionChange(instance, None, new, 'added', None)
+  if (new is None):
+    return PGVersionChange(instance, old, None, 'removed', None)
+
+  p1 = parser.parse(old)
+  p2 = parser.parse(new)
+  if (p1 is None) or (p2 is None):
+    return PGVersionChange(instance, old, new, 'unknown', None)
+
+  delta = None
+  if (p1[2] is not None) and (p2[2] is not None):
+    delta = p2[2] - p1[2]
+
+  if (p1[0] == p2[0]):
+    if (not includeUnchanged):
+      return None
+    kind = 'unchanged'
+  elif (p2[0] < p1[0]):
+    kind = 'downgrade'
+  elif (p2[1] == p1[1]):
+    kind = 'minor_upgrade'
+  else:
+    kind = 'major_upgrade'
+
+  return PGVersionChange(instance, old, new, kind, delta)
+
+
+# Return: Generator of PGVersionChange for every instance in either snapshot
+# Input: old and new are iterables of (instance, version) rows.
+# Detail: With presorted=True both inputs must be sorted by instance id and are
+# streamed (sort-merge join, constant memory). Otherwise old is loaded into a dict
+# (hash join). Unchanged instances are skipped unless includeUnchanged=True.
+# Error: Raises ValueError if presorted input isn't sorted by instance id
+def diffSnapshots(old, new, presorted=False, includeUnchanged=False):
+  parser = _VersionParser()
+  if (presorted):
+    changes = _mergeJoin(old, new)
+  else:
+    changes = _hashJoin(old, new)
+
+  for instance, v1, v2 in changes:
+    c = _classify(parser, instance, v1, v2, includeUnchanged)
+    if (c is not None):
+      yield c
+
+
+def _hashJoin(old, new):
+  before = dict(old)
+  for instance, v2 in new:
+    yield (instance, before.pop(instance, None), v2)
+  for instance, v1 in before.items():
+    yield (instance, v1, None)
+
+
+def _sortedRows(rows, name):
+  last = None
+  for row in rows:
+    if (last is not None) and (row[0] < last):
+      raise ValueError(name + ' snapshot is not sorted by instance id - ' + repr(row[0]) + ' after ' + repr(last))
+    last = row[0]
+    yield row
+
+
+def _mergeJoin(old, new):
+  it1 = _sortedRows(old, 'old')
+  it2 = _sortedRows(new, 'new')
+  r1 = next(it1, None)
+  r2 = next(it2, None)
+  while (r1 is not None) or (r2 is not None):
+    if (r2 is None) or ((r1 is not None) and (r1[0] < r2[0])):
+      yield (r1[0], r1[1], None)
+      r1 = next(it1, None)
+    elif (r1 is None) or (r2[0] < r1[0]):
+      yield (r2[0], None, r2[1])
+      r2 = next(it2, None)
+    else:
+      yield (r1[0], r1[1], r2[1])
+      r1 = next(it1, None)
+      r2 = next(it2, None)
+
+
+# Return: Generator of (instance, version) rows from a snapshot file
+def readSnapshotFile(path, delimiter=','):
+  with open(path, 'r', newline='') as f:
+    for line in f:
+      line = line.strip()
+      if (not line) or (line[0] == '#'):
+        continue
+      instance, _, ver = line.partition(delimiter)
+      yield (instance.strip(), ver.strip())
+
+
+# Return: Generator of PGVersionChange between two snapshot files, see diffSnapshots()
+def diffSnapshotFiles(oldPath, newPath, presorted=False, includeUnchanged=False, delimiter=','):
+  return diffSnapshots(readSnapshotFile(oldPath, delimiter), readSnapshotFile(newPath, delimiter),
+                       presorted=presorted, includeUnchanged=includeUnchanged)
+
+
+# Sort a snapshot file by instance id, in chunks of chunkRows rows (external merge sort),
+# so that it can be diffed with presorted=True without holding it in memory
+def sortSnapshotFile(inPath, outPath, chunkRows=1000000, delimiter=','):
+  chunks = []
+  try:
+    rows = []
+    for row in readSnapshotFile(inPath, delimiter):
+      rows.append(row)
+      if (len(rows) >= chunkRows):
+        chunks.append(_writeChunk(rows, delimiter))
+        rows = []
+    rows.sort()
+
+    files = [open(c, 'r', newline='') for c in chunks]
+    try:
+      streams = [_readChunk(f, delimiter) for f in files] + [iter(rows)]
+      with open(outPath, 'w', newline='') as out:
+        for instance, ver in heapq.merge(*streams):
+          out.write(instance + delimiter + ver + '\n')
+    finally:
+      for f in files:
+        f.close()
+  finally:
+    for c in chunks:
+      os.unlink(c)
+
+
+def _writeChunk(rows, delimiter):
+  rows.sort()
+  fd, path = tempfile.mkstemp(prefix='pgversion-snapshot-')
+  with os.fdopen(fd, 'w', newline='') as f:
+    for instance, ver in rows:
+      f.write(instance + delimiter + ver + '\n')
+  return path
+
+
+def _readChunk(f, delimiter):
+  for line in f:
+    instance, _, ver = line.rstrip('\n').partition(delimiter)
+    yield (instance, ver)
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Diff two fleet version snapshots')
+  parser.add_argument('old')
+  parser.add_argument('new')
+  parser.add_argument('--sorted', action='store_true', help='Inputs are sorted by instance id (streaming merge join)')
+  parser.add_argument('--all', action='store_true', help='Also print unchanged instances')
+  parser.add_argument('--delimiter', default=',')
+  args = parser.parse_args(argv)
+
+  out = sys.stdout
+  for c in diffSnapshotFiles(args.old, args.new, args.sorted, args.all, args.delimiter):
+    out.write(c.instance + ',' + (c.old or '') + ',' + (c.new or '') + ',' + c.kind + '\n')
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
@@ -0,0 +1,186 @@
+# SQL export of the release catalog, so that version checks can run inside a database.
+
+# Features
+# - PostgreSQL script: DDL, the release table as COPY data, and SQL functions matching
+#   isValidPGVersion(), isReleasedPGVersion(), getPGVerNumFromString() and IsVerReleasedAfter()
+# - SQLite script (DDL and INSERTs), and a loader that also registers the same functions
+#   (SQLite has no CREATE FUNCTION, so they are registered on the connection)
+
+# Usage:
+#   python pgversion_sql.py > pgversion.sql && psql -f pgversion.sql
+#   python pgversion_sql.py --dialect sqlite | sqlite3 versions.db
+
+#   SELECT i.host, i.version, r.release_date
+#   FROM inventory i LEFT JOIN pgversion_release r USING (version)
+#   WHERE NOT pgversion_is_released(i.version) OR pgversion_num(i.version) < 150000;
+
+#   conn = sqlite3.connect(':memory:')
+#   loadSQLite(conn)
+
+import argparse
+import sys
+
+import pgversion
+
+_columns = ('version', 'vernum', 'major', 'minor', 'prerelease', 'release_date', 'release_ordinal')
+
+_postgresDDL = '''CREATE TABLE IF NOT EXISTS pgversion_release (
+  version         text PRIMARY KEY,
+  vernum          integer NOT NULL,
+  major           numeric NOT NULL,
+  minor           integer NOT NULL,
+  prerelease      text,
+  release_date    date NOT NULL,
+  release_ordinal integer
+);
+CREATE INDEX IF NOT EXISTS pgversion_release_vernum ON pgversion_release (vernum);
+TRUNCATE pgversion_release;
+'''
+
+# Bare version shapes (10+) that are valid without being in the release table, see _checkPGVersion()
+_pgMinorVersionPattern = r'^[0-9]+\.[0-9]+$'
+_pgPrereleasePattern = r'^[0-9]+(devel|(beta|rc)0*[1-9][0-9]*)$'
+
+_postgresFunctions = '''
+-- isReleasedPGVersion()
+CREATE OR REPLACE FUNCTION pgversion_is_released(v text) RETURNS boolean
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+  SELECT EXISTS (SELECT 1 FROM pgversion_release r WHERE r.version = v)
+$$;
+
+-- isValidPGVersion(). Versions up to v10 are valid only if they're in the release table.
+CREATE OR REPLACE FUNCTION pgversion_is_valid(v text) RETURNS boolean
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+  SELECT CASE
+    WHEN v IS NULL THEN NULL
+    WHEN pgversion_is_released(v) THEN true
+    WHEN length(v) NOT BETWEEN 4 AND 16 THEN false
+    WHEN v ~ '%(minor)s' THEN
+      split_part(v, '.', 1)::numeric BETWEEN 11 AND 99 AND split_part(v, '.', 2)::numeric < 10000
+    WHEN v ~ '%(prerelease)s' THEN
+      substring(v from '^[0-9]+')::numeric BETWEEN 11 AND 99
+    ELSE false
+  END
+$$;
+
+-- getPGVerNumFromString(), NULL for invalid versions
+CREATE OR REPLACE FUNCTION pgversion_num(v text) RETURNS integer
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+  SELECT coalesce(
+    (SELECT r.vernum FROM pgversion_release r WHERE r.version = v),
+    CASE WHEN pgversion_is_valid(v) THEN
+      substring(v from '^[0-9]+')::integer * 10000 + coalesce(substring(v from '^[0-9]+\\.([0-9]+)$')::integer, 0)
+    END)
+$$;
+
+-- IsVerReleasedAfter(), false if either version has no release date
+CREATE OR REPLACE FUNCTION pgversion_released_after(v1 text, v2 text) RETURNS boolean
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+  SELECT coalesce(
+    (SELECT r1.release_date > r2.release_date
+     FROM pgversion_release r1, pgversion_release r2
+     WHERE r1.version = v1 AND r2.version = v2),
+    false)
+$$;
+''' % {'minor': _pgMinorVersionPattern, 'prerelease': _pgPrereleasePattern}
+
+_sqliteDDL = '''CREATE TABLE IF NOT EXISTS pgversion_release (
+  version         TEXT PRIMARY KEY,
+  vernum          INTEGER NOT NULL,
+  major           NUMERIC NOT NULL,
+  minor           INTEGER NOT NULL,
+  prerelease      TEXT,
+  release_date    TEXT NOT NULL,
+  release_ordinal INTEGER
+);
+CREATE INDEX IF NOT EXISTS pgversion_release_vernum ON pgversion_release (vernum);
+DELETE FROM pgversion_release;
+'''
+
+
+# Return: List of release table rows (see _columns), in release order (see getPGVersionSortKey())
+# Detail: Releases from _verReleaseDates and prereleases from _verPrereleaseDates. Prereleases
+# have the version number of their .0 release, minor 0 and no release ordinal.
+def getReleaseRows():
+  rows = []
+  for dates in (pgversion._verReleaseDates, pgversion._verPrereleaseDates):
+    for ver, dt in dates.items():
+      if (not pgversion.isValidPGVersion(ver)):
+        continue
+      pre = pgversion.getPGPrerelease(ver)
+      ordinal = pgversion.getVerReleaseOrdinal(ver)
+      rows.append((
+        ver,
+        pgversion.getPGVerNumFromString(ver),
+        pgversion.getMajorPGVersion(ver),
+        pgversion.getMinorPGVersion(ver),
+        None if (pre is False) else pre[0] + (str(pre[1]) if (pre[1]) else ''),
+        dt,
+        None if (ordinal is False) else ordinal,
+      ))
+  rows.sort(key=lambda r: pgversion.getPGVersionSortKey(r[0]))
+  return rows
+
+
+def _copyValue(v):
+  return '\\N' if (v is None) else str(v)
+
+
+def _sqlValue(v):
+  if (v is None):
+    return 'NULL'
+  if (isinstance(v, str)):
+    return "'" + v.replace("'", "''") + "'"
+  return str(v)
+
+
+# Return: PostgreSQL script with the DDL, COPY data and functions
+def getPostgresSQL():
+  lines = ['BEGIN;', _postgresDDL]
+  lines.append('COPY pgversion_release (' + ', '.join(_columns) + ') FROM stdin;')
+  for row in getReleaseRows():
+    lines.append('\t'.join(_copyValue(v) for v in row))
+  lines.append('\\.')
+  lines.append(_postgresFunctions)
+  lines.append('COMMIT;')
+  return '\n'.join(lines) + '\n'
+
+
+# Return: SQLite script with the DDL and data
+def getSQLiteSQL():
+  lines = ['BEGIN;', _sqliteDDL]
+  insert = 'INSERT INTO pgversion_release (' + ', '.join(_columns) + ') VALUES ('
+  for row in getReleaseRows():
+    lines.append(insert + ', '.join(_sqlValue(v) for v in row) + ');')
+  lines.append('COMMIT;')
+  return '\n'.join(lines) + '\n'
+
+
+def _sqlBool(b):
+  return 1 if (b) else 0
+
+
+def _sqliteVerNum(v):
+  n = pgversion.getPGVerNumFromString(v)
+  return None if (n is False) else n
+
+
+# Create and fill the release table on an sqlite3 connection, and register the functions
+# pgversion_is_valid(), pgversion_is_released(), pgversion_num() and pgversion_released_after()
+def loadSQLite(conn):
+  conn.executescript(getSQLiteSQL())
+  conn.create_function('pgversion_is_valid', 1, lambda v: None if (v is None) else _sqlBool(pgversion.isValidPGVersion(v)), deterministic=True)
+  conn.create_function('pgversion_is_released', 1, lambda v: _sqlBool(pgversion.isReleasedPGVersion(v)), deterministic=True)
+  conn.create_function('pgversion_num', 1, _sqliteVerNum, deterministic=True)
+  conn.create_function('pgversion_released_after', 2, lambda v1, v2: _sqlBool(pgversion.IsVerReleasedAfter(v1, v2)), deterministic=True)
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='Export the Postgres release catalog as SQL')
+  parser.add_argument('--dialect', choices=('postgresql', 'sqlite'), default='postgresql')
+  args = parser.parse_args(argv)
+
+  sys.stdout.write(getPostgresSQL() if (args.dialect == 'postgresql') else getSQLiteSQL())
+
+if (__name__ == '__main__'):
+  main(sys.argv[1:])
@@ -1,3 +1,6 @@
+import contextlib
+import io
+import threading
 import unittest
 import pgversion as v
 
@@ -188,5 +191,136 @@ class TestMethods(unittest.TestCase):
     self.assertEqual(v.IsVerReleasedAfter('...', '12.0'), False)
     self.assertEqual(v.IsVerReleasedAfter('#', '12.0'), False)
 
+  def test_adversarial_inputs(self):
+    class BrokenStr:
+      def __str__(self):
+        raise RuntimeError('broken')
+
+    for s in ['1' * 50000 + '.1', '9' * 5000, '.' * 100000, '1.' * 50000, 10 ** 5000, BrokenStr(), None, b'11.1']:
+      self.assertEqual(v.isValidPGVersion(s), False)
+      self.assertEqual(v.isReleasedPGVersion(s), False)
+      self.assertEqual(v.getMajorPGVersion(s), False)
+      self.assertEqual(v.getMinorPGVersion(s), False)
+      self.assertEqual(v.parsePGVersion(s), False)
+      self.assertEqual(v.getPGVerNumFromString(s), False)
+      self.assertEqual(v.getVerReleaseDate(s), '0')
+      self.assertEqual(v.IsVerReleasedAfter(s, '12.0'), False)
+      self.assertEqual(v.IsVerReleasedAfter('12.1', s), False)
+      self.assertEqual(v.getLatestMinorPGVersion(s), False)
+    self.assertEqual(v.getVerReleaseDate(12.1), '2019-11-14')
+    self.assertEqual(v.convToYYYYMMDD('2023-02-31'), 0)
+
+  def test_getPGVersionValidity(self):
+    self.assertEqual(v.getPGVersionValidity('17.9'), 'valid')
+    self.assertEqual(v.getPGVersionValidity('9.6.1'), 'valid')
+    self.assertEqual(v.getPGVersionValidity('17'), 'too_short')
+    self.assertEqual(v.getPGVersionValidity('1' * 100), 'too_long')
+    self.assertEqual(v.getPGVersionValidity('12.'), 'too_short')
+    self.assertEqual(v.getPGVersionValidity('12.1.'), 'dot_at_ends')
+    self.assertEqual(v.getPGVersionValidity('12..1'), 'adjacent_dots')
+    self.assertEqual(v.getPGVersionValidity('12.a'), 'bad_characters')
+    self.assertEqual(v.getPGVersionValidity('1232'), 'no_minor')
+    self.assertEqual(v.getPGVersionValidity('1.2.3.4'), 'too_many_dots')
+    self.assertEqual(v.getPGVersionValidity('9.7.1'), 'unknown_pre10')
+    self.assertEqual(v.getPGVersionValidity('10.24'), 'unknown_eol')
+    self.assertEqual(v.getPGVersionValidity('100.1'), 'major_too_large')
+    self.assertEqual(v.getPGVersionValidity('11.10000'), 'minor_too_large')
+
+  def test_getVerReleaseOrdinal(self):
+    self.assertEqual(v.getVerReleaseOrdinal('18.3'), v.getVerReleaseOrdinal('14.22'))
+    self.assertTrue(v.getVerReleaseOrdinal('12.14') > v.getVerReleaseOrdinal('15.1'))
+    self.assertTrue(v.getVerReleaseOrdinal('9.6.0') < v.getVerReleaseOrdinal('9.6.1'))
+    self.assertEqual(v.getVerReleaseOrdinal('11.30'), False)
+    self.assertEqual(v.getVerReleaseOrdinal('a'), False)
+
+  def test_prerelease_positives(self):
+    self.assertEqual(v.isValidPGVersion('17beta3'), True)
+    self.assertEqual(v.isValidPGVersion('18rc1'), True)
+    self.assertEqual(v.isValidPGVersion('19devel'), True)
+    self.assertEqual(v.isReleasedPGVersion('17beta3'), True)
+    self.assertEqual(v.isReleasedPGVersion('19devel'), False)
+    self.assertEqual(v.getMajorPGVersion('17beta3'), 17)
+    self.assertEqual(v.getMinorPGVersion('17beta3'), 0)
+    self.assertEqual(v.parsePGVersion('18rc1'), [18, 0])
+    self.assertEqual(v.getPGVerNumFromString('17beta3'), 170000)
+    self.assertEqual(v.getPGVerNumFromString('19devel'), 190000)
+    self.assertEqual(v.getVerReleaseDate('18rc1'), '2025-09-04')
+    self.assertEqual(v.getPGPrerelease('17beta3'), ('beta', 3))
+    self.assertEqual(v.getPGPrerelease('19devel'), ('devel', 0))
+    self.assertEqual(v.IsVerReleasedAfter('17.0', '17rc1'), True)
+    self.assertEqual(v.IsVerReleasedAfter('17beta3', '17beta2'), True)
+    self.assertEqual(v.getLatestMinorPGVersion('17beta2'), '17.9')
+
+  def test_prerelease_negatives(self):
+    self.assertEqual(v.getPGVersionValidity('17beta0'), 'bad_prerelease')
+    self.assertEqual(v.getPGVersionValidity('17beta'), 'bad_prerelease')
+    self.assertEqual(v.getPGVersionValidity('17devel1'), 'bad_prerelease')
+    self.assertEqual(v.getPGVersionValidity('10beta1'), 'unknown_prerelease')
+    self.assertEqual(v.getPGVersionValidity('9.6beta1'), 'unknown_prerelease')
+    self.assertEqual(v.getPGVersionValidity('100rc1'), 'major_too_large')
+    self.assertEqual(v.isValidPGVersion('17alpha1'), False)
+    self.assertEqual(v.isValidPGVersion('17.1beta1'), False)
+    self.assertEqual(v.getPGPrerelease('17.0'), False)
+
+  def test_getPGVersionSortKey(self):
+    versions = ['17.1', '17beta3', '17rc1', '17.0', '17devel', '16.9', '9.6.24', '17beta1']
+    self.assertEqual(sorted(versions, key=v.getPGVersionSortKey),
+                     ['9.6.24', '16.9', '17devel', '17beta1', '17beta3', '17rc1', '17.0', '17.1'])
+    self.assertEqual(v.getPGVersionSortKey('junk'), False)
+
+  def test_getReleaseTrain(self):
+    self.assertEqual(v.getReleaseTrain('14.22'), ['18.3', '17.9', '16.13', '15.17', '14.22'])
+    self.assertEqual(v.getReleaseTrain('14.20'), ['18.1', '17.7', '16.11', '15.15', '14.20', '13.23'])
+    self.assertEqual(v.getReleaseTrain('9.6.1')[-1], '9.1.24')
+    self.assertEqual(v.getReleaseTrain('17.50'), False)
+    self.assertEqual(v.getReleaseTrain('17beta3'), False)
+    self.assertEqual(v.getReleaseTrain('a'), False)
+
+  def test_getEquivalentPGVersion(self):
+    self.assertEqual(v.getEquivalentPGVersion('13.22', 16), '16.10')
+    self.assertEqual(v.getEquivalentPGVersion('12.14', '15.2'), '15.2')
+    self.assertEqual(v.getEquivalentPGVersion('17.9', '9.6'), '9.6.24')
+    self.assertEqual(v.getEquivalentPGVersion('17.9', 17), '17.9')
+    self.assertEqual(v.getEquivalentPGVersion('9.6.0', 17), False)
+    self.assertEqual(v.getEquivalentPGVersion('17.50', 16), False)
+    self.assertEqual(v.getEquivalentPGVersion('17.9', 'a'), False)
+
+  def test_getLatestMinorPGVersion(self):
+    self.assertEqual(v.getLatestMinorPGVersion('15.4'), '15.17')
+    self.assertEqual(v.getLatestMinorPGVersion('15'), '15.17')
+    self.assertEqual(v.getLatestMinorPGVersion('9.6.1'), '9.6.24')
+    self.assertEqual(v.getLatestMinorPGVersion(11), '11.22')
+    self.assertEqual(v.getLatestMinorPGVersion('19.0'), False)
+    self.assertEqual(v.getLatestMinorPGVersion('a'), False)
+
+  def test_debugLevel(self):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+      self.assertEqual(v.isValidPGVersion('9.7.1'), False)
+      self.assertEqual(out.getvalue(), '')
+
+      with v.withDebugLevel(1):
+        self.assertEqual(v.getDebugLevel(), 1)
+        v.isValidPGVersion('9.7.1')
+        v.isReleasedPGVersion('17.99')
+        # Other threads keep the process-wide level
+        t = threading.Thread(target=v.isValidPGVersion, args=('a',))
+        t.start()
+        t.join()
+      self.assertEqual(v.getDebugLevel(), 0)
+
+      old = v.debug_level
+      v.debug_level = 1
+      try:
+        v.isValidPGVersion('1')
+      finally:
+        v.debug_level = old
+
+    self.assertEqual(out.getvalue().splitlines(), [
+      'Invalid pre v10 version. Not in the version list - 9.7.1',
+      "Version hasn't been released yet - 17.99",
+      'Invalid Version String - Requires at least 4 characters - 1',
+    ])
+
 if __name__ == '__main__':
   unittest.main(failfast=True)
\ No newline at end of file
@@ -0,0 +1,36 @@
+import unittest
+import pgversion_aggregate as a
+
+class TestAggregateMethods(unittest.TestCase):
+  def test_counts(self):
+    agg = a.PGFleetAggregate(asOf='2026-03-01').addMany(['17.9', '17.8', '15.4', '9.6.24', 11.1, 'junk', '17', '11.30'])
+    self.assertEqual(agg.count, 8)
+    self.assertEqual(agg.byMajor, {'17': 2, '15': 1, '9.6': 1, '11': 2})
+    self.assertEqual(agg.byMinorsBehind, {'0': 2, '1': 1, '13': 1, '21': 1, 'unknown': 1})
+    self.assertEqual(agg.byAgeBucket, {'<90d': 2, '2y-5y': 2, '5y+': 1, 'unreleased': 1})
+    self.assertEqual(agg.byValidity, {'valid': 6, 'bad_characters': 1, 'too_short': 1})
+
+  def test_merge_is_associative(self):
+    x = a.PGFleetAggregate().addMany(['17.9', 'junk'])
+    y = a.PGFleetAggregate().addMany(['16.1', '9.6.1'])
+    z = a.PGFleetAggregate().addMany(['17.9', '10.0'])
+    self.assertEqual((x + y) + z, x + (y + z))
+    self.assertEqual(a.mergePGFleetAggregates([x, y, z]), x + y + z)
+    self.assertEqual(x.count, 2)
+
+  def test_merge_different_asof(self):
+    with self.assertRaises(ValueError):
+      a.PGFleetAggregate('2026-01-01') + a.PGFleetAggregate('2026-02-01')
+
+  def test_serialization(self):
+    agg = a.PGFleetAggregate('2026-03-01').addMany(['17.9', '15.4', 'junk'] * 1000)
+    blob = agg.toBytes()
+    self.assertLess(len(blob), 200)
+    self.assertEqual(a.PGFleetAggregate.fromBytes(blob), agg)
+    with self.assertRaises(ValueError):
+      a.PGFleetAggregate.fromBytes(b'nope')
+    with self.assertRaises(ValueError):
+      a.PGFleetAggregate.fromDict({'format': a._serialFormat, 'asOf': '2026-03-01'})
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
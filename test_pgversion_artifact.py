@@ -0,0 +1,105 @@
+import os
+import struct
+import tempfile
+import unittest
+import pgversion_artifact as a
+
+
+def _walHeader(magic, order='<', prev93=False):
+  if (prev93):
+    short = struct.pack(order + 'HHIQ', magic, 0x0002, 1, 0x1000000)
+  else:
+    short = struct.pack(order + 'HHIQI', magic, 0x0002, 1, 0x1000000, 0) + b'\0' * 4
+  return short + struct.pack(order + 'QII', 7312345678901234567, 16 * 1024 * 1024, 8192) + b'\0' * 100
+
+
+def _dumpInt(n, intSize=4):
+  return bytes([1 if (n < 0) else 0]) + abs(n).to_bytes(intSize, 'little')
+
+
+def _dumpStr(s):
+  if (s is None):
+    return _dumpInt(-1)
+  b = s.encode()
+  return _dumpInt(len(b)) + b
+
+
+def _dumpHeader(vmin, remote, tool='17.2', dbname='app'):
+  h = b'PGDMP' + bytes([1, vmin, 0, 4, 8, 1])
+  if (vmin >= 15):
+    h += bytes([3])
+  else:
+    h += _dumpInt(-1)
+  for n in (30, 15, 10, 2, 0, 125, 0):
+    h += _dumpInt(n)
+  h += _dumpStr(dbname)
+  if (vmin >= 10):
+    h += _dumpStr(remote) + _dumpStr(tool)
+  return h + b'\0' * 64
+
+
+class TestArtifactMethods(unittest.TestCase):
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def write(self, name, data):
+    path = os.path.join(self.tmp.name, name)
+    with open(path, 'wb') as f:
+      f.write(data)
+    return path
+
+  def test_wal(self):
+    r = a.sniffPGArtifact(self.write('000000010000000000000001', _walHeader(0xD116)))
+    self.assertEqual((r.kind, r.major, r.version, r.error), ('wal', 17, None, None))
+    self.assertEqual(r.detail['segmentSize'], 16 * 1024 * 1024)
+    self.assertEqual(r.detail['blockSize'], 8192)
+    self.assertEqual(r.detail['timeline'], 1)
+
+    self.assertEqual(a.sniffPGArtifact(self.write('be', _walHeader(0xD093, '>'))).major, 9.6)
+    r = a.sniffPGArtifact(self.write('old', _walHeader(0xD071, prev93=True)))
+    self.assertEqual((r.major, r.detail['systemIdentifier']), (9.2, 7312345678901234567))
+    self.assertEqual(a.getWALMagicMajor(0xD101), 12)
+    self.assertEqual(a.getWALMagicMajor(0xBEEF), False)
+
+  def test_dump(self):
+    r = a.sniffPGArtifact(self.write('app.dump', _dumpHeader(16, '17.2 (Debian 17.2-1.pgdg120+1)')))
+    self.assertEqual((r.kind, r.major, r.version, r.error), ('dump', 17, '17.2', None))
+    self.assertEqual(r.detail['dumpVersion'], '17.2')
+    self.assertEqual(r.detail['dbname'], 'app')
+    self.assertEqual(r.detail['compression'], 'zstd')
+    self.assertEqual(r.detail['created'], '2025-01-02 10:15:30')
+
+    r = a.sniffPGArtifact(self.write('old.dump', _dumpHeader(12, '9.6.24', '9.6.24')))
+    self.assertEqual((r.major, r.version, r.detail['compression']), (9.6, '9.6.24', -1))
+    self.assertEqual(a.sniffPGArtifact(self.write('older.dump', _dumpHeader(9, None))).major, False)
+
+    os.mkdir(os.path.join(self.tmp.name, 'dir.dump'))
+    self.write(os.path.join('dir.dump', 'toc.dat'), _dumpHeader(16, '15.4'))
+    self.assertEqual(a.sniffPGArtifact(os.path.join(self.tmp.name, 'dir.dump')).version, '15.4')
+
+  def test_sql(self):
+    sql = b'--\n-- PostgreSQL database dump\n--\n\n-- Dumped from database version 16.2\n-- Dumped by pg_dump version 17.2\n'
+    r = a.sniffPGArtifact(self.write('app.sql', sql))
+    self.assertEqual((r.kind, r.major, r.version, r.detail), ('sql', 16, '16.2', {'dumpVersion': '17.2'}))
+
+  def test_errors(self):
+    self.assertEqual(a.sniffPGArtifact(self.write('empty', b'')).error, 'truncated')
+    self.assertEqual(a.sniffPGArtifact(self.write('short', _dumpHeader(16, '17.2')[:30])).error, 'truncated')
+    self.assertEqual(a.sniffPGArtifact(self.write('junk', b'hello world')).error, 'unknown_magic')
+    self.assertEqual(a.sniffPGArtifact(os.path.join(self.tmp.name, 'missing')).error, 'unreadable')
+
+  def test_batch(self):
+    paths = []
+    for i in range(100):
+      magic = (0xD113, 0xD116)[i % 2]
+      paths.append(self.write('seg' + str(i), _walHeader(magic)))
+    results = list(a.sniffPGArtifacts(paths, workers=3))
+    self.assertEqual([r.path for r in results], paths)
+    self.assertEqual([r.major for r in results[:4]], [16, 17, 16, 17])
+    self.assertEqual(len(list(a._expandPaths([self.tmp.name]))), 100)
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
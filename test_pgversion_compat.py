@@ -0,0 +1,47 @@
+import unittest
+import pgversion_compat as c
+
+class TestCompatMethods(unittest.TestCase):
+  def test_pg_upgrade(self):
+    self.assertEqual(c.canPGUpgrade('9.6.24', '17'), True)
+    self.assertEqual(c.canPGUpgrade('9.1.24', '14.2'), True)
+    self.assertEqual(c.canPGUpgrade('9.1.24', '15'), False)
+    self.assertEqual(c.canPGUpgrade('8.3.23', '9.2'), True)
+    self.assertEqual(c.canPGUpgrade('8.3.23', '9.3'), False)
+    self.assertEqual(c.canPGUpgrade('17.1', '16'), False)
+    self.assertEqual(c.canPGUpgrade('17.1', '17.2'), False)
+    self.assertEqual(c.canPGUpgrade('junk', '17'), False)
+
+  def test_pg_dump(self):
+    self.assertEqual(c.canPGDump('8.0.26', '14'), True)
+    self.assertEqual(c.canPGDump('8.0.26', '15'), False)
+    self.assertEqual(c.canPGDump('7.4.30', '9.6'), True)
+    self.assertEqual(c.canPGDump('17.1', '17'), True)
+    self.assertEqual(c.canPGDump('18.0', '17'), False)
+
+  def test_replication(self):
+    self.assertEqual(c.canPhysicalReplicate('16.1', '16.4'), True)
+    self.assertEqual(c.canPhysicalReplicate('16.1', '17.0'), False)
+    self.assertEqual(c.canLogicalReplicate('10.1', '18'), True)
+    self.assertEqual(c.canLogicalReplicate('9.6.1', '18'), False)
+    self.assertEqual(c.getPGCompatibility('16', '17'), c.PG_UPGRADE | c.PG_DUMP | c.LOGICAL_REPLICATION)
+
+  def test_upgrade_path(self):
+    self.assertEqual(c.getPGUpgradePath('9.6', '17'), [9.6, 17])
+    self.assertEqual(c.getPGUpgradePath('8.3.23', '17'), [8.3, 9.2, 17])
+    self.assertEqual(c.getPGUpgradePath('17.1', '17'), [17])
+    self.assertEqual(c.getPGUpgradePath('8.2.23', '17'), None)
+    self.assertEqual(c.getPGUpgradePath('18.0', '17'), None)
+
+  def test_plan(self):
+    plans = c.planPGUpgrades(['16.2', '8.3.23', ('db1', '9.6.24'), 'junk', '16.9'], 17)
+    self.assertEqual([p.sourceMajor for p in plans], [None, 8.3, 9.6, 16])
+    self.assertEqual(plans[1].path, [8.3, 9.2, 17])
+    self.assertEqual(plans[1].methods, ())
+    self.assertEqual(plans[2].instances, [('db1', '9.6.24')])
+    self.assertEqual(plans[3].methods, ('pg_upgrade', 'pg_dump', 'logical_replication'))
+    self.assertEqual(plans[3].instances, ['16.2', '16.9'])
+    self.assertEqual(c.planPGUpgrades(['16.2'], 'junk'), [])
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
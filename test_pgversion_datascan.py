@@ -0,0 +1,79 @@
+import os
+import tempfile
+import time
+import unittest
+import pgversion_datascan as s
+
+_day = 86400
+
+
+def _makeCluster(path, version, running=False, age=0, tablespaces=()):
+  os.makedirs(os.path.join(path, 'global'))
+  os.makedirs(os.path.join(path, 'base', '1'))
+  os.makedirs(os.path.join(path, 'pg_tblspc'))
+  if (version is None):
+    os.mkdir(os.path.join(path, 'PG_VERSION'))
+  else:
+    with open(os.path.join(path, 'PG_VERSION'), 'w') as f:
+      f.write(version + '\n')
+  control = os.path.join(path, 'global', 'pg_control')
+  open(control, 'w').close()
+  t = time.time() - age
+  os.utime(control, (t, t))
+  if (running):
+    open(os.path.join(path, 'postmaster.pid'), 'w').close()
+  for oid, location in tablespaces:
+    os.symlink(location, os.path.join(path, 'pg_tblspc', oid))
+
+
+class TestDataScanMethods(unittest.TestCase):
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    root = self.root = self.tmp.name
+    tblspc = os.path.join(root, 'mnt', 'fast')
+    os.makedirs(os.path.join(tblspc, 'PG_16_202307071'))
+    os.makedirs(os.path.join(tblspc, 'PG_17_202406281'))
+    os.makedirs(os.path.join(root, 'mnt', 'old', 'PG_9.6_201608131'))
+
+    _makeCluster(os.path.join(root, 'srv', 'main'), '17', running=True, tablespaces=[('16384', tblspc)])
+    _makeCluster(os.path.join(root, 'srv', 'legacy'), '16', age=90 * _day)
+    _makeCluster(os.path.join(root, 'srv', 'a', 'b', 'c', 'deep'), '9.6', running=True)
+    _makeCluster(os.path.join(root, 'srv', 'broken'), 'junk', running=True)
+    _makeCluster(os.path.join(root, 'srv', 'locked'), None, running=True)
+    for i in range(50):
+      os.makedirs(os.path.join(root, 'home', 'u' + str(i), 'x'))
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def found(self, **kwargs):
+    return {os.path.relpath(d.path, self.root): d for d in s.scanDataDirectories(self.root, **kwargs)}
+
+  def test_scan(self):
+    found = self.found(expectedMajor='17.2', workers=4)
+    self.assertEqual(sorted(found), [
+      'mnt/fast/PG_16_202307071', 'mnt/fast/PG_17_202406281', 'mnt/old/PG_9.6_201608131',
+      'srv/a/b/c/deep', 'srv/broken', 'srv/legacy', 'srv/locked', 'srv/main'])
+    self.assertEqual(found['srv/main'], s.PGDataDir(os.path.join(self.root, 'srv/main'), 'cluster', '17', 17, ()))
+    self.assertEqual(found['srv/legacy'].issues, ('mismatch', 'stale'))
+    self.assertEqual(found['srv/a/b/c/deep'].major, 9.6)
+    self.assertEqual(found['srv/a/b/c/deep'].issues, ('mismatch',))
+    self.assertEqual(found['srv/broken'].issues, ('invalid',))
+    self.assertEqual(found['srv/locked'].issues, ('unreadable',))
+
+  def test_orphaned_tablespaces(self):
+    found = self.found()
+    self.assertEqual(found['mnt/fast/PG_17_202406281'].issues, ())
+    self.assertEqual(found['mnt/fast/PG_16_202307071'].issues, ('orphaned',))
+    self.assertEqual(found['mnt/old/PG_9.6_201608131'].issues, ('orphaned',))
+    self.assertEqual(found['mnt/old/PG_9.6_201608131'].major, 9.6)
+
+  def test_options(self):
+    self.assertEqual(self.found(staleDays=365)['srv/legacy'].issues, ())
+    self.assertFalse('srv/a/b/c/deep' in self.found(maxDepth=4))
+    self.assertTrue('srv/a/b/c/deep' in self.found(maxDepth=5, workers=1))
+    with self.assertRaises(ValueError):
+      s.scanDataDirectories(self.root, expectedMajor='9.7')
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
@@ -0,0 +1,34 @@
+import collections
+import unittest
+import pgversion as v
+import pgversion_fleetgen as g
+
+class TestFleetGenMethods(unittest.TestCase):
+  def test_deterministic(self):
+    a = list(g.generateFleet(5000, chunkSize=1000, seed=3))
+    b = list(g.generateFleet(5000, chunkSize=1000, seed=3))
+    self.assertEqual(a, b)
+    self.assertEqual(len(a), 5000)
+    self.assertEqual(a[0][0], 'db000000000')
+    self.assertEqual(len(set(i for i, _ in a)), 5000)
+    self.assertNotEqual(a, list(g.generateFleet(5000, seed=4)))
+
+  def test_distribution(self):
+    rows = next(g.generateFleetChunks(20000, seed=1, junkFraction=0.05))
+    self.assertEqual(len(rows), 20000)
+    types = collections.Counter(type(r) for r in rows)
+    self.assertTrue(types[str] > types[float] > 0)
+    self.assertTrue(types[int] > 0)
+
+    junk = sum(1 for r in rows if (isinstance(r, str)) and (r in g._junk) and (not v.isValidPGVersion(r)))
+    self.assertTrue(900 <= junk <= 1000)
+
+    majors = collections.Counter(v.getMajorPGVersion(r) for r in rows if (isinstance(r, str)))
+    self.assertTrue(majors[16] > majors[12] > majors[9.2])
+
+  def test_strings_only(self):
+    rows = next(g.generateFleetChunks(2000, seed=1, junkFraction=0, formats={'str': 1.0}))
+    self.assertTrue(all(v.isReleasedPGVersion(r) for r in rows))
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
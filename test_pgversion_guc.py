@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+import pgversion_guc as g
+
+_conf = """# postgresql.conf
+listen_addresses = '*'		# what IP address(es) to listen on;
+port 5432
+shared_buffers = 128MB
+checkpoint_segments = 32
+wal_keep_segments = 64
+min_wal_size = 1GB
+search_path = '"$user", public, ''x'''
+pg_stat_statements.max = 10000
+include_if_exists 'extra.conf'
+shared_buffers = 1GB
+bogus_param = on
+this is not valid = x
+"""
+
+class TestGUCMethods(unittest.TestCase):
+  def test_catalog(self):
+    self.assertEqual(g.isValidGUC('wal_keep_segments', '12.22'), True)
+    self.assertEqual(g.isValidGUC('wal_keep_segments', '13.2'), False)
+    self.assertEqual(g.isValidGUC('wal_keep_size', 13), True)
+    self.assertEqual(g.isValidGUC('checkpoint_segments', '9.4.26'), True)
+    self.assertEqual(g.isValidGUC('checkpoint_segments', '9.5.0'), False)
+    self.assertEqual(g.isValidGUC('max_wal_size', '9.4.26'), False)
+    self.assertEqual(g.isValidGUC('promote_trigger_file', '15.4'), True)
+    self.assertEqual(g.isValidGUC('promote_trigger_file', '16.0'), False)
+    self.assertEqual(g.isValidGUC('min_parallel_relation_size', '9.6.24'), True)
+    self.assertEqual(g.isValidGUC('min_parallel_relation_size', '10.0'), False)
+    self.assertEqual(g.isValidGUC('Shared_Buffers', '17beta3'), True)
+    self.assertEqual(g.isValidGUC('auto_explain.log_min_duration', '17.2'), True)
+    self.assertEqual(g.isValidGUC('bogus_param', '17.2'), False)
+    self.assertEqual(g.isValidGUC('shared_buffers', 'junk'), False)
+    self.assertEqual(g.getGUCMajorRange('old_snapshot_threshold'), (9.6, 16))
+    self.assertEqual(g.getGUCMajorRange('bogus_param'), False)
+    self.assertEqual(g.getGUCReplacement('wal_keep_segments'), 'wal_keep_size')
+    self.assertEqual(g.getGUCReplacement('shared_buffers'), False)
+
+  def test_catalog_per_major(self):
+    # A sample of the parameters each major added, including developer and preset
+    # parameters, valid from that major and not in the one before
+    added = {
+      9.0: 'application_name hot_standby wal_level',
+      9.1: 'hot_standby_feedback log_file_mode transaction_deferrable',
+      9.2: 'event_source ssl_cert_file track_io_timing',
+      9.3: 'data_checksums ignore_checksum_failure lock_timeout',
+      9.4: 'data_sync_retry huge_pages wal_log_hints',
+      9.5: 'max_wal_size row_security track_commit_timestamp',
+      9.6: 'idle_in_transaction_session_timeout max_parallel_workers_per_gather syslog_split_messages',
+      10: 'allow_in_place_tablespaces max_parallel_workers wal_consistency_checking',
+      11: 'data_directory_mode jit jit_expressions',
+      12: 'primary_conninfo restrict_nonsystem_relation_kind ssl_library',
+      13: 'log_statement_sample_rate wal_keep_size wal_receiver_create_temp_slot',
+      14: 'compute_query_id debug_discard_caches in_hot_standby',
+      15: 'archive_library shared_memory_size recovery_prefetch',
+      16: 'debug_parallel_query max_parallel_apply_workers_per_subscription vacuum_buffer_usage_limit',
+      17: 'huge_pages_status summarize_wal transaction_timeout',
+      18: 'enable_self_join_elimination io_method log_lock_failures ssl_groups',
+    }
+    previous = 8.4
+    for major, names in added.items():
+      for name in names.split():
+        self.assertEqual(g.isValidGUC(name, major), True, (name, major))
+        self.assertEqual(g.isValidGUC(name, previous), False, (name, previous))
+      previous = major
+    for major in added:
+      for name in ('trace_sort', 'ignore_system_indexes', 'server_version_num', 'block_size', 'transaction_isolation'):
+        self.assertEqual(g.isValidGUC(name, major), True, (name, major))
+    self.assertEqual(g.isValidGUC('data_sync_retry', '9.4.21'), True)
+    self.assertEqual(g.isValidGUC('lc_collate', 15), True)
+    self.assertEqual(g.isValidGUC('lc_collate', 16), False)
+
+  def test_parsePGConf(self):
+    parsed = list(g.parsePGConf(_conf.splitlines(True)))
+    self.assertEqual(parsed[0], (2, 'listen_addresses', '*'))
+    self.assertEqual(parsed[1], (3, 'port', '5432'))
+    self.assertEqual(parsed[6], (8, 'search_path', '"$user", public, \'x\''))
+    self.assertEqual(parsed[8], (10, 'include_if_exists', 'extra.conf'))
+    self.assertEqual(parsed[-1], (13, None, 'this is not valid = x'))
+
+  def test_validate(self):
+    v = g.PGConfValidator()
+    r = v.validateText(_conf, '13.2')
+    self.assertEqual(r.major, 13)
+    self.assertEqual(r.settings, 10)
+    self.assertEqual(r.includes, (('include_if_exists', 'extra.conf'),))
+    self.assertEqual([(i.line, i.name, i.kind) for i in r.issues], [
+      (5, 'checkpoint_segments', 'removed'),
+      (6, 'wal_keep_segments', 'removed'),
+      (11, 'shared_buffers', 'duplicate'),
+      (12, 'bogus_param', 'unknown'),
+      (13, None, 'syntax'),
+    ])
+    self.assertTrue('replaced by wal_keep_size' in r.issues[1].detail)
+
+    r = v.validateText(_conf, '9.4.26')
+    self.assertEqual([(i.name, i.kind) for i in r.issues][:1], [('min_wal_size', 'not_yet_added')])
+    self.assertEqual(v.validateText(_conf, 'junk').issues, ())
+
+  def test_files_parsed_once(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      items = []
+      for i in range(20):
+        path = os.path.join(tmp, 'pg' + str(i) + '.conf')
+        with open(path, 'w') as f:
+          f.write(_conf if (i % 2) else 'wal_keep_size = 1GB\n')
+        items.append((path, ('12.22', '17.2')[i % 4 // 2]))
+      items.append((os.path.join(tmp, 'missing.conf'), '17.2'))
+
+      v = g.PGConfValidator()
+      reports = list(g.validatePGConfFiles(items, v))
+      self.assertEqual(len(reports), 21)
+      self.assertEqual(len(v._parsed), 2)
+      self.assertEqual(len(v._checked), 4)
+      self.assertEqual(reports[0].issues[0].kind, 'not_yet_added')
+      self.assertEqual(reports[2].issues, ())
+      self.assertEqual(reports[-1].issues[0].kind, 'unreadable')
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+import pgversion as v
+import pgversion_notes as n
+
+_sgml = """<sect1 id="release-15-5">
+ <title>Release 15.5</title>
+ <itemizedlist>
+  <listitem>
+   <para>
+    Fix possible index <emphasis>corruption</emphasis> after <command>VACUUM</command>
+    (Peter Geoghegan)
+   </para>
+  </listitem>
+  <listitem>
+   <para>Fix logical replication of partitioned tables &amp; their children</para>
+  </listitem>
+ </itemizedlist>
+</sect1>
+
+<sect1 id="release-15-6">
+ <itemizedlist>
+  <listitem><para>Prevent data corruption in hash indexes</para></listitem>
+ </itemizedlist>
+</sect1>
+
+<sect1 id="release-15-99">
+ <itemizedlist>
+  <listitem><para>Not a real release</para></listitem>
+ </itemizedlist>
+</sect1>
+"""
+
+_text = """Release 15.4
+
+- Fix crash in streaming replication when the standby
+  disconnects early
+- Avoid corrupted WAL records
+
+* Improve pg_dump performance
+"""
+
+class TestNotesMethods(unittest.TestCase):
+  def test_split(self):
+    self.assertEqual(list(n.splitPlainNotes(_text)), [
+      'Release 15.4',
+      'Fix crash in streaming replication when the standby disconnects early',
+      'Avoid corrupted WAL records',
+      'Improve pg_dump performance',
+    ])
+    sections = list(n.splitSGMLNotes(_sgml))
+    self.assertEqual([s[0] for s in sections], ['15.5', '15.6'])
+    self.assertEqual(sections[0][1][1], 'Fix logical replication of partitioned tables & their children')
+
+  def test_search(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      for name, text in (('release-15.sgml', _sgml), ('release-15-4.txt', _text), ('notes-15-99.txt', _text), ('16.1.txt', '- Fix replication slot corruption\n')):
+        with open(os.path.join(tmp, name), 'w') as f:
+          f.write(text)
+      idx = n.PGReleaseNotesIndex()
+      self.assertEqual(idx.addPath(tmp), 8)
+
+    self.assertEqual(idx.getVersions(), ['15.4', '15.5', '15.6', '16.1'])
+    self.assertEqual([r.version for r in idx.search('corruption', '15.4')], ['15.5', '15.6'])
+    self.assertEqual([r.version for r in idx.search('CORRUPT*', '15.3')], ['15.4', '15.5', '15.6'])
+    self.assertEqual([r.version for r in idx.search('corruption', '15.5', '16.1')], ['15.6', '16.1'])
+    self.assertEqual(idx.search('index corruption', '15.4', '15.5')[0].text, 'Fix possible index corruption after VACUUM (Peter Geoghegan)')
+    self.assertEqual(len(idx.search('replication')), 3)
+    self.assertEqual(idx.search('pg_dump', '15.4'), [])
+    self.assertEqual(idx.search('replication bogus'), [])
+    self.assertEqual(idx.search('replication', 'junk'), False)
+    self.assertEqual(idx.addNotes('15.99', ['x']), False)
+
+    idx.addNotes(15.2, ['Fix replication lag'])
+    self.assertEqual(idx.search('replication')[0], n.PGReleaseNote('15.2', 'Fix replication lag'))
+
+    loaded = n.PGReleaseNotesIndex.fromBytes(idx.toBytes())
+    self.assertEqual(loaded.search('corrupt*'), idx.search('corrupt*'))
+    self.assertEqual(len(loaded), 9)
+    self.assertRaises(ValueError, n.PGReleaseNotesIndex.fromBytes, b'junk')
+
+  def test_scale(self):
+    idx = n.PGReleaseNotesIndex()
+    versions = [s for s in v._verReleaseDates if (v.isValidPGVersion(s))]
+    for i, ver in enumerate(versions):
+      idx.addNotes(ver, ['Fix issue ' + str(i * 20 + j) + (' causing corruption' if (j % 7 == 0) else ' in replication') for j in range(20)])
+
+    start = time.perf_counter()
+    notes = idx.search('corruption', '15.4')
+    self.assertEqual([r.version for r in notes][:3], ['15.5', '15.5', '15.5'])
+    missing = [s for s in versions if (s.startswith('15.')) and (v.IsVerReleasedAfter(s, '15.4'))]
+    self.assertEqual(len(notes), 3 * len(missing))
+    self.assertTrue(time.perf_counter() - start < 1)
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
@@ -0,0 +1,81 @@
+import io
+import unittest
+
+try:
+  import pandas as pd
+  import pgversion_pandas
+except ImportError:
+  pd = None
+
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  pyarrow = None
+
+@unittest.skipIf(pd is None, 'pandas is not installed')
+class TestPandasMethods(unittest.TestCase):
+  def test_construct(self):
+    s = pd.Series(['9.6.1', '17.9', 'junk', None, 11.1], dtype='pgversion')
+    self.assertEqual(str(s.dtype), 'pgversion')
+    self.assertEqual(list(s.isna()), [False, False, True, True, False])
+    self.assertEqual(s[0], '9.6.1')
+    self.assertEqual(s[4], '11.1')
+    self.assertEqual(list(pgversion_pandas.PGVersionArray([170009, 90601], [1, 2])), ['17.9', '9.6.1'])
+
+  def test_prereleases(self):
+    s = pd.Series(['17beta3', '17.0', '18rc1'], dtype='pgversion')
+    self.assertEqual(list(s.isna()), [True, False, True])
+    self.assertEqual(list(s.pgver.released), [False, True, False])
+
+  def test_table_versions(self):
+    s = pd.Series(['1.09', '0.01', '1.09', '17.9'], dtype='pgversion')
+    self.assertEqual(list(s), ['1.09', '0.01', '1.09', '17.9'])
+    self.assertEqual(list(s.unique()), ['1.09', '0.01', '17.9'])
+    self.assertEqual(s.value_counts().to_dict(), {'1.09': 2, '0.01': 1, '17.9': 1})
+    self.assertEqual(list(s.pgver.major), [1, 0, 1, 17])
+    self.assertEqual(list(s.pgver.minor), [9, 1, 9, 9])
+
+  def test_sort_and_compare(self):
+    s = pd.Series(['12.14', '9.6.24', '15.1', '10.0'], dtype='pgversion')
+    self.assertEqual(list(s.sort_values()), ['9.6.24', '10.0', '12.14', '15.1'])
+    self.assertEqual((s > '12.0').dtype, bool)
+    self.assertEqual(list(s > '12.0'), [True, False, True, False])
+    self.assertEqual(list(s[s > '12.0']), ['12.14', '15.1'])
+    self.assertEqual(list(s == 'junk'), [False] * 4)
+    self.assertEqual(list(s != 'junk'), [False] * 4)
+    self.assertEqual(list(s != '15.1'), [True, True, False, True])
+    s[1] = None
+    self.assertEqual(list(s != '15.1'), [True, False, False, True])
+    s[1] = '9.6.24'
+    self.assertEqual(list(s.where(s > '10.0').isna()), [False, True, False, True])
+    self.assertEqual(s.max(), '15.1')
+
+  def test_accessor(self):
+    s = pd.Series(['9.6.1', '17.9', '11.30', 'junk'], dtype='pgversion')
+    self.assertEqual(list(s.pgver.major[:3]), [9.6, 17, 11])
+    self.assertEqual(list(s.pgver.minor[:3]), [1, 9, 30])
+    self.assertEqual(list(s.pgver.released), [True, True, False, False])
+    self.assertEqual(str(s.pgver.release_date[1].date()), '2026-02-26')
+    self.assertTrue(pd.isna(s.pgver.release_date[2]))
+
+  def test_groupby_major(self):
+    s = pd.Series(['17.1', '17.9', '16.2', '9.6.1'], dtype='pgversion')
+    counts = s.groupby(s.pgver.major).size()
+    self.assertEqual(counts.to_dict(), {9.6: 1, 16.0: 1, 17.0: 2})
+
+  @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+  def test_parquet_roundtrip(self):
+    df = pd.DataFrame({'ver': pd.Series(['12.14', '15.1', None], dtype='pgversion')})
+    buf = io.BytesIO()
+    df.to_parquet(buf)
+    buf.seek(0)
+    self.assertEqual(pyarrow.parquet.read_schema(buf).field('ver').type.extension_name, 'pgversion.version')
+    buf.seek(0)
+    out = pd.read_parquet(buf)
+    self.assertEqual(str(out['ver'].dtype), 'pgversion')
+    self.assertEqual(list(out['ver'].pgver.ordinal), list(df['ver'].pgver.ordinal))
+    self.assertTrue(out['ver'].isna()[2])
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
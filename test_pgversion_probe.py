@@ -0,0 +1,265 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import tempfile
+import unittest
+import pgversion_probe as p
+
+
+def _message(kind, payload):
+  return kind + struct.pack('!I', len(payload) + 4) + payload
+
+
+def _auth(code, extra=b''):
+  return _message(b'R', struct.pack('!I', code) + extra)
+
+
+class _FakeServer:
+
+  # Speaks just enough of the protocol: startup, one auth method, ParameterStatus and SHOW server_version
+  def __init__(self, auth='trust', password='secret', version='17.2 (Debian 17.2-1.pgdg120+1)', delay=0):
+    self.auth = auth
+    self.password = password
+    self.version = version
+    self.delay = delay
+    self.connections = 0
+    self.queries = 0
+
+  async def read(self, reader):
+    head = await reader.readexactly(5)
+    return (head[:1], await reader.readexactly(struct.unpack_from('!I', head, 1)[0] - 4))
+
+  async def handle(self, reader, writer):
+    self.connections += 1
+    try:
+      n = struct.unpack('!I', await reader.readexactly(4))[0]
+      payload = await reader.readexactly(n - 4)
+      if (struct.unpack_from('!I', payload)[0] == 80877103):
+        writer.write(b'N')
+        return
+      params = payload[4:].split(b'\0')
+      user = dict(zip(params[0::2], params[1::2]))[b'user'].decode()
+      await asyncio.sleep(self.delay)
+
+      if (not await self.authenticate(reader, writer, user)):
+        writer.write(_message(b'E', b'SFATAL\0C28P01\0Mpassword authentication failed\0\0'))
+        return
+      writer.write(_auth(0))
+      for k, v in (('server_version', self.version), ('server_encoding', 'UTF8')):
+        writer.write(_message(b'S', k.encode() + b'\0' + v.encode() + b'\0'))
+      writer.write(_message(b'K', struct.pack('!II', 1, 2)))
+      writer.write(_message(b'Z', b'I'))
+
+      while True:
+        kind, payload = await self.read(reader)
+        if (kind == b'X'):
+          return
+        self.queries += 1
+        v = self.version.encode()
+        writer.write(_message(b'T', b'\0\x01server_version\0' + b'\0' * 18))
+        writer.write(_message(b'D', struct.pack('!hi', 1, len(v)) + v))
+        writer.write(_message(b'C', b'SHOW\0'))
+        writer.write(_message(b'Z', b'I'))
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      writer.close()
+
+  async def authenticate(self, reader, writer, user):
+    if (self.auth == 'trust'):
+      return True
+    if (self.auth == 'password'):
+      writer.write(_auth(3))
+      return (await self.read(reader))[1] == self.password.encode() + b'\0'
+    if (self.auth == 'md5'):
+      salt = b'\x01\x02\x03\x04'
+      writer.write(_auth(5, salt))
+      inner = hashlib.md5((self.password + user).encode()).hexdigest()
+      expected = 'md5' + hashlib.md5(inner.encode() + salt).hexdigest()
+      return (await self.read(reader))[1] == expected.encode() + b'\0'
+
+    writer.write(_auth(10, b'SCRAM-SHA-256\0\0'))
+    payload = (await self.read(reader))[1]
+    clientFirst = payload[payload.index(b'\0') + 5:].decode()
+    clientFirstBare = clientFirst[3:]
+    nonce = dict(a.split('=', 1) for a in clientFirstBare.split(','))['r'] + 'server'
+    salt = b'salty'
+    serverFirst = 'r=' + nonce + ',s=' + base64.b64encode(salt).decode() + ',i=4096'
+    writer.write(_auth(11, serverFirst.encode()))
+    clientFinal = (await self.read(reader))[1].decode()
+    finalBare, _, proof = clientFinal.rpartition(',p=')
+
+    salted = hashlib.pbkdf2_hmac('sha256', self.password.encode(), salt, 4096)
+    clientKey = hmac.digest(salted, b'Client Key', 'sha256')
+    authMessage = (clientFirstBare + ',' + serverFirst + ',' + finalBare).encode()
+    signature = hmac.digest(hashlib.sha256(clientKey).digest(), authMessage, 'sha256')
+    if (base64.b64decode(proof) != bytes(a ^ b for a, b in zip(clientKey, signature))):
+      return False
+    serverSignature = hmac.digest(hmac.digest(salted, b'Server Key', 'sha256'), authMessage, 'sha256')
+    writer.write(_auth(12, b'v=' + base64.b64encode(serverSignature)))
+    return True
+
+
+class _MalformedServer(_FakeServer):
+
+  # Answers the startup message with reply (after an AuthenticationOk unless auth=True),
+  # then waits for the client to hang up
+  def __init__(self, reply, auth=False):
+    super().__init__()
+    self.reply = reply
+    self.auth = auth
+
+  async def handle(self, reader, writer):
+    try:
+      n = struct.unpack('!I', await reader.readexactly(4))[0]
+      await reader.readexactly(n - 4)
+      writer.write(self.reply if (self.auth) else _auth(0) + self.reply)
+      await reader.read()
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      writer.close()
+
+
+class _ClosingServer(_FakeServer):
+
+  # Sends goodbye and hangs up on the first query of every other connection, like a server
+  # restart or idle_session_timeout between two probes (trust authentication only)
+  def __init__(self, goodbye=b''):
+    super().__init__()
+    self.goodbye = goodbye
+
+  async def handle(self, reader, writer):
+    self.writer = writer
+    await super().handle(reader, writer)
+
+  async def read(self, reader):
+    if (self.connections % 2):
+      self.writer.write(self.goodbye)
+      raise ConnectionError()
+    return await super().read(reader)
+
+
+class TestProbeMethods(unittest.TestCase):
+  def run_probes(self, server, targets=None, unix=False, **kwargs):
+    async def run():
+      with tempfile.TemporaryDirectory() as tmp:
+        if (unix):
+          srv = await asyncio.start_unix_server(server.handle, os.path.join(tmp, '.s.PGSQL.5432'))
+          target = tmp
+        else:
+          srv = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+          target = '127.0.0.1:' + str(srv.sockets[0].getsockname()[1])
+        prober = p.PGVersionProber('monitor', kwargs.pop('password', 'secret'), **kwargs)
+        try:
+          results = []
+          for batch in (targets or [[target]]):
+            results.extend(await prober.probeMany([target if (t is None) else t for t in batch]))
+          return results, prober.stats
+        finally:
+          await prober.close()
+          srv.close()
+          await srv.wait_closed()
+    return asyncio.run(run())
+
+  def test_auth_methods(self):
+    for auth in ('trust', 'password', 'md5', 'scram'):
+      results, stats = self.run_probes(_FakeServer(auth))
+      r = results[0]
+      self.assertEqual((r.error, r.version, r.major, r.released), (None, '17.2', 17, True), auth)
+      self.assertEqual(r.serverVersion, '17.2 (Debian 17.2-1.pgdg120+1)')
+      self.assertEqual(r.releaseDate, '2024-11-21')
+      self.assertEqual(r.latestMinor, '17.9')
+
+  def test_failures(self):
+    for auth in ('password', 'md5', 'scram'):
+      r = self.run_probes(_FakeServer(auth), password='wrong')[0][0]
+      self.assertEqual(r.error, 'auth_failed', auth)
+    self.assertEqual(self.run_probes(_FakeServer('md5'), password=None)[0][0].error, 'auth_failed')
+    self.assertEqual(self.run_probes(_FakeServer(delay=1), timeout=0.2)[0][0].error, 'timeout')
+    self.assertEqual(self.run_probes(_FakeServer(), [['127.0.0.1:1']])[0][0].error, 'connect')
+
+    import ssl
+    r = self.run_probes(_FakeServer(), sslContext=ssl.create_default_context())[0][0]
+    self.assertEqual(r.error, 'ssl_unavailable')
+
+  def test_malformed_messages(self):
+    servers = [
+      _FakeServer(),
+      _MalformedServer(_message(b'S', b'server_version')),
+      _MalformedServer(_auth(10, b'SCRAM-SHA-256\0\0'), auth=True),
+      _MalformedServer(_message(b'R', b'\0\0'), auth=True),
+      _MalformedServer(_message(b'E', b'\xffFATAL\0C08P01\0M\xff\xfe\0\0')),
+    ]
+    # The SCRAM server answers the client-first message with a challenge missing its salt
+    async def scram(reader, writer):
+      try:
+        n = struct.unpack('!I', await reader.readexactly(4))[0]
+        await reader.readexactly(n - 4)
+        writer.write(_auth(10, b'SCRAM-SHA-256\0\0'))
+        await servers[0].read(reader)
+        writer.write(_auth(11, b'r=bogus'))
+        await reader.read()
+      finally:
+        writer.close()
+    servers[2].handle = scram
+
+    async def run():
+      listening = [await asyncio.start_server(s.handle, '127.0.0.1', 0) for s in servers]
+      targets = ['127.0.0.1:' + str(srv.sockets[0].getsockname()[1]) for srv in listening]
+      prober = p.PGVersionProber('monitor', 'secret', timeout=5)
+      try:
+        return await prober.probeMany(targets)
+      finally:
+        await prober.close()
+        for srv in listening:
+          srv.close()
+          await srv.wait_closed()
+
+    results = asyncio.run(run())
+    self.assertEqual((results[0].error, results[0].version), (None, '17.2'))
+    self.assertEqual([r.error for r in results[1:]], ['protocol_error', 'protocol_error', 'protocol_error', 'server_error'])
+
+  def test_prerelease_and_unix_socket(self):
+    r = self.run_probes(_FakeServer(version='18rc1'), unix=True)[0][0]
+    self.assertEqual((r.error, r.version, r.major, r.releaseDate), (None, '18rc1', 18, '2025-09-04'))
+
+  def test_reuse_and_stats(self):
+    server = _FakeServer()
+    results, stats = self.run_probes(server, [[None], [None] * 3, [None]], reuse=True, concurrency=1)
+    self.assertEqual([r.reused for r in results], [False, True, True, True, True])
+    self.assertEqual(server.connections, 1)
+    self.assertEqual(server.queries, 4)
+    self.assertEqual(set(r.version for r in results), {'17.2'})
+    s = stats.toDict()
+    self.assertEqual((s['probes'], s['ok'], s['reused']), (5, 5, 4))
+    self.assertTrue(s['rate'] > 0)
+
+    server = _FakeServer()
+    results, stats = self.run_probes(server, [[None] * 20], concurrency=5)
+    self.assertEqual(server.connections, 20)
+    self.assertEqual(stats.probes, 20)
+
+  def test_reuse_closed_connection(self):
+    goodbyes = [b'', _message(b'E', b'SFATAL\0C57P05\0Mterminating connection due to idle-session timeout\0\0')]
+    for goodbye in goodbyes:
+      server = _ClosingServer(goodbye)
+      results, stats = self.run_probes(server, [[None], [None], [None]], reuse=True, concurrency=1)
+      self.assertEqual([(r.error, r.version, r.reused) for r in results],
+                       [(None, '17.2', False), (None, '17.2', False), (None, '17.2', True)], goodbye)
+      self.assertEqual(server.connections, 2)
+
+  def test_parseTarget(self):
+    self.assertEqual(p._parseTarget('db1'), ('db1', 5432))
+    self.assertEqual(p._parseTarget('db1:6432'), ('db1', 6432))
+    self.assertEqual(p._parseTarget('[::1]:6432'), ('::1', 6432))
+    self.assertEqual(p._parseTarget('::1'), ('::1', 5432))
+    self.assertEqual(p._parseTarget('/var/run/postgresql'), ('/var/run/postgresql', 5432))
+    self.assertEqual(p._parseTarget('/run/postgresql:5433'), ('/run/postgresql', 5433))
+    self.assertEqual(p._parseTarget(('db1', '5433')), ('db1', 5433))
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
@@ -0,0 +1,61 @@
+import unittest
+import pgversion_scheme as s
+
+class TestSchemeMethods(unittest.TestCase):
+  def test_bare_versions(self):
+    self.assertEqual(s.classifyPGVersion('14.6'), ('postgresql', '14.6', '14.6'))
+    self.assertEqual(s.classifyPGVersion('9.6.1'), ('postgresql', '9.6.1', '9.6.1'))
+    self.assertEqual(s.classifyPGVersion(11.1), ('postgresql', '11.1', '11.1'))
+    self.assertEqual(s.classifyPGVersion('14.6.4'), ('aurora', '14.6.4', '14.6'))
+    self.assertEqual(s.classifyPGVersion('17beta3'), ('postgresql', '17beta3', '17beta3'))
+    self.assertEqual(s.classifyPGVersion('9.7.1'), None)
+    self.assertEqual(s.classifyPGVersion('junk'), None)
+    self.assertEqual(s.classifyPGVersion('1' * 10000), None)
+
+  def test_prefixed_versions(self):
+    self.assertEqual(s.classifyPGVersion('PostgreSQL 16.2 on x86_64-pc-linux-gnu, compiled by gcc'), ('postgresql', '16.2', '16.2'))
+    self.assertEqual(s.classifyPGVersion('EnterpriseDB 9.6.2.7'), ('edb', '9.6.2.7', '9.6.2'))
+    self.assertEqual(s.classifyPGVersion('EDB 15.2.0'), ('edb', '15.2.0', '15.2'))
+    self.assertEqual(s.classifyPGVersion('Aurora PostgreSQL 14.6.4'), ('aurora', '14.6.4', '14.6'))
+    self.assertEqual(s.classifyPGVersion('aurora postgresql 14.6.4'), ('aurora', '14.6.4', '14.6'))
+    self.assertEqual(s.classifyPGVersion('Citus 12.1.1 on x86_64-pc-linux-gnu'), ('citus', '12.1.1', False))
+    self.assertEqual(s.classifyPGVersion('PgBouncer 1.21.0'), ('pgbouncer', '1.21.0', False))
+    self.assertEqual(s.classifyPGVersion('PostgreSQL 19devel on x86_64-pc-linux-gnu'), ('postgresql', '19devel', '19devel'))
+    self.assertEqual(s.classifyPGVersion('PostgreSQL 16.2x'), None)
+
+  def test_mixed_inventory(self):
+    kinds = [m.scheme if m else None for m in s.classifyPGVersions(['17.9', '14.6.4', 'PgBouncer 1.21.0', 'x'])]
+    self.assertEqual(kinds, ['postgresql', 'aurora', 'pgbouncer', None])
+
+  def test_release_dates(self):
+    self.assertEqual(s.getPGVersionScheme('postgresql').getReleaseDate('17.0'), '2024-09-26')
+    self.assertEqual(s.getPGVersionScheme('postgresql').getReleaseDate('18rc1'), '2025-09-04')
+    self.assertEqual(s.getPGVersionScheme('aurora').getReleaseDate('14.6.4'), '0')
+
+  def test_register(self):
+    scheme = s.PGVersionScheme('yugabyte-test', prefixes=('yugabytedb-test',), pattern=r'(\d+\.\d+\.\d+\.\d+)',
+                               toUpstream=lambda v: '11.2', releaseDates={'2.20.1.0': '2024-01-10'})
+    s.registerPGVersionScheme(scheme)
+    try:
+      self.assertEqual(s.classifyPGVersion('YugabyteDB-test 2.20.1.0'), ('yugabyte-test', '2.20.1.0', '11.2'))
+      self.assertEqual(scheme.getReleaseDate('2.20.1.0'), '2024-01-10')
+      with self.assertRaises(ValueError):
+        s.registerPGVersionScheme(s.PGVersionScheme('yugabyte-test'))
+    finally:
+      self.assertEqual(s.unregisterPGVersionScheme('yugabyte-test'), scheme)
+    self.assertEqual(s.classifyPGVersion('YugabyteDB-test 2.20.1.0'), None)
+    self.assertEqual(s.getPGVersionScheme('yugabyte-test'), None)
+    self.assertEqual(s.unregisterPGVersionScheme('yugabyte-test'), None)
+
+  def test_unregister_shape(self):
+    scheme = s.PGVersionScheme('shape-test', shape=r'^\d+\.\d+\.\d+\.\d+\.\d+$')
+    s.registerPGVersionScheme(scheme)
+    try:
+      self.assertEqual(s.classifyPGVersion('1.2.3.4.5'), ('shape-test', '1.2.3.4.5', False))
+    finally:
+      s.unregisterPGVersionScheme('shape-test')
+    self.assertEqual(s.classifyPGVersion('1.2.3.4.5'), None)
+    self.assertEqual(s.classifyPGVersion('14.6.4'), ('aurora', '14.6.4', '14.6'))
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
@@ -0,0 +1,100 @@
+import asyncio
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import pgversion_server as s
+
+class TestServerMethods(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.tmpdir = tempfile.TemporaryDirectory()
+    cls.unixPath = os.path.join(cls.tmpdir.name, 'pgversion.sock')
+    cls.loop = asyncio.new_event_loop()
+    cls.servers = cls.loop.run_until_complete(s.startServers('127.0.0.1', 0, cls.unixPath))
+    cls.port = cls.servers[0].sockets[0].getsockname()[1]
+    cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+    cls.thread.start()
+
+  @classmethod
+  def tearDownClass(cls):
+    async def stop():
+      for server in cls.servers:
+        server.close()
+        await server.wait_closed()
+    asyncio.run_coroutine_threadsafe(stop(), cls.loop).result()
+    cls.loop.call_soon_threadsafe(cls.loop.stop)
+    cls.thread.join()
+    cls.loop.close()
+    cls.tmpdir.cleanup()
+
+  def request(self, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+    conn.request(method, path, body=json.dumps(body) if body is not None else None)
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    conn.close()
+    return resp.status, data
+
+  def test_validate(self):
+    self.assertEqual(self.request('GET', '/validate?v=17.9'), (200, {'version': '17.9', 'valid': True, 'released': True}))
+    self.assertEqual(self.request('GET', '/validate?v=9.7.1')[1]['valid'], False)
+
+  def test_parse_and_releasedate(self):
+    self.assertEqual(self.request('GET', '/parse?v=9.6.1')[1]['vernum'], 90601)
+    self.assertEqual(self.request('GET', '/releasedate?v=17.0')[1]['date'], '2024-09-26')
+    self.assertEqual(self.request('GET', '/releasedate?v=11.30')[1]['date'], None)
+
+  def test_compare_and_latestminor(self):
+    r = self.request('GET', '/compare?v1=12.14&v2=15.1')[1]
+    self.assertEqual((r['released_after'], r['vernum_cmp']), (True, -1))
+    self.assertEqual(self.request('GET', '/compare?v1=17beta3&v2=17.0')[1]['vernum_cmp'], -1)
+    self.assertEqual(self.request('GET', '/compare?v1=18rc1&v2=18beta3')[1]['vernum_cmp'], 1)
+    self.assertEqual(self.request('GET', '/latestminor?v=15.4')[1], {'version': '15.4', 'latest': '15.17', 'behind': 13})
+
+  def test_batch(self):
+    status, data = self.request('POST', '/batch/validate', {'versions': ['9.6.1', 'junk'] * 2000})
+    self.assertEqual(status, 200)
+    self.assertEqual(len(data['results']), 4000)
+    self.assertEqual([r['valid'] for r in data['results'][:2]], [True, False])
+    data = self.request('POST', '/batch/compare', {'pairs': [['18.0', '17.9']]})[1]
+    self.assertEqual(data['results'][0]['vernum_cmp'], 1)
+
+  def test_long_input(self):
+    junk = ['x%d' % i * 1000 for i in range(50)]
+    before = s._cachedAnswer.cache_info().currsize
+    data = self.request('POST', '/batch/parse', {'versions': junk + ['17.9']})[1]
+    self.assertTrue(s._cachedAnswer.cache_info().currsize <= before + 1)
+    self.assertEqual(data['results'][0], {'version': junk[0][:16] + '...', 'valid': False})
+    self.assertEqual(data['results'][-1]['version'], '17.9')
+    r = self.request('POST', '/batch/compare', {'pairs': [[junk[1], '17.9']]})[1]['results'][0]
+    self.assertEqual((r['v1'], r['v2'], r['vernum_cmp']), (junk[1][:16] + '...', '17.9', None))
+
+  def test_errors(self):
+    self.assertEqual(self.request('GET', '/nope?v=1')[0], 404)
+    self.assertEqual(self.request('GET', '/validate')[0], 400)
+    self.assertEqual(self.request('GET', '/batch/parse')[0], 405)
+    self.assertEqual(self.request('POST', '/batch/parse', {'versions': 'x'})[0], 400)
+
+  def test_unix_socket_keepalive(self):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+      sock.settimeout(5)
+      sock.connect(self.unixPath)
+      f = sock.makefile('rb')
+      for v in ('11.1', '18.3'):
+        sock.sendall(b'GET /validate?v=' + v.encode() + b' HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertTrue(f.readline().startswith(b'HTTP/1.1 200'))
+        length = 0
+        while True:
+          line = f.readline()
+          if (line == b'\r\n'):
+            break
+          if (line.lower().startswith(b'content-length:')):
+            length = int(line.split(b':')[1])
+        self.assertEqual(json.loads(f.read(length))['released'], True)
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
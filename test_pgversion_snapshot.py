@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import pgversion_snapshot as d
+
+_old = [('db1', '15.4'), ('db2', '16.1'), ('db3', '17.9'), ('db4', '9.6.24'), ('db5', '14.2'), ('db6', '13.1')]
+_new = [('db1', '15.17'), ('db2', '17.0'), ('db3', '17.2'), ('db4', 'junk'), ('db5', '14.2'), ('db7', '18.3')]
+
+_expected = {
+  'db1': 'minor_upgrade',
+  'db2': 'major_upgrade',
+  'db3': 'downgrade',
+  'db4': 'unknown',
+  'db6': 'removed',
+  'db7': 'added',
+}
+
+class TestSnapshotMethods(unittest.TestCase):
+  def test_hash_join(self):
+    changes = {c.instance: c.kind for c in d.diffSnapshots(_old, _new)}
+    self.assertEqual(changes, _expected)
+
+  def test_merge_join(self):
+    changes = list(d.diffSnapshots(_old, _new, presorted=True, includeUnchanged=True))
+    self.assertEqual([c.instance for c in changes], ['db1', 'db2', 'db3', 'db4', 'db5', 'db6', 'db7'])
+    self.assertEqual({c.instance: c.kind for c in changes}, dict(_expected, db5='unchanged'))
+
+  def test_release_delta(self):
+    changes = {c.instance: c for c in d.diffSnapshots(_old, _new)}
+    self.assertTrue(changes['db1'].releaseDelta > 0)
+    self.assertTrue(changes['db3'].releaseDelta < 0)
+    self.assertEqual(changes['db4'].releaseDelta, None)
+
+  def test_prereleases(self):
+    old = [('db1', '18rc1'), ('db2', '17.0'), ('db3', '17beta2'), ('db4', '11.9')]
+    new = [('db1', '18.0'), ('db2', '17beta3'), ('db3', '17beta3'), ('db4', '12beta1')]
+    changes = {c.instance: c.kind for c in d.diffSnapshots(old, new)}
+    self.assertEqual(changes, {'db1': 'minor_upgrade', 'db2': 'downgrade', 'db3': 'minor_upgrade', 'db4': 'major_upgrade'})
+
+  def test_parser_cache_bounded(self):
+    old = (('db%06d' % i, 'junk-%d' % i) for i in range(3 * d._cacheSize))
+    new = (('db%06d' % i, '17.%d' % (i % 10)) for i in range(3 * d._cacheSize))
+    parser = d._VersionParser()
+    for instance, v1, v2 in d._mergeJoin(old, new):
+      d._classify(parser, instance, v1, v2, False)
+    self.assertEqual(parser.parse.cache_info().currsize, d._cacheSize)
+
+  def test_unsorted_input(self):
+    with self.assertRaises(ValueError):
+      list(d.diffSnapshots(list(reversed(_old)), _new, presorted=True))
+
+  def test_sorted_files(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      paths = []
+      for name, rows in (('old', _old), ('new', _new)):
+        raw = os.path.join(tmp, name + '.csv')
+        with open(raw, 'w') as f:
+          f.write('# instance,version\n')
+          for instance, ver in reversed(rows):
+            f.write(instance + ',' + ver + '\n')
+        out = os.path.join(tmp, name + '.sorted.csv')
+        d.sortSnapshotFile(raw, out, chunkRows=2)
+        paths.append(out)
+      changes = {c.instance: c.kind for c in d.diffSnapshotFiles(paths[0], paths[1], presorted=True)}
+      self.assertEqual(changes, _expected)
+      self.assertEqual(os.listdir(tmp).count('old.sorted.csv'), 1)
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)
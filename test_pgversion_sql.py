@@ -0,0 +1,124 @@
+import itertools
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import unittest
+import pgversion as v
+import pgversion_sql as q
+
+_unreleased = ['1.0', '17.50', '99.9999', '19devel', '20beta1', '11beta01', '10.24', '9.7.1', '17.10000', '100.1',
+               '17beta0', '17devel1', '17', 'junk', '17.1.1', '1.1', '017.1', '']
+
+
+class TestSQLMethods(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.conn = sqlite3.connect(':memory:')
+    q.loadSQLite(cls.conn)
+    # '1.0' is in the release list, but too short to be a valid version string
+    cls.released = [r for r in list(v._verReleaseDates) + list(v._verPrereleaseDates) if v.isValidPGVersion(r)]
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.conn.close()
+
+  def one(self, sql, *args):
+    return self.conn.execute(sql, args).fetchone()[0]
+
+  def test_release_table(self):
+    self.assertEqual(self.one('SELECT count(*) FROM pgversion_release'), len(self.released))
+    for ver, vernum, major, minor, dt in self.conn.execute('SELECT version, vernum, major, minor, release_date FROM pgversion_release'):
+      self.assertEqual(vernum, v.getPGVerNumFromString(ver), ver)
+      self.assertEqual(major, v.getMajorPGVersion(ver), ver)
+      self.assertEqual(minor, v.getMinorPGVersion(ver), ver)
+      self.assertEqual(dt, v.getVerReleaseDate(ver), ver)
+    self.assertEqual(self.one("SELECT prerelease FROM pgversion_release WHERE version = '17beta3'"), 'beta3')
+
+  def test_sqlite_functions(self):
+    # The SQLite functions are the Python functions registered on the connection, so this
+    # only checks they are wired up. See TestPostgresMethods for the SQL implementations.
+    for ver in self.released + _unreleased:
+      self.assertEqual(self.one('SELECT pgversion_is_released(?)', ver), int(v.isReleasedPGVersion(ver)), ver)
+      self.assertEqual(self.one('SELECT pgversion_is_valid(?)', ver), int(v.isValidPGVersion(ver)), ver)
+      n = v.getPGVerNumFromString(ver)
+      self.assertEqual(self.one('SELECT pgversion_num(?)', ver), None if (n is False) else n, ver)
+
+  def test_released_after_join(self):
+    # A pure SQL join over the release table gives the same answers as IsVerReleasedAfter()
+    sample = self.released[::7] + ['17.50', 'junk']
+    rows = dict(((a, b), r) for a, b, r in self.conn.execute('''
+      SELECT r1.version, r2.version, r1.release_date > r2.release_date
+      FROM pgversion_release r1, pgversion_release r2'''))
+    for a, b in itertools.product(sample, repeat=2):
+      expected = int(v.IsVerReleasedAfter(a, b))
+      self.assertEqual(rows.get((a, b), 0), expected, (a, b))
+      self.assertEqual(self.one('SELECT pgversion_released_after(?, ?)', a, b), expected, (a, b))
+
+  def test_postgres_script(self):
+    sql = q.getPostgresSQL()
+    copy = sql.split('FROM stdin;\n', 1)[1].split('\n\\.\n', 1)[0].split('\n')
+    self.assertEqual(len(copy), len(self.released))
+    self.assertTrue('17.0\t170000\t17\t0\t\\N\t2024-09-26\t' in sql)
+    self.assertTrue('17rc1\t170000\t17\t0\trc1\t2024-09-05\t\\N' in sql)
+    for fn in ('pgversion_is_valid', 'pgversion_is_released', 'pgversion_num', 'pgversion_released_after'):
+      self.assertTrue('CREATE OR REPLACE FUNCTION ' + fn + '(' in sql)
+
+    # The shapes that pgversion_is_valid() accepts without a release table entry
+    minor = re.compile(q._pgMinorVersionPattern)
+    pre = re.compile(q._pgPrereleasePattern)
+    for ver in _unreleased:
+      if (ver in v._verReleaseDates):
+        continue
+      ok = 4 <= len(ver) <= 16
+      if (ok) and (minor.match(ver)):
+        major, _, m = ver.partition('.')
+        ok = (11 <= int(major) <= 99) and (int(m) < 10000)
+      elif (ok) and (pre.match(ver)):
+        ok = 11 <= int(re.match('[0-9]+', ver).group(0)) <= 99
+      else:
+        ok = False
+      self.assertEqual(ok, v.isValidPGVersion(ver), ver)
+
+
+# Runs the generated script against a real server, in a scratch schema that is dropped afterwards.
+# Connection settings come from the usual libpq environment variables (PGHOST, PGDATABASE, ...).
+@unittest.skipUnless(shutil.which('psql') and (os.environ.get('PGHOST') or os.environ.get('PGDATABASE')),
+                     'psql and a PostgreSQL server (PGHOST / PGDATABASE) are required')
+class TestPostgresMethods(unittest.TestCase):
+  def psql(self, query):
+    schema = 'pgversion_test_' + str(os.getpid())
+    psql = ['psql', '-X', '-q', '-A', '-t', '-F', '|', '-v', 'ON_ERROR_STOP=1']
+    with tempfile.NamedTemporaryFile('w', suffix='.sql') as f:
+      f.write(q.getPostgresSQL())
+      f.flush()
+      script = 'CREATE SCHEMA ' + schema + ';\nSET search_path TO ' + schema + ';\n\\i ' + f.name + '\n' + query + ';\n'
+      try:
+        out = subprocess.run(psql, input=script, capture_output=True, text=True, check=True).stdout
+      finally:
+        subprocess.run(psql + ['-c', 'DROP SCHEMA IF EXISTS ' + schema + ' CASCADE'], capture_output=True)
+    return [line.split('|') for line in out.splitlines() if (line)]
+
+  def test_functions_agree(self):
+    versions = [r for r in list(v._verReleaseDates) + list(v._verPrereleaseDates) if v.isValidPGVersion(r)] + _unreleased
+    values = ', '.join('(' + str(i) + ', ' + q._sqlValue(ver) + ')' for i, ver in enumerate(versions))
+    rows = self.psql('SELECT i, pgversion_is_valid(ver), pgversion_is_released(ver), pgversion_num(ver) '
+                     'FROM (VALUES ' + values + ') t(i, ver) ORDER BY i')
+    self.assertEqual(len(rows), len(versions))
+    for (i, valid, released, num), ver in zip(rows, versions):
+      self.assertEqual(valid == 't', v.isValidPGVersion(ver), ver)
+      self.assertEqual(released == 't', v.isReleasedPGVersion(ver), ver)
+      n = v.getPGVerNumFromString(ver)
+      self.assertEqual(num, '' if (n is False) else str(n), ver)
+
+  def test_released_after_agrees(self):
+    sample = [r for r in v._verReleaseDates if v.isValidPGVersion(r)][::9] + ['17beta3', '17.50', 'junk']
+    pairs = list(itertools.product(sample, repeat=2))
+    values = ', '.join('(' + str(i) + ', ' + q._sqlValue(a) + ', ' + q._sqlValue(b) + ')' for i, (a, b) in enumerate(pairs))
+    rows = self.psql('SELECT pgversion_released_after(a, b) FROM (VALUES ' + values + ') t(i, a, b) ORDER BY i')
+    self.assertEqual([r[0] == 't' for r in rows], [v.IsVerReleasedAfter(a, b) for a, b in pairs])
+
+if __name__ == '__main__':
+  unittest.main(failfast=True)